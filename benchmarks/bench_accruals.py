@@ -0,0 +1,116 @@
+"""Accrual engine throughput: NumPy ledger vs. the per-year Python loop.
+
+Builds synthetic contracts and per-year payment sums in memory (no
+database) and times the company/year accrued-vs-paid matrix both ways:
+the loop the reports used to run over fetched rows (full year of rent for
+every year of a contract), and :func:`utils.accruals.ledger_from_columns`
+with ``Ledger.company_totals`` over the ``array_agg`` columns that
+``db.load_ledger`` receives. Also prints the size of the ledger matrices.
+
+    python benchmarks/bench_accruals.py [--contracts 100000] [--runs 5] [--json]
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+from datetime import date, datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from utils.accruals import epoch_day, ledger_from_columns  # noqa: E402
+
+YEAR = date.today().year
+
+
+def synthetic(contracts: int, seed: int = 1):
+    rnd = random.Random(seed)
+    rows, payments = [], []
+    for i in range(1, contracts + 1):
+        start = datetime(YEAR - rnd.randint(0, 9), rnd.randint(1, 12), rnd.randint(1, 28))
+        end = None if i % 20 == 0 else datetime(start.year + rnd.randint(1, 15), start.month, start.day)
+        rent = 3000 + i % 7000
+        rows.append(
+            {"id": i, "company_id": 1 + i % 20, "date_valid_from": start,
+             "date_valid_to": end, "rent_amount": rent}
+        )
+        for y in range(start.year, YEAR + 1):
+            payments.append({"contract_id": i, "year": y, "amount": rent * rnd.choice((0.5, 1.0, 1.0))})
+    return rows, payments
+
+
+def legacy(contracts, payments):
+    """The per-contract, per-year loop formerly in ``get_company_payments_by_year``."""
+    accruals: dict[tuple[int, int], float] = {}
+    for c in contracts:
+        start_year = c["date_valid_from"].year
+        end_year = c["date_valid_to"].year if c["date_valid_to"] else start_year
+        for y in range(start_year, end_year + 1):
+            key = (c["company_id"], y)
+            accruals[key] = accruals.get(key, 0) + float(c["rent_amount"] or 0)
+    company = {c["id"]: c["company_id"] for c in contracts}
+    paid: dict[tuple[int, int], float] = {}
+    for p in payments:
+        key = (company[p["contract_id"]], p["year"])
+        paid[key] = paid.get(key, 0) + float(p["amount"])
+    rows = []
+    for key in accruals.keys() | paid.keys():
+        rows.append((*key, accruals.get(key, 0.0), paid.get(key, 0.0)))
+    return sorted(rows)
+
+
+def columns(contracts, payments) -> list[list]:
+    """What ``db.load_ledger`` gets back from Postgres: one list per column."""
+    return [
+        [c["id"] for c in contracts],
+        [c["company_id"] for c in contracts],
+        [epoch_day(c["date_valid_from"]) for c in contracts],
+        [epoch_day(c["date_valid_to"]) for c in contracts],
+        [float(c["rent_amount"]) for c in contracts],
+        [p["contract_id"] for p in payments],
+        [p["year"] for p in payments],
+        [p["amount"] for p in payments],
+    ]
+
+
+def vectorized(*lists):
+    return ledger_from_columns(*lists).company_totals()
+
+
+def measure(fn, runs: int, *args) -> float:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn(*args)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--contracts", type=int, default=100000)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+    contracts, payments = synthetic(args.contracts)
+    lists = columns(contracts, payments)
+    ledger = ledger_from_columns(*lists)
+    results = {
+        "contracts": len(contracts),
+        "payment_rows": len(payments),
+        "ledger_cells": int(ledger.accrued.size),
+        "loop_ms": measure(legacy, args.runs, contracts, payments),
+        "numpy_ms": measure(vectorized, args.runs, *lists),
+    }
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for name, value in results.items():
+        print(f"{name:<13} {value:>12,.1f}" if isinstance(value, float) else f"{name:<13} {value:>12,}")
+
+
+if __name__ == "__main__":
+    main()
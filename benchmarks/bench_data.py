@@ -0,0 +1,112 @@
+"""Synthetic dataset in a scratch Postgres schema, shared by the DB benchmarks.
+
+Import this module before ``db``: it points ``DATABASE_URL`` at
+``BENCH_DATABASE_URL`` (and exits when that is not set).
+"""
+import os
+import re
+import sys
+import warnings
+from datetime import date
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+warnings.simplefilter("ignore")
+
+URL = os.environ.get("BENCH_DATABASE_URL")
+if not URL:
+    sys.exit("Set BENCH_DATABASE_URL to a scratch Postgres database")
+os.environ["DATABASE_URL"] = re.sub(r"^postgres(ql)?(\+\w+)?://", "postgresql+psycopg2://", URL)
+
+import sqlalchemy  # noqa: E402
+
+import db  # noqa: E402
+from utils.cache import TableCache  # noqa: E402
+from utils.metrics import TrackedDatabase  # noqa: E402
+
+YEAR = date.today().year - 1
+
+
+class RecordingDatabase(TrackedDatabase):
+    """Keeps every statement so it can be counted or explained afterwards."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.statements = []
+
+    def _observe(self, query, values, seconds):
+        self.statements.append(query)
+        super()._observe(query, values, seconds)
+
+
+POPULATE = [
+    "INSERT INTO company (id, name, short_name, full_name, edrpou) "
+    "SELECT i, 'ТОВ ' || i, 'ТОВ ' || i, 'ТОВ Агро ' || i, lpad(i::text, 8, '0') FROM generate_series(1, 20) i",
+    "INSERT INTO field (id, name, area_actual) "
+    "SELECT i, 'Поле ' || i, 100 + i FROM generate_series(1, 50) i",
+    "INSERT INTO payer (id, name, ipn, is_deceased) "
+    "SELECT i, 'Пайовик ' || i, lpad(i::text, 10, '0'), i % 97 = 0 FROM generate_series(1, :n) i",
+    "INSERT INTO land_plot (id, cadaster, area, ngo, field_id, payer_id) "
+    "SELECT i, lpad(i::text, 10, '0') || ':00:000:' || lpad((i % 10000)::text, 4, '0'), "
+    "1 + (i % 50) / 10.0, 20000 + i % 5000, 1 + i % 50, 1 + i % :n "
+    "FROM generate_series(1, :n * 3 / 2) i",
+    "INSERT INTO land_plot_owner (land_plot_id, payer_id, share) "
+    "SELECT id, payer_id, 1 FROM land_plot",
+    "INSERT INTO contract (id, company_id, payer_id, number, date_signed, date_valid_from, "
+    "date_valid_to, duration_years, rent_amount, status) "
+    "SELECT i, 1 + i % 20, i, 'Д-' || i, make_date(:year - 3 + i % 3, 1 + i % 12, 1), "
+    "make_date(:year - 3 + i % 3, 1 + i % 12, 1), make_date(:year + 2 + i % 5, 1 + i % 12, 1), "
+    "5 + i % 5, 3000 + i % 7000, CASE WHEN i % 10 = 0 THEN 'terminated' ELSE 'signed' END "
+    "FROM generate_series(1, :n) i",
+    "INSERT INTO contract_land_plot (contract_id, land_plot_id) "
+    "SELECT 1 + (id - 1) % :n, id FROM land_plot WHERE id % 7 <> 0",
+    "INSERT INTO payer_contract (contract_id, payer_id) SELECT id, payer_id FROM contract",
+    "INSERT INTO payment (agreement_id, amount, payment_date, payment_type, status) "
+    "SELECT c.id, c.rent_amount / 4, make_date(:year - 2 + q / 4, 1 + (q % 4) * 3, 15), "
+    "'cash', 'paid' FROM contract c CROSS JOIN generate_series(0, 11) q",
+    "INSERT INTO inheritance_debt (payer_id, contract_id, amount, paid) "
+    "SELECT payer_id, id, rent_amount, false FROM contract WHERE payer_id % 97 = 0",
+    "INSERT INTO uploaded_docs (entity_type, entity_id, doc_type, remote_path) "
+    "SELECT t, i, 'scan', t || '/' || i || '.pdf' FROM generate_series(1, :n) i, "
+    "unnest(ARRAY['payer_passport', 'contract']) t",
+    "INSERT INTO crm_events (entity_type, entity_id, event_datetime, event_type, "
+    "responsible_user_id, status) "
+    "SELECT 'payer', i, make_timestamp(:year, 1 + i % 12, 1 + i % 28, 9, 0, 0), 'call', 1, "
+    "CASE WHEN i % 3 = 0 THEN 'done' ELSE 'planned' END FROM generate_series(1, :n) i",
+]
+
+
+def create_engine(schema: str):
+    return sqlalchemy.create_engine(
+        os.environ["DATABASE_URL"], connect_args={"options": f"-csearch_path={schema}"}
+    )
+
+
+def create_database(schema: str) -> RecordingDatabase:
+    """Async client on ``schema``; also installed as ``db.database``."""
+    database = RecordingDatabase(
+        re.sub(r"^postgres(ql)?(\+\w+)?://", "postgresql://", URL),
+        server_settings={"search_path": schema},
+    )
+    db.database = database
+    for value in vars(db).values():
+        if isinstance(value, TableCache):
+            value._database = database
+    return database
+
+
+def populate(engine, schema: str, payers: int):
+    """Recreate ``schema`` with all tables and fill it (``payers`` scales everything)."""
+    with engine.begin() as conn:
+        conn.execute(sqlalchemy.text(f"DROP SCHEMA IF EXISTS {schema} CASCADE"))
+        conn.execute(sqlalchemy.text(f"CREATE SCHEMA {schema}"))
+        db.metadata.create_all(conn)
+        for stmt in POPULATE:
+            conn.execute(sqlalchemy.text(stmt), {"n": payers, "year": YEAR})
+        conn.execute(sqlalchemy.text("ANALYZE"))
+
+
+def drop(engine, schema: str):
+    with engine.begin() as conn:
+        conn.execute(sqlalchemy.text(f"DROP SCHEMA IF EXISTS {schema} CASCADE"))
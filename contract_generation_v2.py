@@ -5,8 +5,6 @@ import shutil
 import logging
 from typing import Any, Mapping, Iterable
 
-from docx import Document
-
 from template_vars import SUPPORTED_VARS, EMPTY_VALUE
 from template_utils import extract_variables
 from ftp_utils import download_file_ftp, upload_file_ftp
@@ -81,6 +79,9 @@ def generate_log(template_name: str, total: int, filled: list[str], missing: lis
 
 
 def fill_doc(template_path: str, context: Mapping[str, Any], output_docx: str) -> None:
+    # python-docx важкий, тому імпортуємо лише під час генерації
+    from docx import Document
+
     doc = Document(template_path)
     placeholders = {f"{{{{{k}}}}}": str(v) for k, v in context.items()}
 
@@ -198,6 +199,7 @@ async def generate_contract_v2(contract_id: int) -> tuple[str, str]:
         ContractLandPlot,
         UploadedDocs,
         get_agreement_templates,
+        get_company,
     )
     from template_utils import analyze_template
 
@@ -212,9 +214,7 @@ async def generate_contract_v2(contract_id: int) -> tuple[str, str]:
     if not contract["payer_id"]:
         raise RuntimeError("Contract has no payer specified")
 
-    company = await database.fetch_one(
-        sqlalchemy.select(Company).where(Company.c.id == contract["company_id"])
-    )
+    company = await get_company(contract["company_id"])
     payer = await database.fetch_one(
         sqlalchemy.select(Payer).where(Payer.c.id == contract["payer_id"])
     )
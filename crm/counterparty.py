@@ -301,6 +301,8 @@ async def delete_confirm(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 
 
 counterparty_conv = ConversationHandler(
+    name="counterparty_conv",
+    persistent=True,
     entry_points=[MessageHandler(filters.Regex("^📒 Контрагенти$"), start)],
     states={
         LIST: [CallbackQueryHandler(list_cb)],
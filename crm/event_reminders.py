@@ -3,6 +3,7 @@ from datetime import datetime, timedelta
 import sqlalchemy
 from telegram.ext import Application
 from db import database, CRMEvent, User, Payer, PotentialPayer, Contract, LandPlot
+from utils.outbound import outbound
 
 
 async def _get_entity_name(row) -> str:
@@ -32,11 +33,11 @@ async def _admin_ids() -> list[int]:
 
 
 async def _send_to(recipients: set[int], text: str, app: Application):
-    for uid in recipients:
-        try:
-            await app.bot.send_message(uid, text)
-        except Exception:
-            pass
+    # Ліміти Telegram тримає outbound, тож отримувачам можна слати паралельно
+    await asyncio.gather(
+        *(outbound.send(app.bot, uid, text) for uid in recipients),
+        return_exceptions=True,
+    )
 
 
 async def _update_status(event_id: int, status_key: str, status: dict):
@@ -484,6 +484,8 @@ async def responsible_id_input(update: Update, context: ContextTypes.DEFAULT_TYP
     return RESPONSIBLE_CHOOSE
 
 add_event_conv = ConversationHandler(
+    name="add_event_conv",
+    persistent=True,
     entry_points=[MessageHandler(filters.Regex("^➕ Додати подію$"), add_start)],
     states={
         CAT: [CallbackQueryHandler(category_cb, pattern=r"^cat:(pot|cur)$")],
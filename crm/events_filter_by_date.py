@@ -28,6 +28,7 @@ from crm.event_fsm_navigation import (
     show_crm_menu,
 )
 from crm.event_utils import format_event
+from utils.session_store import session_store
 
 
 # conversation states for date filtering
@@ -35,6 +36,8 @@ from crm.event_utils import format_event
 # ``events.py`` delegates part of its conversation flow to this module.
 FILTER_DATE_MODE, FILTER_DATES_LIST, FILTER_ALL_EVENTS = range(101, 104)
 PAGE_SIZE = 5
+# після перезапуску відновлений список теж підлягає витісненню
+session_store.register("ev_rows")
 
 
 async def start(msg, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -155,13 +158,25 @@ async def _show_selected_day(msg, rows):
     await msg.reply_text("\n\n".join(texts))
 
 
-async def _show_all_start(msg, context: ContextTypes.DEFAULT_TYPE) -> int:
+async def _load_planned_events(context: ContextTypes.DEFAULT_TYPE) -> list[dict]:
     rows = await database.fetch_all(
         sqlalchemy.select(CRMEvent)
         .where(CRMEvent.c.status == "planned")
         .order_by(CRMEvent.c.event_datetime.asc())
     )
-    context.user_data["ev_rows"] = [dict(r) for r in rows]
+    return session_store.put(context, "ev_rows", [dict(r) for r in rows])
+
+
+async def _event_rows(context: ContextTypes.DEFAULT_TYPE) -> list[dict]:
+    """Cached planned events; reloaded if the session store evicted them."""
+    rows = session_store.get(context, "ev_rows")
+    if rows is None:
+        rows = await _load_planned_events(context)
+    return rows
+
+
+async def _show_all_start(msg, context: ContextTypes.DEFAULT_TYPE) -> int:
+    await _load_planned_events(context)
     context.user_data["ev_page"] = 0
     push_state(context, FILTER_ALL_EVENTS)
     return await _show_page(msg, context)
@@ -172,7 +187,7 @@ async def page_cb(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     await query.answer()
     action = query.data
     page = context.user_data.get("ev_page", 0)
-    rows = context.user_data.get("ev_rows", [])
+    rows = await _event_rows(context)
     total_pages = max(1, ceil(len(rows) / PAGE_SIZE))
 
     if action == "prev" and page > 0:
@@ -183,7 +198,7 @@ async def page_cb(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
 
 
 async def _show_page(msg, context: ContextTypes.DEFAULT_TYPE) -> int:
-    rows = context.user_data.get("ev_rows", [])
+    rows = await _event_rows(context)
     page = context.user_data.get("ev_page", 0)
     if not rows:
         reply_markup = InlineKeyboardMarkup(
@@ -115,6 +115,8 @@ async def retry_view(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
 
 
 view_event_conv = ConversationHandler(
+    name="view_event_conv",
+    persistent=True,
     entry_points=[
         MessageHandler(filters.Regex("^📋 Переглянути події$"), start_event_view),
         CallbackQueryHandler(start_event_view, pattern="^view_events$"),
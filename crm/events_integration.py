@@ -86,6 +86,8 @@ async def add_event_from_card(update: Update, context: ContextTypes.DEFAULT_TYPE
 
 
 add_event_from_card_conv = ConversationHandler(
+    name="add_event_from_card_conv",
+    persistent=True,
     entry_points=[
         CallbackQueryHandler(
             add_event_from_card,
@@ -291,6 +291,8 @@ async def responsible_cb(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 
 
 update_request_conv = ConversationHandler(
+    name="update_request_conv",
+    persistent=True,
     entry_points=[CallbackQueryHandler(start, pattern=r"^update_request:\d+$")],
     states={
         SHOW_CARD: [
@@ -25,6 +25,8 @@ from telegram.ext import (
 
 from db import database, Payer, PayerRequest
 from ftp_utils import download_file_ftp
+from utils.session_store import session_store
+from utils.payers import search_payers
 from crm.event_fsm_navigation import (
     BACK_BTN,
     CANCEL_BTN,
@@ -60,6 +62,8 @@ STATUS_TYPES = {
 ) = range(8)
 
 PAGE_SIZE = 5
+# після перезапуску відновлений список теж підлягає витісненню
+session_store.register("rows")
 
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -110,15 +114,36 @@ async def filter_menu_cb(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         )
         return FILTER_STATUS
     if ftype == "all":
-        rows = await database.fetch_all(
-            sqlalchemy.select(PayerRequest).order_by(PayerRequest.c.id.desc())
-        )
-        context.user_data["rows"] = [dict(r) for r in rows]
+        await _load_rows(context, ("all", None))
         context.user_data["page"] = 0
         return await _show_page(query.message, context)
     return FILTER_MENU
 
 
+async def _load_rows(context: ContextTypes.DEFAULT_TYPE, row_filter: tuple) -> list[dict]:
+    """Load requests for ``row_filter`` and cache them in the session store."""
+    kind, value = row_filter
+    query = sqlalchemy.select(PayerRequest).order_by(PayerRequest.c.id.desc())
+    if kind == "payers":
+        query = query.where(PayerRequest.c.payer_id.in_(value))
+    elif kind == "type":
+        query = query.where(PayerRequest.c.type == REQUEST_TYPES[value])
+    elif kind == "status":
+        query = query.where(PayerRequest.c.status == STATUS_TYPES[value])
+    rows = await database.fetch_all(query)
+    # Фільтр лишається в user_data, щоб перечитати список після витіснення
+    context.user_data["rows_filter"] = row_filter
+    return session_store.put(context, "rows", [dict(r) for r in rows])
+
+
+async def _cached_rows(context: ContextTypes.DEFAULT_TYPE) -> list[dict]:
+    rows = session_store.get(context, "rows")
+    if rows is None:
+        row_filter = context.user_data.get("rows_filter")
+        rows = await _load_rows(context, row_filter) if row_filter else []
+    return rows
+
+
 async def fio_input(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     result = await handle_back_cancel(update, context, show_crm_menu)
     if result is not None:
@@ -126,19 +151,12 @@ async def fio_input(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
             return await start(update, context)
         return result
     text = update.message.text.strip()
-    payers = await database.fetch_all(
-        sqlalchemy.select(Payer).where(Payer.c.name.ilike(f"%{text}%"))
-    )
+    payers = await search_payers(text)
     if not payers:
         await update.message.reply_text("Не знайдено. Спробуйте ще:")
         return FILTER_FIO
     ids = [p["id"] for p in payers]
-    rows = await database.fetch_all(
-        sqlalchemy.select(PayerRequest)
-        .where(PayerRequest.c.payer_id.in_(ids))
-        .order_by(PayerRequest.c.id.desc())
-    )
-    context.user_data["rows"] = [dict(r) for r in rows]
+    await _load_rows(context, ("payers", ids))
     context.user_data["page"] = 0
     return await _show_page(update.message, context)
 
@@ -147,12 +165,7 @@ async def type_cb(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     query = update.callback_query
     await query.answer()
     typ = query.data.split(":")[1]
-    rows = await database.fetch_all(
-        sqlalchemy.select(PayerRequest)
-        .where(PayerRequest.c.type == REQUEST_TYPES[typ])
-        .order_by(PayerRequest.c.id.desc())
-    )
-    context.user_data["rows"] = [dict(r) for r in rows]
+    await _load_rows(context, ("type", typ))
     context.user_data["page"] = 0
     return await _show_page(query.message, context)
 
@@ -161,12 +174,7 @@ async def status_cb(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     query = update.callback_query
     await query.answer()
     st = query.data.split(":")[1]
-    rows = await database.fetch_all(
-        sqlalchemy.select(PayerRequest)
-        .where(PayerRequest.c.status == STATUS_TYPES[st])
-        .order_by(PayerRequest.c.id.desc())
-    )
-    context.user_data["rows"] = [dict(r) for r in rows]
+    await _load_rows(context, ("status", st))
     context.user_data["page"] = 0
     return await _show_page(query.message, context)
 
@@ -181,7 +189,7 @@ async def list_cb(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
             context.user_data["page"] = page - 1
         return await _show_page(query.message, context)
     if data == "next":
-        rows = context.user_data.get("rows", [])
+        rows = await _cached_rows(context)
         page = context.user_data.get("page", 0)
         total_pages = max(1, ceil(len(rows) / PAGE_SIZE))
         if page < total_pages - 1:
@@ -200,7 +208,7 @@ async def list_cb(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
 
 
 async def _show_page(msg, context: ContextTypes.DEFAULT_TYPE) -> int:
-    rows = context.user_data.get("rows", [])
+    rows = await _cached_rows(context)
     page = context.user_data.get("page", 0)
     if not rows:
         await msg.edit_text("Звернень не знайдено.", reply_markup=None)
@@ -370,6 +378,8 @@ async def delete_cb(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
 
 
 view_requests_conv = ConversationHandler(
+    name="view_requests_conv",
+    persistent=True,
     entry_points=[MessageHandler(filters.Regex("^📂 Переглянути звернення$"), start)],
     states={
         FILTER_MENU: [CallbackQueryHandler(filter_menu_cb, pattern=r"^f:(fio|type|status|all)$")],
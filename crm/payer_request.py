@@ -24,6 +24,7 @@ from telegram.ext import (
 
 from db import database, Payer, PayerRequest
 from ftp_utils import upload_file_ftp
+from utils.payers import search_payers
 from utils.fsm_navigation import (
     BACK_BTN,
     CANCEL_BTN,
@@ -112,9 +113,7 @@ async def search_input(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
     if result is not None:
         return result
     text = update.message.text.strip()
-    rows = await database.fetch_all(
-        sqlalchemy.select(Payer).where(Payer.c.name.ilike(f"%{text}%")).limit(10)
-    )
+    rows = await search_payers(text, limit=10)
     if not rows:
         await update.message.reply_text("Не знайдено. Спробуйте ще:")
         return SEARCH_INPUT
@@ -362,6 +361,8 @@ async def confirm_cb(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
 
 
 add_request_conv = ConversationHandler(
+    name="add_request_conv",
+    persistent=True,
     entry_points=[MessageHandler(filters.Regex("^➕ Додати звернення$"), start)],
     states={
         CHOOSE_PAYER: [CallbackQueryHandler(choose_payer_cb, pattern=r"^(payer:\d+|search)$")],
@@ -4,7 +4,8 @@ from __future__ import annotations
 
 import sqlalchemy
 
-from db import database, PotentialPayer
+from db import database, PotentialPayer, PotentialLandPlot
+from utils.search import fuzzy_search
 
 
 async def search_potential_payers(query: str) -> list[sqlalchemy.Row]:
@@ -17,8 +18,24 @@ async def search_potential_payers(query: str) -> list[sqlalchemy.Row]:
             sqlalchemy.select(PotentialPayer).where(PotentialPayer.c.id == int(text))
         )
         return [row] if row else []
-    pattern = f"%{text}%"
+    return await fuzzy_search(
+        database, sqlalchemy.select(PotentialPayer), [PotentialPayer.c.full_name], text
+    )
+
+
+async def search_potential_payers_by_cadastre(cadastre: str) -> list[sqlalchemy.Row]:
+    """Potential payers owning a plot whose cadastre contains or resembles ``cadastre``."""
+    plots = await fuzzy_search(
+        database,
+        sqlalchemy.select(PotentialLandPlot.c.potential_payer_id),
+        [PotentialLandPlot.c.cadastre],
+        cadastre,
+    )
+    ids = list(dict.fromkeys(p["potential_payer_id"] for p in plots))
+    if not ids:
+        return []
     rows = await database.fetch_all(
-        sqlalchemy.select(PotentialPayer).where(PotentialPayer.c.full_name.ilike(pattern))
+        sqlalchemy.select(PotentialPayer).where(PotentialPayer.c.id.in_(ids))
     )
-    return rows
+    by_id = {r["id"]: r for r in rows}
+    return [by_id[i] for i in ids if i in by_id]
@@ -274,6 +274,8 @@ async def confirm_cb(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
 
 
 sublease_conv = ConversationHandler(
+    name="sublease_conv",
+    persistent=True,
     entry_points=[MessageHandler(filters.Regex("^➕ Суборенда$"), start)],
     states={
         CHOOSE_TYPE: [CallbackQueryHandler(type_cb)],
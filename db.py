@@ -1,13 +1,28 @@
 import sqlalchemy
-from databases import Database
-from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.dialects.postgresql import JSONB, aggregate_order_by
+import json
 import os
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
 from utils.contacts import normalize_phone, normalize_edrpou
+from utils.metrics import TrackedDatabase
+from utils.cache import TTLCache, TableCache, MISSING
+from utils.invalidation import bus as invalidation
+from utils.pagination import encode_cursor, decode_cursor
+from utils.report_cache import CACHE_NAME as DATA_VERSION_CACHE, ReportCache, data_version_function, data_version_triggers
+from utils.rollup import PAYMENT_ROLLUP_FUNCTION, PAYMENT_ROLLUP_TRIGGERS
+from utils.snapshots import ReportSnapshots
+from utils.search import SEARCH_LIMIT, TRIGRAM_EXTENSION, fuzzy_search, trigram_index
 
 DATABASE_URL = os.getenv("DATABASE_URL")
-database = Database(DATABASE_URL)
+# SLOW_QUERY_MS — поріг логування повільних запитів; DB_DEBUG=1 вмикає пошук N+1
+database = TrackedDatabase(
+    DATABASE_URL,
+    slow_query_seconds=float(os.getenv("SLOW_QUERY_MS", "500")) / 1000,
+    n_plus_one_threshold=int(os.getenv("N_PLUS_ONE_THRESHOLD", "10")) if os.getenv("DB_DEBUG") == "1" else None,
+)
 metadata = sqlalchemy.MetaData()
+# trigram-індекси (пошук за фрагментом ПІБ, кадастру) потребують pg_trgm
+sqlalchemy.event.listen(metadata, "before_create", TRIGRAM_EXTENSION)
 engine = sqlalchemy.create_engine(DATABASE_URL)
 
 # === Таблиця пайовика ===
@@ -36,6 +51,7 @@ Payer = sqlalchemy.Table(
     sqlalchemy.Column("idcard_date", sqlalchemy.String),
     sqlalchemy.Column("birth_date", sqlalchemy.String),
     sqlalchemy.Column("is_deceased", sqlalchemy.Boolean, default=False),
+    trigram_index("ix_payer_name_trgm", "name"),
 )
 
 # === Таблиця Поле ===
@@ -60,6 +76,9 @@ LandPlot = sqlalchemy.Table(
     sqlalchemy.Column("region", sqlalchemy.String),
     sqlalchemy.Column("district", sqlalchemy.String),
     sqlalchemy.Column("council", sqlalchemy.String),
+    sqlalchemy.Index("ix_land_plot_field_id", "field_id"),
+    sqlalchemy.Index("ix_land_plot_payer_id", "payer_id"),
+    trigram_index("ix_land_plot_cadaster_trgm", "cadaster"),
 )
 
 # === Таблиця власників ділянок ===
@@ -70,6 +89,8 @@ LandPlotOwner = sqlalchemy.Table(
     sqlalchemy.Column("land_plot_id", sqlalchemy.Integer, sqlalchemy.ForeignKey("land_plot.id")),
     sqlalchemy.Column("payer_id", sqlalchemy.Integer, sqlalchemy.ForeignKey("payer.id")),
     sqlalchemy.Column("share", sqlalchemy.Float),
+    sqlalchemy.Index("ix_land_plot_owner_plot_payer", "land_plot_id", "payer_id"),
+    sqlalchemy.Index("ix_land_plot_owner_payer_id", "payer_id"),
 )
 
 # === Таблиця договорів оренди ===
@@ -92,6 +113,10 @@ Contract = sqlalchemy.Table(
     sqlalchemy.Column("created_at", sqlalchemy.DateTime, default=datetime.utcnow),
     sqlalchemy.Column("updated_at", sqlalchemy.DateTime, onupdate=datetime.utcnow),
     sqlalchemy.UniqueConstraint("company_id", "number", name="uq_contract_number"),
+    # company_id покривається uq_contract_number
+    sqlalchemy.Index("ix_contract_payer_id", "payer_id"),
+    sqlalchemy.Index("ix_contract_template_id", "template_id"),
+    trigram_index("ix_contract_number_trgm", "number"),
 )
 
 # === Звʼязок контракт-ділянка (M2M) ===
@@ -101,6 +126,8 @@ ContractLandPlot = sqlalchemy.Table(
     sqlalchemy.Column("id", sqlalchemy.Integer, primary_key=True),
     sqlalchemy.Column("contract_id", sqlalchemy.Integer, sqlalchemy.ForeignKey("contract.id")),
     sqlalchemy.Column("land_plot_id", sqlalchemy.Integer, sqlalchemy.ForeignKey("land_plot.id")),
+    sqlalchemy.Index("ix_contract_land_plot_contract_plot", "contract_id", "land_plot_id"),
+    sqlalchemy.Index("ix_contract_land_plot_plot_id", "land_plot_id"),
 )
 
 # === Звʼязок договір-пайовик (M2M) ===
@@ -110,6 +137,8 @@ PayerContract = sqlalchemy.Table(
     sqlalchemy.Column("id", sqlalchemy.Integer, primary_key=True),
     sqlalchemy.Column("contract_id", sqlalchemy.Integer, sqlalchemy.ForeignKey("contract.id")),
     sqlalchemy.Column("payer_id", sqlalchemy.Integer, sqlalchemy.ForeignKey("payer.id")),
+    sqlalchemy.Index("ix_payer_contract_contract_payer", "contract_id", "payer_id"),
+    sqlalchemy.Index("ix_payer_contract_payer_id", "payer_id"),
 )
 
 # === Таблиця суборенди ===
@@ -128,6 +157,10 @@ Sublease = sqlalchemy.Table(
     ),
     sqlalchemy.Column("date_from", sqlalchemy.Date),
     sqlalchemy.Column("date_to", sqlalchemy.Date),
+    sqlalchemy.Index("ix_sublease_land_plot_id", "land_plot_id"),
+    sqlalchemy.Index("ix_sublease_from_company_id", "from_company_id"),
+    sqlalchemy.Index("ix_sublease_to_company_id", "to_company_id"),
+    sqlalchemy.Index("ix_sublease_counterparty_id", "counterparty_id"),
 )
 
 # === Таблиця спадкоємців ===
@@ -147,6 +180,8 @@ Heir = sqlalchemy.Table(
     ),
     sqlalchemy.Column("documents", JSONB, default=list),
     sqlalchemy.Column("created_at", sqlalchemy.DateTime, default=datetime.utcnow),
+    sqlalchemy.Index("ix_heir_deceased_payer_id", "deceased_payer_id"),
+    sqlalchemy.Index("ix_heir_heir_payer_id", "heir_payer_id"),
 )
 
 # === Таблиця передач спадщини ===
@@ -167,6 +202,8 @@ InheritanceTransfer = sqlalchemy.Table(
     sqlalchemy.Column("asset_type", sqlalchemy.String(32)),  # 'land' or 'contract'
     sqlalchemy.Column("asset_id", sqlalchemy.Integer),
     sqlalchemy.Column("created_at", sqlalchemy.DateTime, default=datetime.utcnow),
+    sqlalchemy.Index("ix_inheritance_transfer_deceased_payer_id", "deceased_payer_id"),
+    sqlalchemy.Index("ix_inheritance_transfer_heir_payer_id", "heir_payer_id"),
 )
 
 # === FTP FILES ===
@@ -178,6 +215,7 @@ UploadedDocs = sqlalchemy.Table(
     sqlalchemy.Column("entity_id", sqlalchemy.Integer),
     sqlalchemy.Column("doc_type", sqlalchemy.String(64)),
     sqlalchemy.Column("remote_path", sqlalchemy.String(255)),
+    sqlalchemy.Index("ix_uploaded_docs_entity", "entity_type", "entity_id", "doc_type"),
 )
 
 # === Таблиця ТОВ ===
@@ -212,27 +250,48 @@ Counterparty = sqlalchemy.Table(
     sqlalchemy.Column("email", sqlalchemy.String(255)),
     sqlalchemy.Column("note", sqlalchemy.Text),
     sqlalchemy.Column("created_at", sqlalchemy.DateTime, default=datetime.utcnow),
+    trigram_index("ix_counterparty_name_trgm", "name"),
+    trigram_index("ix_counterparty_director_trgm", "director"),
 )
 
+# Довідники змінюються кілька разів на рік: тримаємо їх у памʼяті цілком,
+# записи скидають знімок через шину інвалідації.
+REFERENCE_CACHE_TTL = float(os.getenv("REFERENCE_CACHE_TTL", "3600"))
+company_cache = TableCache(database, Company, order_by=Company.c.name, ttl=REFERENCE_CACHE_TTL)
+invalidation.register("company", company_cache)
+
 async def add_company(data: dict):
     query = Company.insert().values(**data)
-    return await database.execute(query)
+    company_id = await database.execute(query)
+    await invalidation.notify(database, "company")
+    return company_id
 
 async def get_companies():
-    query = Company.select().order_by(Company.c.name)
-    return await database.fetch_all(query)
+    return await company_cache.all()
 
 async def get_company(company_id: int):
-    query = Company.select().where(Company.c.id == company_id)
-    return await database.fetch_one(query)
+    return await company_cache.get(company_id)
 
 async def update_company(company_id: int, data: dict):
     query = Company.update().where(Company.c.id == company_id).values(**data)
     await database.execute(query)
+    await invalidation.notify(database, "company", company_id)
 
 async def delete_company(company_id: int):
     query = Company.delete().where(Company.c.id == company_id)
     await database.execute(query)
+    await invalidation.notify(database, "company", company_id)
+
+
+# === Field helpers ===
+field_cache = TableCache(database, Field, order_by=Field.c.id, ttl=REFERENCE_CACHE_TTL)
+invalidation.register("field", field_cache)
+
+async def get_fields():
+    return await field_cache.all()
+
+async def get_field(field_id: int):
+    return await field_cache.get(field_id)
 
 
 # === Counterparty helpers ===
@@ -256,18 +315,15 @@ async def get_counterparties():
     return await database.fetch_all(query)
 
 
-async def search_counterparties(query_str: str):
-    like = f"%{query_str}%"
-    query = (
-        Counterparty.select()
-        .where(
-            (Counterparty.c.name.ilike(like))
-            | (Counterparty.c.edrpou == query_str)
-            | (Counterparty.c.director.ilike(like))
-        )
-        .order_by(Counterparty.c.name)
+async def search_counterparties(query_str: str, limit: int | None = SEARCH_LIMIT):
+    text = query_str.strip()
+    if text.isdigit():
+        rows = await database.fetch_all(Counterparty.select().where(Counterparty.c.edrpou == text))
+        if rows:
+            return rows
+    return await fuzzy_search(
+        database, Counterparty.select(), [Counterparty.c.name, Counterparty.c.director], text, limit
     )
-    return await database.fetch_all(query)
 
 
 async def update_counterparty(counterparty_id: int, data: dict):
@@ -409,36 +465,29 @@ async def transfer_assets_to_heir(deceased_payer_id: int, heir_payer_id: int) ->
 
 
 async def record_inheritance_debt(payer_id: int):
-    """Calculate unpaid rent for active contracts of deceased payer."""
-    contracts = await database.fetch_all(
-        sqlalchemy.select(Contract.c.id, Contract.c.rent_amount)
-        .where(Contract.c.payer_id == payer_id)
-        .where(Contract.c.status != "terminated")
+    """Record rent accrued to date but unpaid on active contracts of a deceased payer."""
+    ledger = await load_ledger(
+        Contract.c.payer_id == payer_id,
+        Contract.c.status != "terminated",
+        as_of=datetime.utcnow().date(),
     )
-    for c in contracts:
-        existing = await database.fetch_one(
-            sqlalchemy.select(InheritanceDebt)
-            .where(InheritanceDebt.c.payer_id == payer_id)
-            .where(InheritanceDebt.c.contract_id == c["id"])
+    recorded = {
+        r["contract_id"]
+        for r in await database.fetch_all(
+            sqlalchemy.select(InheritanceDebt.c.contract_id).where(InheritanceDebt.c.payer_id == payer_id)
         )
-        if existing:
+    }
+    for contract_id, debt in zip(ledger.contract_ids.tolist(), ledger.debt.sum(axis=1).round(2).tolist()):
+        if contract_id in recorded or debt <= 0:
             continue
-        paid_row = await database.fetch_one(
-            sqlalchemy.select(sqlalchemy.func.coalesce(sqlalchemy.func.sum(Payment.c.amount), 0)).where(
-                Payment.c.agreement_id == c["id"]
+        await database.execute(
+            InheritanceDebt.insert().values(
+                payer_id=payer_id,
+                contract_id=contract_id,
+                amount=debt,
+                date_recorded=datetime.utcnow().date(),
             )
         )
-        paid = float(paid_row[0] if isinstance(paid_row, tuple) else paid_row[0])
-        rent = float(c["rent_amount"] or 0)
-        if rent > paid:
-            await database.execute(
-                InheritanceDebt.insert().values(
-                    payer_id=payer_id,
-                    contract_id=c["id"],
-                    amount=rent - paid,
-                    date_recorded=datetime.utcnow().date(),
-                )
-            )
 
 
 async def settle_inheritance_debt(contract_id: int, payment_id: int, amount: float, notes: str | None = "") -> str:
@@ -468,8 +517,14 @@ async def get_payment_report_rows(
     heirs_only: bool = False,
     limit: int | None = None,
     offset: int = 0,
+    after: str | None = None,
 ):
-    """Return payment rows with optional filters for reports."""
+    """Return payment rows with optional filters for reports.
+
+    Rows go newest first. ``after`` is a cursor from
+    :func:`payment_report_cursor`: the page then starts right after that row
+    without rescanning the rows before it.
+    """
     heir_condition = (
         (InheritanceDebt.c.payment_id.isnot(None))
         | Payment.c.notes.ilike("%спад%")
@@ -533,16 +588,24 @@ async def get_payment_report_rows(
     if heirs_only:
         filters.append(heir_condition)
     filters.append(Contract.c.date_valid_from <= datetime.utcnow())
+    if after is not None:
+        filters.append(
+            sqlalchemy.tuple_(Payment.c.payment_date, Payment.c.id) < decode_cursor(after)
+        )
     if filters:
         query = query.where(sqlalchemy.and_(*filters))
 
-    query = query.order_by(Payment.c.payment_date.desc())
+    query = query.order_by(Payment.c.payment_date.desc(), Payment.c.id.desc())
     if limit is not None:
         query = query.limit(limit).offset(offset)
     rows = await database.fetch_all(query)
     return rows
 
 
+def payment_report_cursor(row) -> str:
+    return encode_cursor(row["payment_date"], row["id"])
+
+
 async def get_rent_summary(
     year: int,
     company_query: str | None = None,
@@ -552,12 +615,8 @@ async def get_rent_summary(
 ):
     """Return aggregated rent payment info per company."""
     payments_sub = (
-        sqlalchemy.select(
-            Payment.c.agreement_id.label("cid"),
-            sqlalchemy.func.coalesce(sqlalchemy.func.sum(Payment.c.amount), 0).label("paid"),
-        )
-        .where(sqlalchemy.extract("year", Payment.c.payment_date) == year)
-        .group_by(Payment.c.agreement_id)
+        sqlalchemy.select(PaymentRollup.c.contract_id.label("cid"), PaymentRollup.c.paid)
+        .where(PaymentRollup.c.year == year)
         .subquery()
     )
 
@@ -651,100 +710,133 @@ async def get_rent_summary(
 
 # === Узагальнений звіт по ділянках ===
 async def get_land_overview():
-    """Return aggregated land plot statistics."""
-    total = await database.fetch_one(
+    """Return aggregated land plot statistics in one round trip.
+
+    Active contracts and their plots are read once into CTEs; every section
+    of the report is a JSON aggregate over them in the same statement.
+    """
+    active = (
+        sqlalchemy.select(Contract.c.id, Contract.c.number, Contract.c.company_id)
+        .where(Contract.c.status != "terminated")
+        .cte("active")
+    )
+    links = (
         sqlalchemy.select(
-            sqlalchemy.func.count(LandPlot.c.id).label("plots"),
-            sqlalchemy.func.coalesce(sqlalchemy.func.sum(LandPlot.c.area), 0).label("area"),
-            sqlalchemy.func.coalesce(sqlalchemy.func.sum(LandPlot.c.ngo), 0).label("ngo"),
+            active.c.id.label("contract_id"),
+            active.c.number,
+            active.c.company_id,
+            LandPlot.c.id.label("plot_id"),
+            LandPlot.c.area,
         )
+        .select_from(active)
+        .join(ContractLandPlot, ContractLandPlot.c.contract_id == active.c.id)
+        .join(LandPlot, LandPlot.c.id == ContractLandPlot.c.land_plot_id)
+        .cte("links")
     )
+    func = sqlalchemy.func
 
-    payer_count = await database.fetch_val(
-        sqlalchemy.select(
-            sqlalchemy.func.count(sqlalchemy.distinct(LandPlotOwner.c.payer_id))
+    def json_rows(subquery, order_by):
+        # Ключі — імена колонок з коду, тож їх можна вписати літералами
+        row = func.json_build_object(
+            *(x for c in subquery.c for x in (sqlalchemy.literal_column(f"'{c.name}'"), c))
         )
-    )
-    contract_count = await database.fetch_val(
-        sqlalchemy.select(
-            sqlalchemy.func.count(sqlalchemy.distinct(Contract.c.id))
-        ).where(Contract.c.status != "terminated")
-    )
-    company_count = await database.fetch_val(
-        sqlalchemy.select(
-            sqlalchemy.func.count(sqlalchemy.distinct(Contract.c.company_id))
-        ).where(Contract.c.status != "terminated")
-    )
+        rows = func.json_agg(aggregate_order_by(row, order_by))
+        return sqlalchemy.select(
+            func.coalesce(rows, sqlalchemy.literal_column("'[]'::json"))
+        ).scalar_subquery()
 
-    fields = await database.fetch_all(
+    fields = (
         sqlalchemy.select(
             Field.c.name.label("name"),
-            sqlalchemy.func.count(LandPlot.c.id).label("plots"),
-            sqlalchemy.func.coalesce(sqlalchemy.func.sum(LandPlot.c.area), 0).label("area"),
+            func.count(LandPlot.c.id).label("plots"),
+            func.coalesce(func.sum(LandPlot.c.area), 0).label("area"),
         )
         .outerjoin(LandPlot, LandPlot.c.field_id == Field.c.id)
         .group_by(Field.c.id)
-        .order_by(Field.c.name)
+        .subquery()
     )
-
-    companies = await database.fetch_all(
+    companies = (
         sqlalchemy.select(
             Company.c.name.label("name"),
-            sqlalchemy.func.count(sqlalchemy.distinct(LandPlot.c.id)).label("plots"),
-            sqlalchemy.func.coalesce(sqlalchemy.func.sum(LandPlot.c.area), 0).label("area"),
+            func.count(sqlalchemy.distinct(links.c.plot_id)).label("plots"),
+            func.coalesce(func.sum(links.c.area), 0).label("area"),
         )
         .select_from(Company)
-        .join(Contract, sqlalchemy.and_(Contract.c.company_id == Company.c.id, Contract.c.status != "terminated"))
-        .join(ContractLandPlot, ContractLandPlot.c.contract_id == Contract.c.id)
-        .join(LandPlot, LandPlot.c.id == ContractLandPlot.c.land_plot_id)
+        .join(links, links.c.company_id == Company.c.id)
         .group_by(Company.c.id)
-        .order_by(Company.c.name)
+        .subquery()
     )
-
-    contracts = await database.fetch_all(
+    contracts = (
         sqlalchemy.select(
-            Contract.c.number.label("number"),
-            sqlalchemy.func.count(LandPlot.c.id).label("plots"),
-            sqlalchemy.func.coalesce(sqlalchemy.func.sum(LandPlot.c.area), 0).label("area"),
+            links.c.number.label("number"),
+            func.count(links.c.plot_id).label("plots"),
+            func.coalesce(func.sum(links.c.area), 0).label("area"),
         )
-        .select_from(Contract)
-        .join(ContractLandPlot, ContractLandPlot.c.contract_id == Contract.c.id)
-        .join(LandPlot, LandPlot.c.id == ContractLandPlot.c.land_plot_id)
-        .where(Contract.c.status != "terminated")
-        .group_by(Contract.c.id)
-        .order_by(Contract.c.number)
+        .group_by(links.c.contract_id, links.c.number)
+        .subquery()
     )
-
-    with_contract = await database.fetch_one(
+    totals = sqlalchemy.select(
+        func.count(LandPlot.c.id).label("plots"),
+        func.coalesce(func.sum(LandPlot.c.area), 0).label("area"),
+        func.coalesce(func.sum(LandPlot.c.ngo), 0).label("ngo"),
+    ).subquery()
+    with_contract = sqlalchemy.select(
+        func.count(sqlalchemy.distinct(links.c.plot_id)).label("plots"),
+        func.coalesce(func.sum(links.c.area), 0).label("area"),
+    ).subquery()
+
+    row = await database.fetch_one(
         sqlalchemy.select(
-            sqlalchemy.func.count(sqlalchemy.distinct(LandPlot.c.id)).label("plots"),
-            sqlalchemy.func.coalesce(sqlalchemy.func.sum(LandPlot.c.area), 0).label("area"),
-        )
-        .select_from(LandPlot)
-        .join(ContractLandPlot, ContractLandPlot.c.land_plot_id == LandPlot.c.id)
-        .join(Contract, sqlalchemy.and_(Contract.c.id == ContractLandPlot.c.contract_id, Contract.c.status != "terminated"))
+            totals.c.plots,
+            totals.c.area,
+            totals.c.ngo,
+            with_contract.c.plots.label("with_contract_plots"),
+            with_contract.c.area.label("with_contract_area"),
+            sqlalchemy.select(func.count(sqlalchemy.distinct(LandPlotOwner.c.payer_id)))
+            .scalar_subquery()
+            .label("payers"),
+            sqlalchemy.select(func.count()).select_from(active).scalar_subquery().label("contracts"),
+            sqlalchemy.select(func.count(sqlalchemy.distinct(active.c.company_id)))
+            .scalar_subquery()
+            .label("companies"),
+            json_rows(fields, fields.c.name).label("fields"),
+            json_rows(companies, companies.c.name).label("company_rows"),
+            json_rows(contracts, contracts.c.number).label("contract_rows"),
+        ).select_from(totals.join(with_contract, sqlalchemy.true()))
     )
-    without_plots = total["plots"] - (with_contract["plots"] or 0)
-    without_area = float(total["area"] or 0) - float(with_contract["area"] or 0)
+
+    with_plots = row["with_contract_plots"] or 0
+    with_area = float(row["with_contract_area"] or 0)
     statuses = [
+        {"status": "with_contract", "plots": with_plots, "area": with_area},
         {
-            "status": "with_contract",
-            "plots": with_contract["plots"] or 0,
-            "area": float(with_contract["area"] or 0),
+            "status": "without_contract",
+            "plots": (row["plots"] or 0) - with_plots,
+            "area": float(row["area"] or 0) - with_area,
         },
-        {"status": "without_contract", "plots": without_plots, "area": without_area},
     ]
 
     summary = {
-        "plots": total["plots"] or 0,
-        "area": float(total["area"] or 0),
-        "ngo": float(total["ngo"] or 0),
-        "payers": payer_count or 0,
-        "contracts": contract_count or 0,
-        "companies": company_count or 0,
+        "plots": row["plots"] or 0,
+        "area": float(row["area"] or 0),
+        "ngo": float(row["ngo"] or 0),
+        "payers": row["payers"] or 0,
+        "contracts": row["contracts"] or 0,
+        "companies": row["companies"] or 0,
     }
 
-    return summary, fields, companies, statuses, contracts
+    return (
+        summary,
+        _json_value(row["fields"]),
+        _json_value(row["company_rows"]),
+        statuses,
+        _json_value(row["contract_rows"]),
+    )
+
+
+def _json_value(value):
+    # asyncpg віддає json як текст
+    return json.loads(value) if isinstance(value, str) else value
 
 
 # === Статистика по полях ===
@@ -821,9 +913,9 @@ async def get_fields_report():
     return rows
 
 
-async def get_contract_overview():
-    """Return aggregated contract statistics and detailed rows."""
-    contract_base = (
+def _contract_base():
+    """Active contracts with their plot area and end year, as a CTE."""
+    return (
         sqlalchemy.select(
             Contract.c.id.label("id"),
             Contract.c.company_id,
@@ -843,63 +935,73 @@ async def get_contract_overview():
             Contract.c.date_valid_to,
             Contract.c.rent_amount,
         )
-        .subquery()
+        .cte("contract_base")
     )
 
-    total = await database.fetch_one(
-        sqlalchemy.select(
-            sqlalchemy.func.count(contract_base.c.id).label("contracts"),
-            sqlalchemy.func.coalesce(sqlalchemy.func.sum(contract_base.c.area), 0).label("area"),
-            sqlalchemy.func.coalesce(sqlalchemy.func.sum(contract_base.c.rent_amount), 0).label("rent"),
-            sqlalchemy.func.count(sqlalchemy.distinct(contract_base.c.company_id)).label("companies"),
-        )
-    )
 
-    payer_count = await database.fetch_val(
-        sqlalchemy.select(
-            sqlalchemy.func.count(sqlalchemy.distinct(PayerContract.c.payer_id))
-        )
-        .join(Contract, Contract.c.id == PayerContract.c.contract_id)
-        .where(Contract.c.status != "terminated")
-    )
+# grouping(company_id, status, end_year): біт стоїть, коли колонки немає в наборі
+_BY_COMPANY, _BY_STATUS, _BY_YEAR, _TOTAL = 0b011, 0b101, 0b110, 0b111
+
 
-    companies = await database.fetch_all(
+async def get_contract_overview():
+    """Return contract totals and breakdowns by company, status and end year.
+
+    A single ``GROUPING SETS`` query: the ``()`` set is the summary, the
+    others are the breakdowns, told apart by ``grouping()``. The detail rows
+    are streamed separately by :func:`iterate_contract_overview_rows`.
+    """
+    base = _contract_base()
+    func = sqlalchemy.func
+    grouping = func.grouping(base.c.company_id, base.c.status, base.c.end_year)
+    rows = await database.fetch_all(
         sqlalchemy.select(
+            grouping.label("grouping_set"),
+            base.c.company_id,
             Company.c.name.label("name"),
-            sqlalchemy.func.count(contract_base.c.id).label("contracts"),
-            sqlalchemy.func.coalesce(sqlalchemy.func.sum(contract_base.c.area), 0).label("area"),
-            sqlalchemy.func.coalesce(sqlalchemy.func.sum(contract_base.c.rent_amount), 0).label("rent"),
+            base.c.status.label("status"),
+            base.c.end_year.label("year"),
+            func.count(base.c.id).label("contracts"),
+            func.coalesce(func.sum(base.c.area), 0).label("area"),
+            func.coalesce(func.sum(base.c.rent_amount), 0).label("rent"),
+            func.count(sqlalchemy.distinct(base.c.company_id)).label("companies"),
+            sqlalchemy.select(func.count(sqlalchemy.distinct(PayerContract.c.payer_id)))
+            .where(PayerContract.c.contract_id.in_(sqlalchemy.select(base.c.id)))
+            .scalar_subquery()
+            .label("payers"),
         )
-        .join(Company, Company.c.id == contract_base.c.company_id)
-        .group_by(Company.c.id)
-        .order_by(Company.c.name)
-    )
-
-    statuses = await database.fetch_all(
-        sqlalchemy.select(
-            contract_base.c.status.label("status"),
-            sqlalchemy.func.count(contract_base.c.id).label("contracts"),
-            sqlalchemy.func.coalesce(sqlalchemy.func.sum(contract_base.c.area), 0).label("area"),
-            sqlalchemy.func.coalesce(sqlalchemy.func.sum(contract_base.c.rent_amount), 0).label("rent"),
+        .select_from(base.outerjoin(Company, Company.c.id == base.c.company_id))
+        .group_by(
+            func.grouping_sets(
+                sqlalchemy.tuple_(),
+                sqlalchemy.tuple_(base.c.company_id, Company.c.name),
+                sqlalchemy.tuple_(base.c.status),
+                sqlalchemy.tuple_(base.c.end_year),
+            )
         )
-        .select_from(contract_base)
-        .group_by(contract_base.c.status)
-        .order_by(contract_base.c.status)
+        .order_by(grouping, Company.c.name, base.c.status, base.c.end_year)
     )
 
-    years = await database.fetch_all(
-        sqlalchemy.select(
-            contract_base.c.end_year.label("year"),
-            sqlalchemy.func.count(contract_base.c.id).label("contracts"),
-            sqlalchemy.func.coalesce(sqlalchemy.func.sum(contract_base.c.area), 0).label("area"),
-            sqlalchemy.func.coalesce(sqlalchemy.func.sum(contract_base.c.rent_amount), 0).label("rent"),
-        )
-        .select_from(contract_base)
-        .group_by(contract_base.c.end_year)
-        .order_by(contract_base.c.end_year)
-    )
+    # Набір () дає рядок і на порожній таблиці
+    total = next(r for r in rows if r["grouping_set"] == _TOTAL)
+    companies = [r for r in rows if r["grouping_set"] == _BY_COMPANY and r["company_id"] is not None]
+    statuses = [r for r in rows if r["grouping_set"] == _BY_STATUS]
+    years = [r for r in rows if r["grouping_set"] == _BY_YEAR]
 
-    rows = await database.fetch_all(
+    summary = {
+        "contracts": total["contracts"] or 0,
+        "payers": total["payers"] or 0,
+        "area": float(total["area"] or 0),
+        "rent": float(total["rent"] or 0),
+        "companies": total["companies"] or 0,
+    }
+
+    return summary, companies, statuses, years
+
+
+async def iterate_contract_overview_rows():
+    """Stream the per-contract rows of the overview, ordered by number."""
+    base = _contract_base()
+    query = (
         sqlalchemy.select(
             Contract.c.number.label("number"),
             Company.c.name.label("company_name"),
@@ -907,12 +1009,12 @@ async def get_contract_overview():
                 sqlalchemy.distinct(Payer.c.name), ", "
             ).label("payer_name"),
             Contract.c.status,
-            contract_base.c.area,
+            base.c.area,
             sqlalchemy.extract("year", Contract.c.date_valid_from).label("year_from"),
-            contract_base.c.end_year.label("year_to"),
-            contract_base.c.rent_amount.label("rent_amount"),
+            base.c.end_year.label("year_to"),
+            base.c.rent_amount.label("rent_amount"),
         )
-        .join(contract_base, contract_base.c.id == Contract.c.id)
+        .join(base, base.c.id == Contract.c.id)
         .join(Company, Company.c.id == Contract.c.company_id)
         .outerjoin(PayerContract, PayerContract.c.contract_id == Contract.c.id)
         .outerjoin(Payer, Payer.c.id == PayerContract.c.payer_id)
@@ -922,33 +1024,22 @@ async def get_contract_overview():
             Contract.c.status,
             Contract.c.date_valid_from,
             Company.c.name,
-            contract_base.c.area,
-            contract_base.c.end_year,
-            contract_base.c.rent_amount,
+            base.c.area,
+            base.c.end_year,
+            base.c.rent_amount,
         )
         .order_by(Contract.c.number)
     )
+    async for row in database.iterate(query):
+        yield row
 
-    summary = {
-        "contracts": total["contracts"] or 0,
-        "payers": payer_count or 0,
-        "area": float(total["area"] or 0),
-        "rent": float(total["rent"] or 0),
-        "companies": total["companies"] or 0,
-    }
-
-    return summary, companies, statuses, years, rows
 
 # === Звіт по ТОВ ===
 async def get_company_report(year: int):
     """Return aggregated info per company for a specific year."""
     payments_sub = (
-        sqlalchemy.select(
-            Payment.c.agreement_id.label("cid"),
-            sqlalchemy.func.coalesce(sqlalchemy.func.sum(Payment.c.amount), 0).label("paid"),
-        )
-        .where(sqlalchemy.extract("year", Payment.c.payment_date) == year)
-        .group_by(Payment.c.agreement_id)
+        sqlalchemy.select(PaymentRollup.c.contract_id.label("cid"), PaymentRollup.c.paid)
+        .where(PaymentRollup.c.year == year)
         .subquery()
     )
 
@@ -1108,79 +1199,166 @@ async def get_company_sublease():
     return rows
 
 
-async def get_company_payments_by_year():
-    """Return payment accrual and paid amounts per company per year."""
-    today = date.today()
-    contracts = await database.fetch_all(
+async def load_ledger(*conditions, years=None, as_of: date | None = None):
+    """Accrual :class:`~utils.accruals.Ledger` of contracts matching ``conditions``.
+
+    Two statements whatever the number of contracts, each returning one
+    row of ``array_agg`` columns (dates as day numbers), which NumPy turns
+    into arrays without a per-row Python loop. Paid amounts come from
+    ``payment_rollup``.
+    """
+    # numpy — лише для звітів, тож не вантажимо його при старті
+    from utils.accruals import ledger_from_columns
+
+    where = [Contract.c.date_valid_from.is_not(None), *conditions]
+    func = sqlalchemy.func
+
+    def days(column):
+        return sqlalchemy.cast(func.floor(sqlalchemy.extract("epoch", column) / 86400), sqlalchemy.Integer)
+
+    contracts = await database.fetch_one(
         sqlalchemy.select(
-            Contract.c.id,
-            Contract.c.company_id,
-            Contract.c.date_valid_from,
-            Contract.c.date_valid_to,
-            Contract.c.rent_amount,
+            func.array_agg(Contract.c.id).label("ids"),
+            func.array_agg(Contract.c.company_id).label("company_ids"),
+            func.array_agg(days(Contract.c.date_valid_from)).label("starts"),
+            func.array_agg(days(Contract.c.date_valid_to)).label("ends"),
+            func.array_agg(sqlalchemy.cast(Contract.c.rent_amount, sqlalchemy.Float)).label("rents"),
+        ).where(*where)
+    )
+    sums = (
+        sqlalchemy.select(
+            PaymentRollup.c.contract_id,
+            PaymentRollup.c.year,
+            sqlalchemy.cast(PaymentRollup.c.paid, sqlalchemy.Float).label("amount"),
         )
-        .where(Contract.c.date_valid_from <= datetime.utcnow())
+        .join(Contract, Contract.c.id == PaymentRollup.c.contract_id)
+        .where(*where)
     )
-    accruals: dict[tuple[int, int], float] = {}
-    for c in contracts:
-        if not c["date_valid_from"]:
-            continue
-        if c["date_valid_from"].date() > today:
-            continue
-        start_year = c["date_valid_from"].year
-        end_year = c["date_valid_to"].year if c["date_valid_to"] else start_year
-        for y in range(start_year, end_year + 1):
-            key = (c["company_id"], y)
-            accruals[key] = accruals.get(key, 0) + float(c["rent_amount"] or 0)
+    if years is not None:
+        # Договір може починатися в майбутньому році — тоді років немає й платежі не потрібні
+        years = list(years)
+        sums = sums.where(
+            PaymentRollup.c.year.between(min(years), max(years)) if years else sqlalchemy.false()
+        )
+    sums = sums.subquery()
+    payments = await database.fetch_one(
+        sqlalchemy.select(
+            func.array_agg(sums.c.contract_id).label("contract_ids"),
+            func.array_agg(sums.c.year).label("years"),
+            func.array_agg(sums.c.amount).label("amounts"),
+        )
+    )
+    return ledger_from_columns(
+        contracts["ids"],
+        contracts["company_ids"],
+        contracts["starts"],
+        contracts["ends"],
+        contracts["rents"],
+        payments["contract_ids"],
+        payments["years"],
+        payments["amounts"],
+        years,
+        as_of,
+    )
+
+
+# Як utils.accruals.MAX_TERM_YEARS; сам модуль не імпортуємо, бо він тягне numpy
+MAX_TERM_YEARS = 50
 
-    pay_rows = await database.fetch_all(
+
+async def get_company_payments_by_year():
+    """Return payment accrual and paid amounts per company per year.
+
+    Accruals are generated in SQL: every started contract contributes to
+    each year from ``generate_series(start year, end year)`` its rent times
+    the share of that year's days it covers, the same proration as
+    :mod:`utils.accruals`. An open-ended contract runs to the current year,
+    and the series is clipped to :data:`MAX_TERM_YEARS` around it. Accruals
+    are full-joined to ``payment_rollup`` summed per company and year, so
+    every payment counts, and the matrix comes back aggregated and sorted.
+    """
+    func = sqlalchemy.func
+    started = Contract.c.date_valid_from <= datetime.utcnow()
+    current_year = sqlalchemy.cast(sqlalchemy.extract("year", func.current_date()), sqlalchemy.Integer)
+    start = sqlalchemy.cast(Contract.c.date_valid_from, sqlalchemy.Date)
+    end = sqlalchemy.cast(Contract.c.date_valid_to, sqlalchemy.Date)
+    start_year = sqlalchemy.cast(sqlalchemy.extract("year", start), sqlalchemy.Integer)
+    end_year = func.coalesce(
+        sqlalchemy.cast(sqlalchemy.extract("year", end), sqlalchemy.Integer),
+        func.greatest(current_year, start_year),
+    )
+    # Функція у FROM бачить колонки договору без явного LATERAL
+    years = func.generate_series(
+        func.greatest(start_year, current_year - MAX_TERM_YEARS),
+        func.least(end_year, current_year + MAX_TERM_YEARS),
+    ).column_valued("year")
+    first = func.make_date(years, 1, 1)
+    after = func.make_date(years + 1, 1, 1)
+    # date - date у Postgres — кількість днів; кінець договору включно
+    covered = func.greatest(func.least(func.coalesce(end + 1, after), after) - func.greatest(start, first), 0)
+    accruals = (
         sqlalchemy.select(
-            Contract.c.company_id,
-            sqlalchemy.extract("year", Payment.c.payment_date).label("year"),
-            sqlalchemy.func.coalesce(sqlalchemy.func.sum(Payment.c.amount), 0).label("paid"),
+            Contract.c.company_id.label("company_id"),
+            years.label("year"),
+            func.round(func.sum(func.coalesce(Contract.c.rent_amount, 0) * covered / (after - first)), 2).label(
+                "accrued"
+            ),
         )
-        .select_from(Payment)
-        .join(Contract, Contract.c.id == Payment.c.agreement_id)
-        .where(Contract.c.date_valid_from <= datetime.utcnow())
-        .group_by(Contract.c.company_id, sqlalchemy.extract("year", Payment.c.payment_date))
+        .select_from(Contract)
+        .where(started)
+        .group_by(Contract.c.company_id, years)
+        .cte("accruals")
     )
-    paid = {(int(r["company_id"]), int(r["year"])): float(r["paid"] or 0) for r in pay_rows}
-
-    rows: list[dict] = []
-    keys_seen: set[tuple[int, int]] = set()
-    for (cid, year), accrued in accruals.items():
-        paid_amount = paid.get((cid, year), 0.0)
-        rows.append(
-            {
-                "company_id": cid,
-                "year": year,
-                "accrued": accrued,
-                "paid": paid_amount,
-                "debt": accrued - paid_amount,
-            }
+    paid = (
+        sqlalchemy.select(
+            Contract.c.company_id.label("company_id"),
+            PaymentRollup.c.year.label("year"),
+            func.sum(PaymentRollup.c.paid).label("paid"),
         )
-        keys_seen.add((cid, year))
-    for (cid, year), paid_amount in paid.items():
-        if (cid, year) not in keys_seen:
-            rows.append(
-                {
-                    "company_id": cid,
-                    "year": year,
-                    "accrued": 0.0,
-                    "paid": paid_amount,
-                    "debt": -paid_amount,
-                }
-            )
-
-    companies = await database.fetch_all(
-        sqlalchemy.select(Company.c.id, Company.c.name)
+        .select_from(PaymentRollup)
+        .join(Contract, Contract.c.id == PaymentRollup.c.contract_id)
+        .where(started)
+        .group_by(Contract.c.company_id, PaymentRollup.c.year)
+        .cte("paid")
     )
-    names = {c["id"]: c["name"] for c in companies}
-    for r in rows:
-        r["company"] = names.get(r["company_id"])
 
-    rows.sort(key=lambda x: (x["company"], x["year"]))
-    return rows
+    company_id = func.coalesce(accruals.c.company_id, paid.c.company_id)
+    year = func.coalesce(accruals.c.year, paid.c.year)
+    accrued = func.coalesce(accruals.c.accrued, 0)
+    paid_amount = func.coalesce(paid.c.paid, 0)
+    rows = await database.fetch_all(
+        sqlalchemy.select(
+            company_id.label("company_id"),
+            Company.c.name.label("company"),
+            year.label("year"),
+            accrued.label("accrued"),
+            paid_amount.label("paid"),
+            (accrued - paid_amount).label("debt"),
+        )
+        .select_from(
+            accruals.join(
+                paid,
+                sqlalchemy.and_(
+                    paid.c.company_id == accruals.c.company_id,
+                    paid.c.year == accruals.c.year,
+                ),
+                full=True,
+            ).outerjoin(Company, Company.c.id == company_id)
+        )
+        .order_by(Company.c.name, year)
+    )
+    # Рядки зберігаються в user_data, тож віддаємо звичайні словники
+    return [
+        {
+            "company_id": r["company_id"],
+            "year": r["year"],
+            "accrued": float(r["accrued"]),
+            "paid": float(r["paid"]),
+            "debt": float(r["debt"]),
+            "company": r["company"],
+        }
+        for r in rows
+    ]
 
 # === Звіт по ділянках ===
 async def get_land_report_rows(
@@ -1196,23 +1374,34 @@ async def get_land_report_rows(
     end_date: date | None = None,
     limit: int | None = None,
     offset: int = 0,
+    after: str | None = None,
 ):
-    owners_sub = (
-        sqlalchemy.select(
-            LandPlotOwner.c.land_plot_id.label("lp_id"),
-            sqlalchemy.func.string_agg(Payer.c.name, ", ").label("owners"),
-        )
+    """Land plots with their contracts, ordered by cadastre.
+
+    ``after`` is a cursor from :func:`land_report_cursor`. Cadastre numbers
+    are unique, so rows are ordered by ``(cadaster, link_id)`` and a page
+    seeks to ``cadaster >= :c`` on the unique index, joining links, owners
+    and contracts only for the plots it reads (``bench_indexes``:
+    ``land_report_page_1`` vs ``land_report_page_deep``).
+    """
+    owners = (
+        sqlalchemy.select(sqlalchemy.func.string_agg(Payer.c.name, ", "))
+        .select_from(LandPlotOwner)
         .join(Payer, Payer.c.id == LandPlotOwner.c.payer_id)
-        .group_by(LandPlotOwner.c.land_plot_id)
-        .subquery()
+        .where(LandPlotOwner.c.land_plot_id == LandPlot.c.id)
+        .scalar_subquery()
     )
+    # Ділянка може бути в кількох договорах — рядок однозначно задає ще й звʼязок
+    link_id = sqlalchemy.func.coalesce(ContractLandPlot.c.id, 0)
 
     query = (
         sqlalchemy.select(
+            LandPlot.c.id.label("land_plot_id"),
+            link_id.label("link_id"),
             LandPlot.c.cadaster,
             LandPlot.c.area,
             LandPlot.c.ngo,
-            owners_sub.c.owners.label("payer_name"),
+            owners.label("payer_name"),
             Contract.c.number.label("contract_number"),
             Company.c.name.label("company_name"),
             Contract.c.date_valid_to,
@@ -1220,7 +1409,6 @@ async def get_land_report_rows(
             Contract.c.rent_amount,
         )
         .select_from(LandPlot)
-        .outerjoin(owners_sub, owners_sub.c.lp_id == LandPlot.c.id)
         .outerjoin(ContractLandPlot, ContractLandPlot.c.land_plot_id == LandPlot.c.id)
         .outerjoin(Contract, Contract.c.id == ContractLandPlot.c.contract_id)
         .outerjoin(Company, Company.c.id == Contract.c.company_id)
@@ -1229,7 +1417,7 @@ async def get_land_report_rows(
 
     filters = []
     if payer_query:
-        filters.append(owners_sub.c.owners.ilike(f"%{payer_query}%"))
+        filters.append(owners.ilike(f"%{payer_query}%"))
     if company_query:
         filters.append(
             (Company.c.name.ilike(f"%{company_query}%"))
@@ -1251,15 +1439,26 @@ async def get_land_report_rows(
         filters.append(LandPlot.c.ngo <= ngo_to)
     if end_date is not None:
         filters.append(Contract.c.date_valid_to <= end_date)
+    if after is not None:
+        # Старі курсори мали ще й id ділянки посередині
+        position = decode_cursor(after)
+        cadaster_after, link_after = position[0], position[-1]
+        # Перша умова — діапазон по унікальному індексу cadaster, друга лише доуточнює
+        filters.append(LandPlot.c.cadaster >= cadaster_after)
+        filters.append((LandPlot.c.cadaster > cadaster_after) | (link_id > link_after))
     if filters:
         query = query.where(sqlalchemy.and_(*filters))
 
-    query = query.order_by(LandPlot.c.cadaster)
+    query = query.order_by(LandPlot.c.cadaster, link_id)
     if limit is not None:
         query = query.limit(limit).offset(offset)
     rows = await database.fetch_all(query)
     return rows
 
+
+def land_report_cursor(row) -> str:
+    return encode_cursor(row["cadaster"], row["link_id"])
+
 # === Таблиця користувачів ===
 User = sqlalchemy.Table(
     "user",
@@ -1322,8 +1521,71 @@ Payment = sqlalchemy.Table(
     sqlalchemy.Column("notes", sqlalchemy.String),
     sqlalchemy.Column("status", sqlalchemy.String, default="paid"),
     sqlalchemy.Column("created_at", sqlalchemy.DateTime, default=datetime.utcnow),
+    sqlalchemy.Index("ix_payment_agreement_date", "agreement_id", "payment_date"),
+    # (дата, id) — порядок і курсор звіту по виплатах
+    sqlalchemy.Index("ix_payment_date_id", "payment_date", "id"),
+)
+
+# === Виплати по договору за рік (підтримується тригером на payment) ===
+PaymentRollup = sqlalchemy.Table(
+    "payment_rollup",
+    metadata,
+    sqlalchemy.Column(
+        "contract_id", sqlalchemy.Integer, sqlalchemy.ForeignKey("contract.id", ondelete="CASCADE"), primary_key=True
+    ),
+    sqlalchemy.Column("year", sqlalchemy.Integer, primary_key=True, autoincrement=False),
+    sqlalchemy.Column("paid", sqlalchemy.Numeric(14, 2), nullable=False),
+    sqlalchemy.Column("count", sqlalchemy.Integer, nullable=False),
+    # звіти за рік читають усі договори цього року
+    sqlalchemy.Index("ix_payment_rollup_year", "year"),
+)
+# Функція й тригери — після всіх таблиць, бо посилаються і на payment, і на payment_rollup
+sqlalchemy.event.listen(metadata, "after_create", PAYMENT_ROLLUP_FUNCTION)
+for _ddl in PAYMENT_ROLLUP_TRIGGERS:
+    sqlalchemy.event.listen(metadata, "after_create", _ddl)
+
+# === Знімки звітів (utils.snapshots) ===
+ReportSnapshot = sqlalchemy.Table(
+    "report_snapshot",
+    metadata,
+    sqlalchemy.Column("report", sqlalchemy.String(64), primary_key=True),
+    # рік звіту, 0 — звіт без параметра
+    sqlalchemy.Column("key", sqlalchemy.Integer, primary_key=True, autoincrement=False),
+    sqlalchemy.Column("rows", sqlalchemy.Text, nullable=False),
+    sqlalchemy.Column("refreshed_at", sqlalchemy.DateTime, nullable=False),
 )
 
+# Звіт по ТОВ читає готові рядки; REPORT_SNAPSHOT_MAX_AGE — як часто їх перераховувати (с)
+report_snapshots = ReportSnapshots(
+    database,
+    ReportSnapshot,
+    max_age=timedelta(seconds=float(os.getenv("REPORT_SNAPSHOT_MAX_AGE", "900"))),
+)
+report_snapshots.register("company_report", get_company_report)
+report_snapshots.register("company_contract_types", get_company_contract_types)
+report_snapshots.register("company_sublease", get_company_sublease)
+report_snapshots.register("company_payments", get_company_payments_by_year)
+
+# === Версії даних для кешу звітів (utils.report_cache) ===
+PAYMENT_REPORT_TABLES = ("payment", "contract", "payer", "company", "inheritance_debt")
+LAND_REPORT_TABLES = ("land_plot", "contract_land_plot", "land_plot_owner", "contract", "company", "field", "payer")
+# payment_rollup змінюється лише тригером на payment, тож достатньо версії payment
+RENT_SUMMARY_TABLES = ("payment", "contract", "company", "contract_land_plot")
+VERSIONED_TABLES = tuple(dict.fromkeys(PAYMENT_REPORT_TABLES + LAND_REPORT_TABLES + RENT_SUMMARY_TABLES))
+sqlalchemy.event.listen(metadata, "after_create", data_version_function(invalidation.channel))
+for _ddl in data_version_triggers(VERSIONED_TABLES):
+    sqlalchemy.event.listen(metadata, "after_create", _ddl)
+
+# Сторінки звітів беруться з кешу, доки не зміниться жодна з їхніх таблиць; REPORT_CACHE_TTL — с
+report_cache = ReportCache(
+    ttl=float(os.getenv("REPORT_CACHE_TTL", "600")),
+    maxsize=int(os.getenv("REPORT_CACHE_SIZE", "256")),
+)
+invalidation.register(DATA_VERSION_CACHE, report_cache)
+report_cache.register("payment_report", get_payment_report_rows, PAYMENT_REPORT_TABLES)
+report_cache.register("land_report", get_land_report_rows, LAND_REPORT_TABLES)
+report_cache.register("rent_summary", get_rent_summary, RENT_SUMMARY_TABLES)
+
 # === Таблиця боргів перед спадкоємцями ===
 InheritanceDebt = sqlalchemy.Table(
     "inheritance_debt",
@@ -1336,6 +1598,10 @@ InheritanceDebt = sqlalchemy.Table(
     sqlalchemy.Column("date_recorded", sqlalchemy.Date, default=datetime.utcnow),
     sqlalchemy.Column("paid", sqlalchemy.Boolean, default=False),
     sqlalchemy.Column("payment_id", sqlalchemy.Integer, sqlalchemy.ForeignKey("payment.id"), nullable=True),
+    sqlalchemy.Index("ix_inheritance_debt_contract_id", "contract_id"),
+    sqlalchemy.Index("ix_inheritance_debt_payer_id", "payer_id"),
+    sqlalchemy.Index("ix_inheritance_debt_heir_id", "heir_id"),
+    sqlalchemy.Index("ix_inheritance_debt_payment_id", "payment_id"),
 )
 
 # === Таблиця потенційних пайовиків ===
@@ -1350,6 +1616,7 @@ PotentialPayer = sqlalchemy.Table(
     sqlalchemy.Column("note", sqlalchemy.String),
     sqlalchemy.Column("status", sqlalchemy.String, default="new"),
     sqlalchemy.Column("last_contact_date", sqlalchemy.Date),
+    trigram_index("ix_potential_payer_full_name_trgm", "full_name"),
 )
 
 # === Таблиця ділянок потенційних пайовиків ===
@@ -1364,6 +1631,8 @@ PotentialLandPlot = sqlalchemy.Table(
     ),
     sqlalchemy.Column("cadastre", sqlalchemy.String(25)),
     sqlalchemy.Column("area", sqlalchemy.Float),
+    sqlalchemy.Index("ix_potential_land_plot_payer_id", "potential_payer_id"),
+    trigram_index("ix_potential_land_plot_cadastre_trgm", "cadastre"),
 )
 
 # === Таблиця звернень пайовиків ===
@@ -1379,6 +1648,8 @@ PayerRequest = sqlalchemy.Table(
     sqlalchemy.Column("document_path", sqlalchemy.String),
     sqlalchemy.Column("responsible_user_id", sqlalchemy.Integer, sqlalchemy.ForeignKey("user.id")),
     sqlalchemy.Column("created_at", sqlalchemy.DateTime, default=datetime.utcnow),
+    sqlalchemy.Index("ix_payer_requests_payer_id", "payer_id"),
+    sqlalchemy.Index("ix_payer_requests_responsible_user_id", "responsible_user_id"),
 )
 
 # === Таблиця подій CRM ===
@@ -1396,7 +1667,52 @@ CRMEvent = sqlalchemy.Table(
     sqlalchemy.Column("created_at", sqlalchemy.DateTime, default=datetime.utcnow),
     sqlalchemy.Column("created_by_user_id", sqlalchemy.BigInteger),
     sqlalchemy.Column("reminder_status", JSONB, default=dict),
+    sqlalchemy.Index("ix_crm_events_status_datetime", "status", "event_datetime"),
+)
+# Фільтр подій за днем: date(event_datetime) = :d
+sqlalchemy.Index("ix_crm_events_event_date", sqlalchemy.func.date(CRMEvent.c.event_datetime))
+
+# === Оброблені оновлення Telegram (дедуплікація вебхука) ===
+ProcessedUpdate = sqlalchemy.Table(
+    "processed_update",
+    metadata,
+    sqlalchemy.Column("update_id", sqlalchemy.BigInteger, primary_key=True, autoincrement=False),
+    sqlalchemy.Column("created_at", sqlalchemy.DateTime, default=datetime.utcnow, index=True),
+)
+
+# === Стан бота (PTB persistence): user_data, chat_data, діалоги ===
+BotUserData = sqlalchemy.Table(
+    "bot_user_data",
+    metadata,
+    sqlalchemy.Column("user_id", sqlalchemy.BigInteger, primary_key=True, autoincrement=False),
+    sqlalchemy.Column("data", sqlalchemy.LargeBinary, nullable=False),
+    sqlalchemy.Column("updated_at", sqlalchemy.DateTime, default=datetime.utcnow),
+)
+
+BotChatData = sqlalchemy.Table(
+    "bot_chat_data",
+    metadata,
+    sqlalchemy.Column("chat_id", sqlalchemy.BigInteger, primary_key=True, autoincrement=False),
+    sqlalchemy.Column("data", sqlalchemy.LargeBinary, nullable=False),
+    sqlalchemy.Column("updated_at", sqlalchemy.DateTime, default=datetime.utcnow),
+)
+
+BotConversation = sqlalchemy.Table(
+    "bot_conversation",
+    metadata,
+    sqlalchemy.Column("name", sqlalchemy.String(64), primary_key=True),
+    sqlalchemy.Column("key", sqlalchemy.String(64), primary_key=True),
+    sqlalchemy.Column("state", sqlalchemy.LargeBinary, nullable=False),
+    sqlalchemy.Column("updated_at", sqlalchemy.DateTime, default=datetime.utcnow),
+)
+
+# Користувачі за telegram_id: читаються на кожне натискання кнопки.
+# None (невідомий користувач) теж кешується, але коротше.
+user_cache = TTLCache(
+    ttl=float(os.getenv("USER_CACHE_TTL", "60")),
+    negative_ttl=float(os.getenv("USER_CACHE_NEGATIVE_TTL", "10")),
 )
+invalidation.register("user", user_cache)
 
 async def add_user(
     tg_id: int,
@@ -1412,11 +1728,19 @@ async def add_user(
         is_active=True,
         created_at=datetime.utcnow(),
     )
-    return await database.execute(query)
+    user_id = await database.execute(query)
+    await invalidation.notify(database, "user", tg_id)
+    return user_id
 
 async def get_user_by_tg_id(tg_id: int):
+    user = user_cache.get(tg_id)
+    if user is not MISSING:
+        return user
+    generation = user_cache.generation()
     query = User.select().where(User.c.telegram_id == tg_id)
-    return await database.fetch_one(query)
+    user = await database.fetch_one(query)
+    user_cache.set(tg_id, user, generation)
+    return user
 
 async def get_users(role: str | None = None, is_active: bool | None = None):
     query = User.select()
@@ -1430,6 +1754,7 @@ async def get_users(role: str | None = None, is_active: bool | None = None):
 async def update_user(tg_id: int, data: dict):
     query = User.update().where(User.c.telegram_id == tg_id).values(**data)
     await database.execute(query)
+    await invalidation.notify(database, "user", tg_id)
 
 async def log_admin_action(admin_id: int, action: str):
     query = AdminAction.insert().values(
@@ -1452,33 +1777,41 @@ async def log_delete(admin_id: int, role: str, entity_type: str, entity_id: int
     await database.execute(query)
 
 # === Agreement Template helpers ===
+template_cache = TableCache(database, AgreementTemplate, order_by=AgreementTemplate.c.id, ttl=REFERENCE_CACHE_TTL)
+invalidation.register("agreement_template", template_cache)
+
 async def add_agreement_template(data: dict):
     query = AgreementTemplate.insert().values(**data)
-    return await database.execute(query)
+    template_id = await database.execute(query)
+    await invalidation.notify(database, "agreement_template")
+    return template_id
 
 async def get_agreement_templates(active_only: bool | None = None, template_type: str | None = None):
-    query = AgreementTemplate.select()
-    if active_only is not None:
-        query = query.where(AgreementTemplate.c.is_active == active_only)
-    if template_type:
-        query = query.where(AgreementTemplate.c.template_type == template_type)
-    query = query.order_by(AgreementTemplate.c.id)
-    return await database.fetch_all(query)
+    templates = await template_cache.all()
+    return [
+        t
+        for t in templates
+        if (active_only is None or t["is_active"] == active_only)
+        and (not template_type or t["template_type"] == template_type)
+    ]
 
 async def get_agreement_template(template_id: int):
-    query = AgreementTemplate.select().where(AgreementTemplate.c.id == template_id)
-    return await database.fetch_one(query)
+    return await template_cache.get(template_id)
 
 async def update_agreement_template(template_id: int, data: dict):
     query = AgreementTemplate.update().where(AgreementTemplate.c.id == template_id).values(**data)
     await database.execute(query)
+    await invalidation.notify(database, "agreement_template", template_id)
 
 async def delete_agreement_template(template_id: int):
     query = AgreementTemplate.delete().where(AgreementTemplate.c.id == template_id)
     await database.execute(query)
+    await invalidation.notify(database, "agreement_template", template_id)
 
 async def ensure_admin(tg_id: int, username: str | None = None):
     """Ensure a user exists with admin role and is active."""
+    # Читаємо повз кеш: на старті роль могли змінити в іншому процесі
+    user_cache.invalidate(tg_id)
     user = await get_user_by_tg_id(tg_id)
     if not user:
         await add_user(tg_id, username=username, role="admin")
@@ -1490,67 +1823,3 @@ async def ensure_admin(tg_id: int, username: str | None = None):
         update_data["is_active"] = True
     if update_data:
         await update_user(tg_id, update_data)
-
-# Create all tables if they do not exist.
-metadata.create_all(engine)
-
-# Ensure new columns exist for older databases
-with engine.begin() as conn:
-    conn.execute(sqlalchemy.text(
-        'ALTER TABLE "user" ADD COLUMN IF NOT EXISTS full_name VARCHAR(255)'
-    ))
-    conn.execute(sqlalchemy.text(
-        'ALTER TABLE "land_plot" ADD COLUMN IF NOT EXISTS region VARCHAR'
-    ))
-    conn.execute(sqlalchemy.text(
-        'ALTER TABLE "land_plot" ADD COLUMN IF NOT EXISTS district VARCHAR'
-    ))
-    conn.execute(sqlalchemy.text(
-        'ALTER TABLE "land_plot" ADD COLUMN IF NOT EXISTS council VARCHAR'
-    ))
-    conn.execute(sqlalchemy.text(
-        'ALTER TABLE "payer" ADD COLUMN IF NOT EXISTS bank_card VARCHAR'
-    ))
-    conn.execute(sqlalchemy.text(
-        'ALTER TABLE "payer" ADD COLUMN IF NOT EXISTS is_deceased BOOLEAN DEFAULT FALSE'
-    ))
-    conn.execute(sqlalchemy.text(
-        'ALTER TABLE "contract" ADD COLUMN IF NOT EXISTS rent_amount NUMERIC(12,2)'
-    ))
-    conn.execute(sqlalchemy.text(
-        'ALTER TABLE "contract" ADD COLUMN IF NOT EXISTS payer_id INTEGER REFERENCES payer(id)'
-    ))
-    conn.execute(sqlalchemy.text(
-        'ALTER TABLE "contract" ADD COLUMN IF NOT EXISTS status VARCHAR'
-    ))
-    conn.execute(sqlalchemy.text(
-        'ALTER TABLE "contract" ADD COLUMN IF NOT EXISTS registration_number VARCHAR'
-    ))
-    conn.execute(sqlalchemy.text(
-        'ALTER TABLE "contract" ADD COLUMN IF NOT EXISTS registration_date DATE'
-    ))
-    conn.execute(sqlalchemy.text(
-        'ALTER TABLE "contract" ADD COLUMN IF NOT EXISTS template_id INTEGER REFERENCES agreement_template(id)'
-    ))
-    conn.execute(sqlalchemy.text(
-        "ALTER TABLE \"agreement_template\" ADD COLUMN IF NOT EXISTS template_type VARCHAR(32) DEFAULT 'single'"
-    ))
-    conn.execute(sqlalchemy.text(
-        'ALTER TABLE "crm_events" ADD COLUMN IF NOT EXISTS event_datetime TIMESTAMP'
-    ))
-    conn.execute(sqlalchemy.text(
-        'ALTER TABLE "crm_events" ADD COLUMN IF NOT EXISTS created_by_user_id BIGINT'
-    ))
-    conn.execute(sqlalchemy.text(
-        "ALTER TABLE \"crm_events\" ADD COLUMN IF NOT EXISTS reminder_status JSONB DEFAULT '{}'::jsonb"
-    ))
-    conn.execute(sqlalchemy.text(
-        'ALTER TABLE "crm_events" ADD COLUMN IF NOT EXISTS responsible_user_id BIGINT NOT NULL DEFAULT 0'
-    ))
-    conn.execute(sqlalchemy.text(
-        'ALTER TABLE "payer_requests" ADD COLUMN IF NOT EXISTS responsible_user_id INTEGER REFERENCES "user"(id)'
-    ))
-    conn.execute(sqlalchemy.text(
-        'ALTER TABLE "payment" ADD COLUMN IF NOT EXISTS status VARCHAR DEFAULT \'paid\''
-    ))
-
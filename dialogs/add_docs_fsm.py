@@ -6,12 +6,9 @@ from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, InputFi
 from telegram.ext import (
     ConversationHandler, MessageHandler, CallbackQueryHandler, filters, ContextTypes
 )
-from PIL import Image
-from fpdf import FPDF
-from db import database, Payer, LandPlot, UploadedDocs
+from db import database, Payer, LandPlot, UploadedDocs, get_field
 from ftp_utils import upload_file_ftp, delete_file_ftp, download_file_ftp_to_memory
 import sqlalchemy
-from PyPDF2 import PdfReader, PdfWriter
 
 SELECT_DOC_TYPE, COLLECT_PHOTO, ASK_MORE = range(3)
 
@@ -50,6 +47,8 @@ def to_latin(text, default="file"):
     return name or default
 
 def repack_pdf(input_path, output_path):
+    from PyPDF2 import PdfReader, PdfWriter
+
     reader = PdfReader(input_path)
     writer = PdfWriter()
     for page in reader.pages:
@@ -118,6 +117,10 @@ async def collect_photo(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text("Фото отримано. Ще надсилайте або натисніть «Готово».")
 
 async def finish_photos(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # Pillow і fpdf потрібні лише тут — не завантажуємо їх під час старту
+    from PIL import Image
+    from fpdf import FPDF
+
     query = update.callback_query
     doc_type = context.user_data["current_doc_type"]
     photos = context.user_data.get("photos", [])
@@ -155,7 +158,7 @@ async def finish_photos(update: Update, context: ContextTypes.DEFAULT_TYPE):
         remote_file = f"{remote_dir}/{doc_type_file}"
     elif entity_type == "field":
         field_id = str(entity_id)
-        field = await database.fetch_one(Field.select().where(Field.c.id == entity_id))
+        field = await get_field(entity_id)
         field_name = field.name if field and hasattr(field, "name") and field.name else f"field_{field_id}"
         folder_name = field_name
         doc_type_file = to_latin(f"{field_id}_{doc_type}_{int(time.time())}")
@@ -324,6 +327,8 @@ async def cancel_delete_doc(update, context):
     await query.message.edit_text("Скасовано.")
 
 add_docs_conv = ConversationHandler(
+    name="add_docs_conv",
+    persistent=True,
     entry_points=[CallbackQueryHandler(start_add_docs, pattern=r"^add_docs:\w+:\d+$")],
     states={
         SELECT_DOC_TYPE: [CallbackQueryHandler(select_doc_type, pattern=r"^doc_type:.+")],
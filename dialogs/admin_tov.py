@@ -201,6 +201,8 @@ async def admin_tov_add_cancel(update, context):
     return ConversationHandler.END
 
 admin_tov_add_conv = ConversationHandler(
+    name="admin_tov_add_conv",
+    persistent=True,
     entry_points=[MessageHandler(filters.Regex("^➕ Додати ТОВ$"), admin_tov_add_start)],
     states={
         OPF_SELECT: [MessageHandler(filters.TEXT & ~filters.COMMAND, admin_tov_add_opf)],
@@ -292,6 +292,8 @@ async def replace_template_file(update: Update, context: ContextTypes.DEFAULT_TY
     return ConversationHandler.END
 
 add_template_conv = ConversationHandler(
+    name="add_template_conv",
+    persistent=True,
     entry_points=[
         CallbackQueryHandler(add_template_start, pattern=r"^template_add$"),
         MessageHandler(filters.Regex("^➕ Додати шаблон$"), add_template_start)
@@ -306,6 +308,8 @@ add_template_conv = ConversationHandler(
 )
 
 replace_template_conv = ConversationHandler(
+    name="replace_template_conv",
+    persistent=True,
     entry_points=[CallbackQueryHandler(replace_template_start, pattern=r"^template_replace:\d+$")],
     states={
         REPLACE_FILE: [MessageHandler(filters.Document.ALL, replace_template_file)],
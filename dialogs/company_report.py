@@ -1,3 +1,5 @@
+from datetime import datetime
+
 from telegram import Update, InputFile
 from telegram.ext import (
     ContextTypes,
@@ -10,12 +12,7 @@ from telegram.ext import (
 
 from handlers.menu import admin_only
 from dialogs.payer import to_menu
-from db import (
-    get_company_report,
-    get_company_contract_types,
-    get_company_sublease,
-    get_company_payments_by_year,
-)
+from db import report_snapshots
 from keyboards.reports import report_nav_kb
 from utils.company_report import company_report_to_excel
 from contract_generation_v2 import format_money
@@ -39,10 +36,27 @@ async def company_report_set_year(update: Update, context: ContextTypes.DEFAULT_
         return CR_YEAR
     context.user_data["cr_year"] = year
     await update.message.reply_text("Формую звіт...")
-    summary = await get_company_report(year)
-    types = await get_company_contract_types(year)
-    sublease = await get_company_sublease()
-    payments = await get_company_payments_by_year()
+    text = await _load_report(context, year)
+    await update.message.reply_text(text, reply_markup=report_nav_kb(False, False, refresh=True))
+    return CR_SHOW
+
+
+@admin_only
+async def company_report_refresh(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer("Оновлюю дані...")
+    text = await _load_report(context, context.user_data.get("cr_year", datetime.utcnow().year), refresh=True)
+    await query.message.edit_text(text, reply_markup=report_nav_kb(False, False, refresh=True))
+    return CR_SHOW
+
+
+async def _load_report(context: ContextTypes.DEFAULT_TYPE, year: int, refresh: bool = False) -> str:
+    """Read (or rebuild) the report snapshots for ``year`` and render the summary."""
+    load = report_snapshots.refresh if refresh else report_snapshots.get
+    summary, summary_at = await load("company_report", year)
+    types, types_at = await load("company_contract_types", year)
+    sublease, sublease_at = await load("company_sublease")
+    payments, payments_at = await load("company_payments")
     context.user_data["cr_summary"] = summary
     context.user_data["cr_types"] = types
     context.user_data["cr_sublease"] = sublease
@@ -66,9 +80,12 @@ async def company_report_set_year(update: Update, context: ContextTypes.DEFAULT_
             )
         )
     text = "\n\n".join(lines) if lines else "Немає даних."
-    kb = report_nav_kb(False, False)
-    await update.message.reply_text(text, reply_markup=kb)
-    return CR_SHOW
+    return f"{text}\n\n{_freshness(min(summary_at, types_at, sublease_at, payments_at))}"
+
+
+def _freshness(refreshed_at: datetime) -> str:
+    minutes = int((datetime.utcnow() - refreshed_at).total_seconds() // 60)
+    return "🕒 Дані щойно оновлено" if minutes < 1 else f"🕒 Дані оновлено {minutes} хв тому"
 
 
 @admin_only
@@ -87,12 +104,17 @@ async def company_report_export(update: Update, context: ContextTypes.DEFAULT_TY
 
 
 company_report_conv = ConversationHandler(
+    name="company_report_conv",
+    persistent=True,
     entry_points=[
         MessageHandler(filters.Regex("^🏢 Звіт по ТОВ$"), company_report_start)
     ],
     states={
         CR_YEAR: [MessageHandler(filters.TEXT & ~filters.COMMAND, company_report_set_year)],
-        CR_SHOW: [CallbackQueryHandler(company_report_export, pattern=r"^payrep_export$")],
+        CR_SHOW: [
+            CallbackQueryHandler(company_report_export, pattern=r"^payrep_export$"),
+            CallbackQueryHandler(company_report_refresh, pattern=r"^payrep_refresh$"),
+        ],
     },
     fallbacks=[CommandHandler("start", to_menu)],
 )
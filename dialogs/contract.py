@@ -33,6 +33,10 @@ from db import (
     UploadedDocs,
     Payment,
     PayerContract,
+    get_companies,
+    get_company,
+    get_agreement_template,
+    load_ledger,
 )
 from keyboards.menu import contracts_menu
 from dialogs.post_creation import prompt_add_docs
@@ -47,6 +51,7 @@ from template_utils import analyze_template, build_unresolved_message
 import sqlalchemy
 from utils.names import format_payers_line
 from utils.payers import get_payers_for_contract
+from utils.outbound import outbound
 
 logger = logging.getLogger(__name__)
 
@@ -156,7 +161,7 @@ async def contract_back(update: Update, context: ContextTypes.DEFAULT_TYPE):
     state = context.user_data.get("current_state")
     if state == SET_DURATION:
         # Back to company selection
-        companies = await database.fetch_all(sqlalchemy.select(Company))
+        companies = await get_companies()
         if not companies:
             await query.message.reply_text("Спочатку додайте хоча б одне ТОВ!", reply_markup=contracts_menu)
             context.user_data.clear()
@@ -278,7 +283,7 @@ async def finish_plot_selection(update: Update, context: ContextTypes.DEFAULT_TY
 
 # ==== ДОДАВАННЯ ДОГОВОРУ ====
 async def add_contract_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    companies = await database.fetch_all(sqlalchemy.select(Company))
+    companies = await get_companies()
     if not companies:
         await update.message.reply_text("Спочатку додайте хоча б одне ТОВ!", reply_markup=contracts_menu)
         return ConversationHandler.END
@@ -464,6 +469,8 @@ async def set_rent_amount(update: Update, context: ContextTypes.DEFAULT_TYPE):
     return ConversationHandler.END
 
 add_contract_conv = ConversationHandler(
+    name="add_contract_conv",
+    persistent=True,
     entry_points=[MessageHandler(filters.Regex("^➕ Створити договір$"), add_contract_start)],
     states={
         CHOOSE_COMPANY: [
@@ -519,22 +526,20 @@ async def show_contracts(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not rows:
         await msg.reply_text("Договори ще не створені.", reply_markup=contracts_menu)
         return
+    items = []
     for r in rows:
         cname = r["short_name"] or r["full_name"] or "—"
         payers = await get_payers_for_contract(r["id"])
         payer_line = format_payers_line(payers)
-        btn = InlineKeyboardButton("Картка", callback_data=f"agreement_card:{r['id']}")
+        btn = InlineKeyboardButton(f"Картка №{r['number']}", callback_data=f"agreement_card:{r['id']}")
         number_part = html.escape(r["number"])
         text = (
             f"📄 Договір №{number_part}\n"
             f"{payer_line}\n"
             f"🏢 Орендар: {html.escape(cname)}"
         )
-        await msg.reply_text(
-            text,
-            reply_markup=InlineKeyboardMarkup([[btn]]),
-            parse_mode="HTML",
-        )
+        items.append((text, [btn]))
+    await outbound.send_many(context.bot, msg.chat_id, items, parse_mode="HTML")
 
 
 async def agreement_card(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -544,7 +549,7 @@ async def agreement_card(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not contract:
         await query.answer("Договір не знайдено!", show_alert=True)
         return
-    company = await database.fetch_one(sqlalchemy.select(Company).where(Company.c.id == contract["company_id"]))
+    company = await get_company(contract["company_id"])
     payer = await database.fetch_one(sqlalchemy.select(Payer).where(Payer.c.id == contract["payer_id"]))
     lands = await database.fetch_all(
         sqlalchemy.select(LandPlot).join(ContractLandPlot, LandPlot.c.id == ContractLandPlot.c.land_plot_id).where(
@@ -559,7 +564,7 @@ async def agreement_card(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
     tmpl = None
     if contract["template_id"]:
-        tmpl = await database.fetch_one(sqlalchemy.select(AgreementTemplate).where(AgreementTemplate.c.id == contract["template_id"]))
+        tmpl = await get_agreement_template(contract["template_id"])
     template_name = tmpl["name"] if tmpl else "—"
 
     status_text = status_values.get(contract["status"], contract["status"] or "-")
@@ -1022,6 +1027,8 @@ async def edit_contract_lands(update: Update, context: ContextTypes.DEFAULT_TYPE
 
 
 edit_contract_conv = ConversationHandler(
+    name="edit_contract_conv",
+    persistent=True,
     entry_points=[CallbackQueryHandler(edit_contract_start, pattern=r"^edit_contract:\d+$")],
     states={
         EDIT_SIGNED: [MessageHandler(filters.TEXT & ~filters.COMMAND, edit_contract_signed)],
@@ -1104,6 +1111,8 @@ async def input_reg_date(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 change_status_conv = ConversationHandler(
+    name="change_status_conv",
+    persistent=True,
     entry_points=[CallbackQueryHandler(change_status_start, pattern=r"^change_status:\d+$")],
     states={
         CHANGE_STATUS: [CallbackQueryHandler(select_status, pattern=r"^select_status:\w+$")],
@@ -1118,22 +1127,20 @@ async def payment_summary_cb(update: Update, context: ContextTypes.DEFAULT_TYPE)
     query = update.callback_query
     contract_id = int(query.data.split(":")[1])
     contract = await database.fetch_one(sqlalchemy.select(Contract).where(Contract.c.id == contract_id))
-    payments = await database.fetch_all(sqlalchemy.select(Payment).where(Payment.c.agreement_id == contract_id))
-    by_year: dict[int, float] = {}
-    for p in payments:
-        y = p["payment_date"].year
-        by_year[y] = by_year.get(y, 0) + float(p["amount"])
-    rent = float(contract["rent_amount"] or 0)
     start_year = contract["date_valid_from"].year if contract["date_valid_from"] else datetime.utcnow().year
     end_year = contract["date_valid_to"].year if contract["date_valid_to"] else datetime.utcnow().year
+    ledger = await load_ledger(Contract.c.id == contract_id, years=range(start_year, end_year + 1))
+    row = ledger.row(contract_id)
     lines = []
-    for y in range(start_year, end_year + 1):
-        total = by_year.get(y, 0.0)
-        if total >= rent:
-            status = "✅ Виплачено повністю"
-        else:
-            status = f"❌ Борг: {format_money(rent - total)}"
-        lines.append(f"{y}: {format_money(total)} — {status}")
+    if row is not None:
+        for y, accrued, total in zip(
+            ledger.years.tolist(), ledger.accrued[row].round(2).tolist(), ledger.paid[row].round(2).tolist()
+        ):
+            if total >= accrued:
+                status = "✅ Виплачено повністю"
+            else:
+                status = f"❌ Борг: {format_money(accrued - total)}"
+            lines.append(f"{y}: {format_money(total)} — {status}")
     if not lines:
         lines.append("Немає даних.")
     lines.append("\n⬅️ Назад")
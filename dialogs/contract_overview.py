@@ -10,7 +10,7 @@ from telegram.ext import (
 
 from handlers.menu import admin_only
 from dialogs.payer import to_menu
-from db import get_contract_overview
+from db import get_contract_overview, iterate_contract_overview_rows
 from keyboards.reports import report_nav_kb
 from utils.reports import contracts_overview_to_excel, CONTRACT_STATUS_LABELS
 from contract_generation_v2 import format_money
@@ -21,7 +21,7 @@ from contract_generation_v2 import format_money
 @admin_only
 async def contract_overview_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     msg = await update.message.reply_text("Формую звіт...")
-    summary, companies, statuses, years, _ = await get_contract_overview()
+    summary, companies, statuses, years = await get_contract_overview()
     lines: list[str] = [
         "📑 <b>Узагальнений звіт по договорах</b>",
         f"📄 Договорів: {summary['contracts']}",
@@ -52,14 +52,18 @@ async def contract_overview_start(update: Update, context: ContextTypes.DEFAULT_
 @admin_only
 async def contract_overview_export_cb(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
-    summary, companies, statuses, years, rows = await get_contract_overview()
-    bio = await contracts_overview_to_excel(rows, companies, statuses, years, summary)
+    summary, companies, statuses, years = await get_contract_overview()
+    bio = await contracts_overview_to_excel(
+        iterate_contract_overview_rows(), companies, statuses, years, summary
+    )
     await query.message.reply_document(document=InputFile(bio, filename="contracts_overview.xlsx"))
     await query.answer()
     return CO_SHOW
 
 
 contract_overview_conv = ConversationHandler(
+    name="contract_overview_conv",
+    persistent=True,
     entry_points=[
         MessageHandler(filters.Regex("^📑 Узагальнений звіт по договорах$"), contract_overview_start)
     ],
@@ -77,6 +77,8 @@ async def edit_company_save(update: Update, context: ContextTypes.DEFAULT_TYPE):
     return ConversationHandler.END
 
 edit_company_conv = ConversationHandler(
+    name="edit_company_conv",
+    persistent=True,
     entry_points=[CallbackQueryHandler(edit_company_menu, pattern=r"^company_edit:\d+$")],
     states={
         EDIT_SELECT: [
@@ -27,9 +27,8 @@ async def edit_field_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
     field_id = int(field_id)
     context.user_data["edit_field_id"] = field_id
     context.user_data["edit_field_key"] = field_key
-    from db import Field
-    select = Field.select().where(Field.c.id == field_id)
-    field = await database.fetch_one(select)
+    from db import get_field
+    field = await get_field(field_id)
     old_value = getattr(field, field_key, "")
     await query.message.edit_text(
         f"Поточне значення: <b>{old_value if old_value else '(порожньо)'}</b>\n"
@@ -48,13 +47,16 @@ async def edit_field_save(update: Update, context: ContextTypes.DEFAULT_TYPE):
         except ValueError:
             await update.message.reply_text("Некоректна площа. Введіть число!")
             return EDIT_VALUE
-    from db import Field
+    from db import Field, invalidation
     query_db = Field.update().where(Field.c.id == field_id).values({field_key: value})
     await database.execute(query_db)
+    await invalidation.notify(database, "field", field_id)
     await update.message.reply_text("✅ Зміни збережено!")
     return ConversationHandler.END
 
 edit_field_conv = ConversationHandler(
+    name="edit_field_conv",
+    persistent=True,
     entry_points=[CallbackQueryHandler(edit_field_menu, pattern=r"^edit_field:\d+$")],
     states={
         EDIT_SELECT: [
@@ -68,6 +68,8 @@ async def edit_land_save(update: Update, context: ContextTypes.DEFAULT_TYPE):
     return ConversationHandler.END
 
 edit_land_conv = ConversationHandler(
+    name="edit_land_conv",
+    persistent=True,
     entry_points=[CallbackQueryHandler(edit_land_menu, pattern=r"^edit_land:\d+$")],
     states={
         EDIT_SELECT: [
@@ -1,6 +1,7 @@
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ConversationHandler, MessageHandler, CallbackQueryHandler, filters, ContextTypes
 from db import database, LandPlot, Payer, LandPlotOwner
+from utils.payers import search_payers
 import sqlalchemy
 
 ASK_OWNER_SEARCH, ASK_OWNER_SELECT = range(2)
@@ -33,7 +34,7 @@ async def search_owner(update: Update, context: ContextTypes.DEFAULT_TYPE):
         temp = await database.fetch_all(Payer.select().where(Payer.c.id == q_int))
         res.extend([r for r in temp if r.id not in found_ids])
         found_ids.update([r.id for r in temp])
-    temp = await database.fetch_all(Payer.select().where(Payer.c.name.ilike(f"%{q}%")))
+    temp = await search_payers(q)
     res.extend([r for r in temp if r.id not in found_ids])
     found_ids.update([r.id for r in temp])
 
@@ -66,6 +67,8 @@ async def select_owner(update: Update, context: ContextTypes.DEFAULT_TYPE):
     return ConversationHandler.END
 
 edit_land_owner_conv = ConversationHandler(
+    name="edit_land_owner_conv",
+    persistent=True,
     entry_points=[CallbackQueryHandler(start_edit_owner, pattern=r"^edit_land_owner:\d+$")],
     states={
         ASK_OWNER_SEARCH: [MessageHandler(filters.TEXT & ~filters.COMMAND, search_owner)],
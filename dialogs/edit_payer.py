@@ -114,6 +114,8 @@ async def toggle_deceased(update: Update, context: ContextTypes.DEFAULT_TYPE):
     return await edit_payer_menu(update, context)
 
 edit_payer_conv = ConversationHandler(
+    name="edit_payer_conv",
+    persistent=True,
     entry_points=[CallbackQueryHandler(edit_payer_menu, pattern=r"^edit_payer:\d+$")],
     states={
         EDIT_SELECT: [
@@ -5,7 +5,7 @@ from telegram.ext import (
     ContextTypes, ConversationHandler, MessageHandler, filters
 )
 from keyboards.menu import fields_menu
-from db import database, Field, UploadedDocs
+from db import database, Field, UploadedDocs, get_fields, get_field, invalidation
 from dialogs.post_creation import prompt_add_docs
 import sqlalchemy
 from ftp_utils import download_file_ftp, delete_file_ftp  # <-- додаємо FTP-утиліти
@@ -44,6 +44,7 @@ async def add_field_area(update: Update, context: ContextTypes.DEFAULT_TYPE):
     name = context.user_data["field_name"]
     query = Field.insert().values(name=name, area_actual=area)
     field_id = await database.execute(query)
+    await invalidation.notify(database, "field")
 
     context.user_data.clear()
     await prompt_add_docs(
@@ -57,6 +58,8 @@ async def add_field_area(update: Update, context: ContextTypes.DEFAULT_TYPE):
     return ConversationHandler.END
 
 add_field_conv = ConversationHandler(
+    name="add_field_conv",
+    persistent=True,
     entry_points=[MessageHandler(filters.Regex("^➕ Додати поле$"), add_field_start)],
     states={
         ASK_FIELD_NAME: [MessageHandler(filters.TEXT & ~filters.COMMAND, add_field_name)],
@@ -68,8 +71,7 @@ add_field_conv = ConversationHandler(
 # ==== СПИСОК ПОЛІВ ====
 async def show_fields(update: Update, context: ContextTypes.DEFAULT_TYPE):
     msg = update.message if update.message else update.callback_query.message
-    query = sqlalchemy.select(Field)
-    fields = await database.fetch_all(query)
+    fields = await get_fields()
     if not fields:
         await msg.reply_text("Поля ще не створені.", reply_markup=fields_menu)
         return
@@ -84,7 +86,7 @@ async def show_fields(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def field_card(update, context):
     query = update.callback_query
     field_id = int(query.data.split(":")[1])
-    field = await database.fetch_one(sqlalchemy.select(Field).where(Field.c.id == field_id))
+    field = await get_field(field_id)
     if not field:
         await query.answer("Поле не знайдено!")
         return
@@ -134,7 +136,7 @@ async def delete_field_prompt(update: Update, context: ContextTypes.DEFAULT_TYPE
     if not user or user["role"] != "admin":
         await query.answer("⛔ У вас немає прав на видалення.", show_alert=True)
         return
-    field = await database.fetch_one(Field.select().where(Field.c.id == field_id))
+    field = await get_field(field_id)
     if not field:
         await query.answer("Поле не знайдено!", show_alert=True)
         return
@@ -156,7 +158,7 @@ async def delete_field(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not user or user["role"] != "admin":
         await query.answer("⛔ У вас немає прав на видалення.", show_alert=True)
         return
-    field = await database.fetch_one(Field.select().where(Field.c.id == field_id))
+    field = await get_field(field_id)
     if not field:
         await query.answer("Поле не знайдено!", show_alert=True)
         return
@@ -181,6 +183,7 @@ async def delete_field(update: Update, context: ContextTypes.DEFAULT_TYPE):
             UploadedDocs.delete().where(UploadedDocs.c.id.in_([d["id"] for d in docs]))
         )
     await database.execute(Field.delete().where(Field.c.id == field_id))
+    await invalidation.notify(database, "field", field_id)
     linked_info = f"docs:{len(docs)}" if docs else ""
     await log_delete(update.effective_user.id, user["role"], "field", field_id, field.name, linked_info)
     await query.message.edit_text("✅ Обʼєкт успішно видалено")
@@ -57,6 +57,8 @@ async def fields_report_export_cb(update: Update, context: ContextTypes.DEFAULT_
 
 
 fields_report_conv = ConversationHandler(
+    name="fields_report_conv",
+    persistent=True,
     entry_points=[
         MessageHandler(
             filters.Regex("^📈 Статистика по полях$"), fields_report_start
@@ -190,6 +190,8 @@ async def payment_step(update: Update, context: ContextTypes.DEFAULT_TYPE):
     return ConversationHandler.END
 
 add_heir_conv = ConversationHandler(
+    name="add_heir_conv",
+    persistent=True,
     entry_points=[CallbackQueryHandler(start_add_heir, pattern=r"^add_heir:\d+$")],
     states={
         CONFIRM: [CallbackQueryHandler(confirm_step, pattern=r"^heir_(confirm|cancel)$")],
@@ -13,10 +13,12 @@ from telegram.ext import (
     ContextTypes, ConversationHandler, MessageHandler, CallbackQueryHandler, filters
 )
 from keyboards.menu import lands_menu
-from db import database, LandPlot, Field, Payer, UploadedDocs, LandPlotOwner
+from db import database, LandPlot, Field, Payer, UploadedDocs, LandPlotOwner, get_fields, get_field
 from dialogs.post_creation import prompt_add_docs
 import sqlalchemy
 from ftp_utils import download_file_ftp, delete_file_ftp
+from utils.outbound import outbound
+from utils.payers import search_payers
 
 # --- Стани для FSM додавання ділянки ---
 (
@@ -83,8 +85,7 @@ async def land_ngo(update: Update, context: ContextTypes.DEFAULT_TYPE):
         ngo = None
     context.user_data["ngo"] = ngo
     # Показати вибір поля
-    query = sqlalchemy.select(Field)
-    fields = await database.fetch_all(query)
+    fields = await get_fields()
     if not fields:
         await update.message.reply_text("Спочатку створіть хоча б одне поле командою ➕ Додати поле!", reply_markup=lands_menu)
         return ConversationHandler.END
@@ -209,9 +210,7 @@ async def select_owner(update: Update, context: ContextTypes.DEFAULT_TYPE):
     return await finalize_land(update, context)
 async def search_owner(update: Update, context: ContextTypes.DEFAULT_TYPE):
     term = update.message.text.strip()
-    rows = await database.fetch_all(
-        sqlalchemy.select(Payer).where(Payer.c.name.ilike(f"%{term}%")).limit(10)
-    )
+    rows = await search_payers(term, limit=10)
     if not rows:
         await update.message.reply_text("Нічого не знайдено. Спробуйте ще:")
         return SEARCH_OWNER
@@ -306,6 +305,8 @@ async def start_land_for_payer(update: Update, context: ContextTypes.DEFAULT_TYP
     return ASK_CADASTER
 
 add_land_conv = ConversationHandler(
+    name="add_land_conv",
+    persistent=True,
     entry_points=[
         MessageHandler(filters.Regex("^➕ Додати ділянку$"), add_land_start),
         CallbackQueryHandler(start_land_for_payer, pattern=r"^start_land:\d+$"),
@@ -338,18 +339,13 @@ async def show_lands(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not lands:
         await msg.reply_text("Ділянки ще не створені.", reply_markup=lands_menu)
         return
-    field_ids = {l['field_id'] for l in lands if l['field_id']}
-    fields_map = {}
-    if field_ids:
-        fields = await database.fetch_all(sqlalchemy.select(Field).where(Field.c.id.in_(field_ids)))
-        fields_map = {f['id']: f['name'] for f in fields}
+    fields_map = {f['id']: f['name'] for f in await get_fields()}
+    items = []
     for l in lands:
         fname = fields_map.get(l['field_id'], '—')
-        btn = InlineKeyboardButton("Картка", callback_data=f"land_card:{l['id']}")
-        await msg.reply_text(
-            f"{l['id']}. {l['cadaster']} — {l['area']:.4f} га, поле: {fname}",
-            reply_markup=InlineKeyboardMarkup([[btn]])
-        )
+        btn = InlineKeyboardButton(f"Картка {l['id']}", callback_data=f"land_card:{l['id']}")
+        items.append((f"{l['id']}. {l['cadaster']} — {l['area']:.4f} га, поле: {fname}", [btn]))
+    await outbound.send_many(context.bot, msg.chat_id, items)
 
 # --- Картка ділянки ---
 async def land_card(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -359,7 +355,7 @@ async def land_card(update: Update, context: ContextTypes.DEFAULT_TYPE):
     field_name = "—"
     owners_txt = "—"
     if land and land['field_id']:
-        field = await database.fetch_one(sqlalchemy.select(Field).where(Field.c.id == land['field_id']))
+        field = await get_field(land['field_id'])
         if field:
             field_name = field['name']
     owners = []
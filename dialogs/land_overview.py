@@ -74,6 +74,8 @@ async def land_overview_export_cb(update: Update, context: ContextTypes.DEFAULT_
 
 
 land_overview_conv = ConversationHandler(
+    name="land_overview_conv",
+    persistent=True,
     entry_points=[
         MessageHandler(
             filters.Regex("^📋 Узагальнений звіт по ділянках$"), land_overview_start
@@ -9,9 +9,10 @@ from telegram.ext import (
 )
 from handlers.menu import admin_only
 from dialogs.payer import to_menu
-from db import get_land_report_rows
+from db import report_cache, land_report_cursor
 from keyboards.reports import report_nav_kb
 from utils.reports import land_report_to_excel
+from utils.pagination import CursorStack
 from contract_generation_v2 import format_money
 from datetime import datetime
 
@@ -149,14 +150,13 @@ async def land_set_end_date(update: Update, context: ContextTypes.DEFAULT_TYPE):
         except ValueError:
             await update.message.reply_text("Некоректна дата. Введіть у форматі ДД.ММ.РРРР або '-' для пропуску:")
             return LR_END_DATE
-    context.user_data["lr_offset"] = 0
+    CursorStack.reset(context.user_data, "lr_cursors")
     msg = await update.message.reply_text("Формую звіт...")
     return await show_land_page(msg, context)
 
 
-async def show_land_page(msg, context: ContextTypes.DEFAULT_TYPE):
-    offset = context.user_data.get("lr_offset", 0)
-    rows = await get_land_report_rows(
+def _land_filters(context: ContextTypes.DEFAULT_TYPE) -> tuple:
+    return (
         context.user_data.get("lr_payer"),
         context.user_data.get("lr_company"),
         context.user_data.get("lr_contract"),
@@ -167,11 +167,17 @@ async def show_land_page(msg, context: ContextTypes.DEFAULT_TYPE):
         context.user_data.get("lr_ngo_from"),
         context.user_data.get("lr_ngo_to"),
         context.user_data.get("lr_end_date"),
-        limit=PAGE_SIZE + 1,
-        offset=offset,
+    )
+
+
+async def show_land_page(msg, context: ContextTypes.DEFAULT_TYPE):
+    pages = CursorStack(context.user_data, "lr_cursors")
+    rows = await report_cache.page(
+        "land_report", *_land_filters(context), limit=PAGE_SIZE + 1, after=pages.current
     )
     has_next = len(rows) > PAGE_SIZE
     rows = rows[:PAGE_SIZE]
+    context.user_data["lr_next"] = land_report_cursor(rows[-1]) if has_next else None
     lines: list[str] = []
     for r in rows:
         rent = format_money(r["rent_amount"]) if r.get("rent_amount") else "—"
@@ -187,7 +193,7 @@ async def show_land_page(msg, context: ContextTypes.DEFAULT_TYPE):
         )
     if not lines:
         lines.append("Немає даних.")
-    kb = report_nav_kb(offset > 0, has_next)
+    kb = report_nav_kb(pages.has_prev, has_next)
     await msg.edit_text("\n\n".join(lines), reply_markup=kb)
     return LR_SHOW
 
@@ -196,30 +202,19 @@ async def show_land_page(msg, context: ContextTypes.DEFAULT_TYPE):
 async def land_page_cb(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     direction = query.data.split("_")[1]
-    offset = context.user_data.get("lr_offset", 0)
+    pages = CursorStack(context.user_data, "lr_cursors")
     if direction == "next":
-        offset += PAGE_SIZE
+        if context.user_data.get("lr_next"):
+            pages.next(context.user_data["lr_next"])
     else:
-        offset = max(0, offset - PAGE_SIZE)
-    context.user_data["lr_offset"] = offset
+        pages.prev()
     return await show_land_page(query.message, context)
 
 
 @admin_only
 async def land_export_cb(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
-    rows = await get_land_report_rows(
-        context.user_data.get("lr_payer"),
-        context.user_data.get("lr_company"),
-        context.user_data.get("lr_contract"),
-        context.user_data.get("lr_cadaster"),
-        context.user_data.get("lr_field"),
-        context.user_data.get("lr_area_from"),
-        context.user_data.get("lr_area_to"),
-        context.user_data.get("lr_ngo_from"),
-        context.user_data.get("lr_ngo_to"),
-        context.user_data.get("lr_end_date"),
-    )
+    rows = await report_cache.page("land_report", *_land_filters(context))
     bio = await land_report_to_excel(rows)
     await query.message.reply_document(document=InputFile(bio, filename="land_report.xlsx"))
     await query.answer()
@@ -227,6 +222,8 @@ async def land_export_cb(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 land_report_conv = ConversationHandler(
+    name="land_report_conv",
+    persistent=True,
     entry_points=[MessageHandler(filters.Regex("^📍 Звіт по ділянках$"), land_report_start)],
     states={
         LR_PAYER: [MessageHandler(filters.TEXT & ~filters.COMMAND, land_set_payer)],
@@ -34,6 +34,7 @@ from dialogs.post_creation import prompt_add_docs
 from keyboards.menu import payers_menu, main_menu, main_menu_admin
 from ftp_utils import download_file_ftp, delete_file_ftp
 from contract_generation_v2 import format_money
+from utils.outbound import outbound
 
 import re
 import sqlalchemy
@@ -546,13 +547,13 @@ async def show_payers(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not payers:
         await update.message.reply_text("Список порожній!")
         return
+    items = []
     for p in payers:
         status = " 🕯" if getattr(p, "is_deceased", False) else ""
-        button = InlineKeyboardButton("Картка", callback_data=f"payer_card:{p.id}")
-        await update.message.reply_text(
-            f"{p.id}. {p.name}{status} (ІПН: {p.ipn})",
-            reply_markup=InlineKeyboardMarkup([[button]])
-        )
+        button = InlineKeyboardButton(f"Картка {p.id}", callback_data=f"payer_card:{p.id}")
+        items.append((f"{p.id}. {p.name}{status} (ІПН: {p.ipn})", [button]))
+    # Кілька пайовиків в одному повідомленні замість повідомлення на кожного
+    await outbound.send_many(context.bot, update.effective_chat.id, items)
 
 from telegram.constants import ParseMode
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
@@ -842,6 +843,8 @@ async def to_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     return ConversationHandler.END
 
 add_payer_conv = ConversationHandler(
+    name="add_payer_conv",
+    persistent=True,
     entry_points=[MessageHandler(filters.Regex("^➕ Додати пайовика$"), add_payer_start)],
     states={
         FIO: [MessageHandler(filters.TEXT & ~filters.COMMAND, add_payer_fio), CallbackQueryHandler(skip_field, pattern=r"^skip:\d+$")],
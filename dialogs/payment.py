@@ -24,12 +24,16 @@ from db import (
     LandPlot,
     InheritanceDebt,
     settle_inheritance_debt,
-    get_payment_report_rows,
+    report_cache,
+    payment_report_cursor,
+    load_ledger,
 )
 from contract_generation_v2 import format_money
 from handlers.menu import admin_only
 from keyboards.reports import status_filter_kb, heirs_filter_kb, report_nav_kb
 from utils.reports import payments_to_excel
+from utils.payers import search_payers
+from utils.pagination import CursorStack
 
 PAY_AMOUNT, PAY_DATE, PAY_TYPE, PAY_NOTES, PAY_CONFIRM = range(5)
 
@@ -196,6 +200,8 @@ async def payment_save(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 add_payment_conv = ConversationHandler(
+    name="add_payment_conv",
+    persistent=True,
     entry_points=[CallbackQueryHandler(add_payment_start, pattern=r"^add_payment:\d+$")],
     states={
         PAY_AMOUNT: [
@@ -234,11 +240,7 @@ async def global_add_payment_start(update: Update, context: ContextTypes.DEFAULT
 
 async def global_add_payment_search(update: Update, context: ContextTypes.DEFAULT_TYPE):
     term = update.message.text.strip()
-    rows = await database.fetch_all(
-        sqlalchemy.select(Payer.c.id, Payer.c.name, Payer.c.is_deceased)
-        .where(Payer.c.name.ilike(f"%{term}%"))
-        .limit(10)
-    )
+    rows = await search_payers(term, limit=10)
     if not rows:
         await update.message.reply_text("Нічого не знайдено. Спробуйте ще:")
         return SEARCH_PAYER
@@ -379,34 +381,38 @@ async def payment_reports_start(update: Update, context: ContextTypes.DEFAULT_TY
     await update.message.reply_text("\U0001F4C6 Оберіть рік:", reply_markup=kb)
 
 
-@admin_only
-async def payment_report_cb(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    query = update.callback_query
-    year = int(query.data.split(":")[1])
-    rows = await database.fetch_all(
-        sqlalchemy.select(
-            Contract.c.id,
-            Contract.c.number,
-            Contract.c.rent_amount,
-            Payer.c.name,
-            sqlalchemy.func.coalesce(sqlalchemy.func.sum(Payment.c.amount), 0).label("paid"),
-        )
+async def _year_report_rows(year: int) -> list[dict]:
+    """Contracts with rent accrued or paid in ``year``, by payer name."""
+    contracts = await database.fetch_all(
+        sqlalchemy.select(Contract.c.id, Contract.c.number, Payer.c.name)
         .select_from(Contract)
         .join(Payer, Payer.c.id == Contract.c.payer_id)
-        .outerjoin(
-            Payment,
-            (Payment.c.agreement_id == Contract.c.id)
-            & (sqlalchemy.extract('year', Payment.c.payment_date) == year),
-        )
-        .group_by(Contract.c.id, Payer.c.name)
         .order_by(Payer.c.name)
     )
+    ledger = await load_ledger(years=[year])
+    rows = []
+    for c in contracts:
+        row = ledger.row(c["id"])
+        if row is None:
+            continue
+        accrued = round(float(ledger.accrued[row, 0]), 2)
+        paid = round(float(ledger.paid[row, 0]), 2)
+        if accrued or paid:
+            rows.append({"name": c["name"], "number": c["number"], "accrued": accrued, "paid": paid})
+    return rows
+
+
+@admin_only
+async def payment_report_cb(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    year = int(query.data.split(":")[1])
+    rows = await _year_report_rows(year)
     total = 0.0
     lines = [f"\U0001F4CA Звіт по виплатах за {year} рік:", ""]
     for r in rows:
-        paid = float(r["paid"] or 0)
+        paid = r["paid"]
         total += paid
-        rent = float(r["rent_amount"] or 0)
+        rent = r["accrued"]
         fio = short_fio(r["name"])
         if paid >= rent:
             lines.append(f"\U0001F464 {fio} — \U0001F4C4 №{r['number']} — ✅ {format_money(paid)}")
@@ -429,30 +435,12 @@ async def payment_report_cb(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def payment_report_csv_cb(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     year = int(query.data.split(":")[1])
-    rows = await database.fetch_all(
-        sqlalchemy.select(
-            Contract.c.number,
-            Payer.c.name,
-            Contract.c.rent_amount,
-            sqlalchemy.func.coalesce(sqlalchemy.func.sum(Payment.c.amount), 0).label("paid"),
-        )
-        .select_from(Contract)
-        .join(Payer, Payer.c.id == Contract.c.payer_id)
-        .outerjoin(
-            Payment,
-            (Payment.c.agreement_id == Contract.c.id)
-            & (sqlalchemy.extract('year', Payment.c.payment_date) == year),
-        )
-        .group_by(Contract.c.id, Payer.c.name)
-        .order_by(Payer.c.name)
-    )
+    rows = await _year_report_rows(year)
     output = StringIO()
     writer = csv.writer(output)
     writer.writerow(["Payer", "Contract", "Rent", "Paid", "Debt"])
     for r in rows:
-        rent = float(r["rent_amount"] or 0)
-        paid = float(r["paid"] or 0)
-        writer.writerow([r["name"], r["number"], rent, paid, rent - paid])
+        writer.writerow([r["name"], r["number"], r["accrued"], r["paid"], round(r["accrued"] - r["paid"], 2)])
     output.seek(0)
     bio = BytesIO(output.getvalue().encode("utf-8"))
     await query.message.reply_document(
@@ -461,6 +449,8 @@ async def payment_report_csv_cb(update: Update, context: ContextTypes.DEFAULT_TY
 
 
 global_add_payment_conv = ConversationHandler(
+    name="global_add_payment_conv",
+    persistent=True,
     entry_points=[MessageHandler(filters.Regex("^➕ Додати виплату$"), global_add_payment_start)],
     states={
         SEARCH_PAYER: [MessageHandler(filters.TEXT & ~filters.COMMAND, global_add_payment_search)],
@@ -542,31 +532,37 @@ async def report_set_heirs(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     heirs = query.data.split(":")[1] == "yes"
     context.user_data["report_heirs"] = heirs
-    context.user_data["report_offset"] = 0
+    CursorStack.reset(context.user_data, "report_cursors")
     return await show_report_page(query.message, context)
 
 
-async def show_report_page(msg, context: ContextTypes.DEFAULT_TYPE):
-    offset = context.user_data.get("report_offset", 0)
-    rows = await get_payment_report_rows(
+def _report_filters(context: ContextTypes.DEFAULT_TYPE) -> tuple:
+    return (
         context.user_data.get("report_start"),
         context.user_data.get("report_end"),
         context.user_data.get("report_payer"),
         context.user_data.get("report_company"),
         context.user_data.get("report_status"),
         context.user_data.get("report_heirs", False),
-        limit=PAGE_SIZE + 1,
-        offset=offset,
+    )
+
+
+async def show_report_page(msg, context: ContextTypes.DEFAULT_TYPE):
+    pages = CursorStack(context.user_data, "report_cursors")
+    # Сторінки кешуються, тож гортання назад і вперед не повторює запит
+    rows = await report_cache.page(
+        "payment_report", *_report_filters(context), limit=PAGE_SIZE + 1, after=pages.current
     )
     has_next = len(rows) > PAGE_SIZE
     rows = rows[:PAGE_SIZE]
+    context.user_data["report_next"] = payment_report_cursor(rows[-1]) if has_next else None
     lines = ["Дата | Пайовик | Компанія | Сума | Статус | Спадкоємець"]
     for r in rows:
         lines.append(
             f"{r['payment_date'].strftime('%d.%m.%Y')} | {r['payer_name']} | {r['company_name']} | "
             f"{format_money(r['amount'])} | {r['status']} | {'так' if r['is_heir'] else 'ні'}"
         )
-    kb = report_nav_kb(offset > 0, has_next)
+    kb = report_nav_kb(pages.has_prev, has_next)
     await msg.edit_text("\n".join(lines), reply_markup=kb)
     return REPORT_SHOW
 
@@ -575,26 +571,19 @@ async def show_report_page(msg, context: ContextTypes.DEFAULT_TYPE):
 async def report_page_cb(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     direction = query.data.split("_")[1]
-    offset = context.user_data.get("report_offset", 0)
+    pages = CursorStack(context.user_data, "report_cursors")
     if direction == "next":
-        offset += PAGE_SIZE
+        if context.user_data.get("report_next"):
+            pages.next(context.user_data["report_next"])
     else:
-        offset = max(0, offset - PAGE_SIZE)
-    context.user_data["report_offset"] = offset
+        pages.prev()
     return await show_report_page(query.message, context)
 
 
 @admin_only
 async def report_export_cb(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
-    rows = await get_payment_report_rows(
-        context.user_data.get("report_start"),
-        context.user_data.get("report_end"),
-        context.user_data.get("report_payer"),
-        context.user_data.get("report_company"),
-        context.user_data.get("report_status"),
-        context.user_data.get("report_heirs", False),
-    )
+    rows = await report_cache.page("payment_report", *_report_filters(context))
     bio = await payments_to_excel(rows)
     await query.message.reply_document(
         document=InputFile(bio, filename="payments_report.xlsx")
@@ -608,6 +597,8 @@ async def report_export_cb(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 payment_report_conv = ConversationHandler(
+    name="payment_report_conv",
+    persistent=True,
     entry_points=[
         MessageHandler(filters.Regex("^💳 Звіти по виплатах$"), payment_report_start),
         MessageHandler(filters.Regex("^🧾 Звіт по виплатах$"), payment_report_start),
@@ -23,6 +23,10 @@ from db import (
     Payer,
     LandPlot,
 )
+from crm.potential_payer_flexible_search import (
+    search_potential_payers,
+    search_potential_payers_by_cadastre,
+)
 
 from utils.fsm_navigation import (
     BACK_BTN,
@@ -262,6 +266,8 @@ async def finish_cb(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 add_potential_conv = ConversationHandler(
+    name="add_potential_conv",
+    persistent=True,
     entry_points=[MessageHandler(filters.Regex("^➕ Додати$"), add_start)],
     states={
         FIO: [MessageHandler(filters.TEXT & ~filters.COMMAND, get_phone)],
@@ -615,11 +621,7 @@ async def search_cad_cb(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def search_fio_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
     text = update.message.text.strip()
-    rows = await database.fetch_all(
-        sqlalchemy.select(PotentialPayer).where(
-            PotentialPayer.c.full_name.ilike(f"%{text}%")
-        )
-    )
+    rows = await search_potential_payers(text)
     await show_search_results(update, rows)
     return ConversationHandler.END
 
@@ -640,18 +642,14 @@ async def search_id_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def search_cad_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
     cad = normalize_cadastre(update.message.text)
-    pattern = f"%{cad}%"
-    rows = await database.fetch_all(
-        sqlalchemy.select(PotentialPayer)
-        .join(PotentialLandPlot, PotentialLandPlot.c.potential_payer_id == PotentialPayer.c.id)
-        .where(PotentialLandPlot.c.cadastre.ilike(pattern))
-        .distinct()
-    )
+    rows = await search_potential_payers_by_cadastre(cad)
     await show_search_results(update, rows)
     return ConversationHandler.END
 
 
 filter_potential_conv = ConversationHandler(
+    name="filter_potential_conv",
+    persistent=True,
     entry_points=[MessageHandler(filters.Regex("^🔍 Фільтр$"), filter_start)],
     states={
         FILTER_MENU: [
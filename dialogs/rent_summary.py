@@ -10,7 +10,7 @@ from telegram.ext import (
 
 from handlers.menu import admin_only
 from dialogs.payer import to_menu
-from db import get_rent_summary
+from db import report_cache
 from keyboards.reports import rent_status_filter_kb, report_nav_kb
 from utils.reports import rent_summary_to_excel
 from contract_generation_v2 import format_money
@@ -56,14 +56,18 @@ async def rent_set_status(update: Update, context: ContextTypes.DEFAULT_TYPE):
     return await show_rent_page(query.message, context)
 
 
-async def show_rent_page(msg, context: ContextTypes.DEFAULT_TYPE):
-    offset = context.user_data.get("rent_offset", 0)
-    rows = await get_rent_summary(
+def _rent_filters(context: ContextTypes.DEFAULT_TYPE) -> tuple:
+    return (
         context.user_data["rent_year"],
         context.user_data.get("rent_company"),
         context.user_data.get("rent_status"),
-        limit=PAGE_SIZE + 1,
-        offset=offset,
+    )
+
+
+async def show_rent_page(msg, context: ContextTypes.DEFAULT_TYPE):
+    offset = context.user_data.get("rent_offset", 0)
+    rows = await report_cache.page(
+        "rent_summary", *_rent_filters(context), limit=PAGE_SIZE + 1, offset=offset
     )
     has_next = len(rows) > PAGE_SIZE
     rows = rows[:PAGE_SIZE]
@@ -107,11 +111,7 @@ async def rent_page_cb(update: Update, context: ContextTypes.DEFAULT_TYPE):
 @admin_only
 async def rent_export_cb(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
-    rows = await get_rent_summary(
-        context.user_data["rent_year"],
-        context.user_data.get("rent_company"),
-        context.user_data.get("rent_status"),
-    )
+    rows = await report_cache.page("rent_summary", *_rent_filters(context))
     bio = await rent_summary_to_excel(rows)
     await query.message.reply_document(
         document=InputFile(bio, filename="rent_summary.xlsx")
@@ -121,6 +121,8 @@ async def rent_export_cb(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 rent_summary_conv = ConversationHandler(
+    name="rent_summary_conv",
+    persistent=True,
     entry_points=[
         MessageHandler(filters.Regex("^💰 Зведення по орендній платі$"), rent_summary_start)
     ],
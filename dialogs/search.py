@@ -1,14 +1,22 @@
-from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
+from telegram import (
+    InlineKeyboardButton,
+    InlineKeyboardMarkup,
+    InlineQueryResultArticle,
+    InputTextMessageContent,
+    Update,
+)
 from telegram.ext import (
     ConversationHandler,
     MessageHandler,
     CommandHandler,
+    InlineQueryHandler,
     filters,
     ContextTypes,
 )
 from dialogs.payer import to_menu
 from db import (
     database,
+    get_user_by_tg_id,
     Payer,
     LandPlot,
     Contract,
@@ -16,8 +24,14 @@ from db import (
     PayerContract,
 )
 from keyboards.menu import search_menu, contracts_menu
-from utils.payers import get_payers_for_contract
+from utils.payers import get_payers_for_contract, search_payers
 from utils.names import format_payers_line
+from utils.search import SEARCH_LIMIT, fuzzy_match, fuzzy_search, similarity
+from utils.global_search import global_search
+from utils.outbound import outbound
+from utils.cache import TTLCache, MISSING
+import asyncio
+import os
 import sqlalchemy
 import re
 import html
@@ -32,6 +46,9 @@ def format_cadaster(text: str) -> str | None:
 SEARCH_INPUT = 1001  # Унікальний стан пошуку
 SEARCH_LAND_INPUT = 1002
 SEARCH_CONTRACT_INPUT = 1003
+SEARCH_GLOBAL_INPUT = 1004
+
+KIND_ICONS = {"payer": "👤", "contract": "📄", "land": "🌍", "counterparty": "🏢"}
 
 async def payer_search_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text("Введіть ID, ІПН, телефон або фрагмент ПІБ для пошуку пайовика:")
@@ -60,7 +77,7 @@ async def payer_search_do(update: Update, context: ContextTypes.DEFAULT_TYPE):
             results.extend([r for r in res if r.id not in found_ids])
             found_ids.update([r.id for r in res])
     # 4. Фрагмент ПІБ (регістр неважливий)
-    res = await database.fetch_all(Payer.select().where(Payer.c.name.ilike(f"%{q}%")))
+    res = await search_payers(q)
     results.extend([r for r in res if r.id not in found_ids])
     found_ids.update([r.id for r in res])
 
@@ -77,6 +94,8 @@ async def payer_search_do(update: Update, context: ContextTypes.DEFAULT_TYPE):
     return ConversationHandler.END
 
 search_payer_conv = ConversationHandler(
+    name="search_payer_conv",
+    persistent=True,
     entry_points=[MessageHandler(filters.Regex("^🔍 Пошук пайовика$"), payer_search_start)],
     states={
         SEARCH_INPUT: [MessageHandler(filters.TEXT & ~filters.COMMAND, payer_search_do)],
@@ -91,24 +110,32 @@ async def land_search_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 async def land_search_do(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    cad = format_cadaster(update.message.text)
-    if not cad:
-        await update.message.reply_text("Некоректний номер. Спробуйте ще:")
-        return SEARCH_LAND_INPUT
-    row = await database.fetch_one(sqlalchemy.select(LandPlot).where(LandPlot.c.cadaster == cad))
-    if not row:
+    text = update.message.text.strip()
+    cad = format_cadaster(text)
+    if cad:
+        rows = await database.fetch_all(sqlalchemy.select(LandPlot).where(LandPlot.c.cadaster == cad))
+    else:
+        # Неповний номер — шукаємо за фрагментом
+        rows = await fuzzy_search(database, sqlalchemy.select(LandPlot), [LandPlot.c.cadaster], text, limit=10)
+        if not rows:
+            await update.message.reply_text("Некоректний номер. Спробуйте ще:")
+            return SEARCH_LAND_INPUT
+    if not rows:
         await update.message.reply_text("Ділянку не знайдено.")
         return ConversationHandler.END
-    btn = InlineKeyboardButton("Картка", callback_data=f"land_card:{row['id']}")
-    add_btn = InlineKeyboardButton("➕ Додати до договору", callback_data=f"add_land_to_contract:{row['id']}")
-    await update.message.reply_text(
-        f"{row['id']}. {row['cadaster']} — {row['area']:.4f} га",
-        reply_markup=InlineKeyboardMarkup([[btn, add_btn]]),
-    )
+    for row in rows:
+        btn = InlineKeyboardButton("Картка", callback_data=f"land_card:{row['id']}")
+        add_btn = InlineKeyboardButton("➕ Додати до договору", callback_data=f"add_land_to_contract:{row['id']}")
+        await update.message.reply_text(
+            f"{row['id']}. {row['cadaster']} — {row['area']:.4f} га",
+            reply_markup=InlineKeyboardMarkup([[btn, add_btn]]),
+        )
     return ConversationHandler.END
 
 
 search_land_conv = ConversationHandler(
+    name="search_land_conv",
+    persistent=True,
     entry_points=[MessageHandler(filters.Regex("^🔍 Пошук ділянки$"), land_search_start)],
     states={
         SEARCH_LAND_INPUT: [MessageHandler(filters.TEXT & ~filters.COMMAND, land_search_do)],
@@ -124,7 +151,14 @@ async def contract_search_start(update: Update, context: ContextTypes.DEFAULT_TY
 
 async def contract_search_do(update: Update, context: ContextTypes.DEFAULT_TYPE):
     q = update.message.text.strip()
-    payer_direct = sqlalchemy.alias(Payer, name="payer_direct")
+    # Кожна гілка UNION йде своїм індексом (trigram по номеру й ПІБ, далі payer_id);
+    # OR по кількох обʼєднаних таблицях індекси не використав би
+    matched_payers = sqlalchemy.select(Payer.c.id).where(fuzzy_match(Payer.c.name, q))
+    contract_ids = sqlalchemy.union(
+        sqlalchemy.select(Contract.c.id).where(fuzzy_match(Contract.c.number, q)),
+        sqlalchemy.select(PayerContract.c.contract_id).where(PayerContract.c.payer_id.in_(matched_payers)),
+        sqlalchemy.select(Contract.c.id).where(Contract.c.payer_id.in_(matched_payers)),
+    )
     query = (
         sqlalchemy.select(
             Contract.c.id,
@@ -134,17 +168,11 @@ async def contract_search_do(update: Update, context: ContextTypes.DEFAULT_TYPE)
         )
         .select_from(Contract)
         .join(Company, Company.c.id == Contract.c.company_id)
-        .outerjoin(PayerContract, PayerContract.c.contract_id == Contract.c.id)
-        .outerjoin(Payer, Payer.c.id == PayerContract.c.payer_id)
-        .outerjoin(payer_direct, payer_direct.c.id == Contract.c.payer_id)
-        .where(
-            (Contract.c.number.ilike(f"%{q}%"))
-            | (Payer.c.name.ilike(f"%{q}%"))
-            | (payer_direct.c.name.ilike(f"%{q}%"))
-        )
-        .distinct()
+        .where(Contract.c.id.in_(contract_ids))
+        .order_by(similarity(Contract.c.number, q).desc(), Contract.c.number)
+        .limit(SEARCH_LIMIT)
     )
-    rows = await database.fetch_all(query)
+    rows = await database.fetch_all(query) if q else []
     if not rows:
         await update.message.reply_text("❗ Договір не знайдено.")
     else:
@@ -175,9 +203,129 @@ async def contract_search_do(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
 
 search_contract_conv = ConversationHandler(
+    name="search_contract_conv",
+    persistent=True,
     entry_points=[MessageHandler(filters.Regex("^🔍 Пошук договору$"), contract_search_start)],
     states={
         SEARCH_CONTRACT_INPUT: [MessageHandler(filters.TEXT & ~filters.COMMAND, contract_search_do)],
     },
     fallbacks=[CommandHandler("start", to_menu)],
 )
+
+
+def format_search_result(row) -> tuple[str, list[InlineKeyboardButton]]:
+    """Text line and card button for one row of :func:`global_search`."""
+    icon = KIND_ICONS[row["kind"]]
+    if row["kind"] == "payer":
+        status = " 🕯" if row["flag"] else ""
+        return (
+            f"{icon} {row['title']}{status} (ІПН: {row['detail'] or '—'})",
+            [InlineKeyboardButton("Картка", callback_data=f"payer_card:{row['id']}")],
+        )
+    if row["kind"] == "contract":
+        return (
+            f"{icon} Договір №{row['title']} — {row['detail'] or '—'}",
+            [InlineKeyboardButton("Картка", callback_data=f"agreement_card:{row['id']}")],
+        )
+    if row["kind"] == "land":
+        area = f"{float(row['detail']):.4f} га" if row["detail"] else "—"
+        return (
+            f"{icon} {row['title']} — {area}",
+            [InlineKeyboardButton("Картка", callback_data=f"land_card:{row['id']}")],
+        )
+    # Картка контрагента відкривається лише з каталогу
+    return f"{icon} {row['title']} (ЄДРПОУ: {row['detail']})", []
+
+
+async def global_search_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await update.message.reply_text(
+        "Введіть ІПН, телефон, ЄДРПОУ, кадастровий номер, номер договору або фрагмент ПІБ / назви:"
+    )
+    return SEARCH_GLOBAL_INPUT
+
+
+async def global_search_do(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    rows = await global_search(update.message.text)
+    if not rows:
+        await update.message.reply_text("Нічого не знайдено. Спробуйте ще:")
+        return SEARCH_GLOBAL_INPUT
+    await outbound.send_many(
+        context.bot, update.effective_chat.id, [format_search_result(r) for r in rows]
+    )
+    return ConversationHandler.END
+
+
+global_search_conv = ConversationHandler(
+    name="global_search_conv",
+    persistent=True,
+    entry_points=[MessageHandler(filters.Regex("^🔎 Знайти все$"), global_search_start)],
+    states={
+        SEARCH_GLOBAL_INPUT: [MessageHandler(filters.TEXT & ~filters.COMMAND, global_search_do)],
+    },
+    fallbacks=[CommandHandler("start", to_menu)],
+)
+
+
+# === Inline-режим: @bot <запит> з будь-якого чату ===
+
+INLINE_KINDS = ("payer", "contract", "land")
+INLINE_PAGE_SIZE = 20
+INLINE_MAX_RESULTS = int(os.getenv("INLINE_MAX_RESULTS", "100"))
+# Клієнт шле запит на кожне натискання клавіші; чекаємо паузу в наборі
+INLINE_DEBOUNCE = float(os.getenv("INLINE_DEBOUNCE_MS", "400")) / 1000
+INLINE_CACHE_TIME = int(os.getenv("INLINE_CACHE_TIME", "30"))
+
+inline_cache = TTLCache(ttl=INLINE_CACHE_TIME, maxsize=1000)
+_latest_inline: dict[int, str] = {}
+
+
+async def _inline_rows(text: str) -> list:
+    key = " ".join(text.lower().split())
+    rows = inline_cache.get(key)
+    if rows is MISSING:
+        generation = inline_cache.generation()
+        rows = await global_search(text, limit=INLINE_MAX_RESULTS, kinds=INLINE_KINDS)
+        inline_cache.set(key, rows, generation)
+    return rows
+
+
+def _inline_article(row) -> InlineQueryResultArticle:
+    text, _buttons = format_search_result(row)
+    title, _, description = text.partition(" — ")
+    return InlineQueryResultArticle(
+        id=f"{row['kind']}:{row['id']}",
+        title=title,
+        description=description or None,
+        input_message_content=InputTextMessageContent(text),
+    )
+
+
+async def inline_search(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.inline_query
+    text = query.query.strip()
+    user = await get_user_by_tg_id(query.from_user.id)
+    if not text or not user or not user["is_active"]:
+        await query.answer([], cache_time=INLINE_CACHE_TIME, is_personal=True)
+        return
+    offset = int(query.offset) if query.offset.isdigit() else 0
+    if offset == 0 and inline_cache.get(" ".join(text.lower().split())) is MISSING:
+        user_id = query.from_user.id
+        _latest_inline[user_id] = query.id
+        await asyncio.sleep(INLINE_DEBOUNCE)
+        if _latest_inline.get(user_id) != query.id:
+            # Користувач друкує далі — цей запит уже нікому не потрібен
+            return
+        del _latest_inline[user_id]
+    rows = await _inline_rows(text)
+    page = rows[offset:offset + INLINE_PAGE_SIZE]
+    next_offset = str(offset + INLINE_PAGE_SIZE) if offset + INLINE_PAGE_SIZE < len(rows) else ""
+    await query.answer(
+        [_inline_article(r) for r in page],
+        cache_time=INLINE_CACHE_TIME,
+        is_personal=True,
+        next_offset=next_offset,
+    )
+
+
+# block=False: наступні натискання того ж користувача не чекають на цей запит
+inline_search_handler = InlineQueryHandler(inline_search, block=False)
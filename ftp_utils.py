@@ -3,6 +3,9 @@ from ftplib import FTP, error_perm
 from os import getenv
 from io import BytesIO
 
+from utils.metrics import track_ftp
+
+@track_ftp
 def download_file_ftp_to_memory(remote_file):
     """
     Скачує файл з FTP у пам'ять (RAM), повертає BytesIO-об'єкт і ім'я файла.
@@ -45,6 +48,7 @@ def ensure_dirs(ftp, remote_dir):
         ftp.cwd(d)  # обов'язково заходити в кожну папку по черзі!
     # Після створення і переходу залишаємося у фінальній теці
 
+@track_ftp
 def upload_file_ftp(local_file, remote_file):
     from os import getenv
     ftp = FTP(getenv('FTP_HOST'))
@@ -59,6 +63,7 @@ def upload_file_ftp(local_file, remote_file):
     ftp.quit()
 
 
+@track_ftp
 def download_file_ftp(remote_file, local_file):
     from os import getenv
     from ftplib import FTP, error_perm
@@ -79,6 +84,7 @@ def download_file_ftp(remote_file, local_file):
     print("Download finished, file size:", os.path.getsize(local_file))
 
 
+@track_ftp
 def delete_file_ftp(remote_file):
     """
     Видаляє файл з FTP-сервера.
@@ -658,6 +658,8 @@ async def cmd_unblock(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 # --- Conversation handlers for user management ---
 add_user_conv = ConversationHandler(
+    name="add_user_conv",
+    persistent=True,
     entry_points=[CallbackQueryHandler(add_user_start, pattern=r"^user_add$")],
     states={
         ADD_USER_ID: [MessageHandler(filters.TEXT & ~filters.COMMAND, add_user_get_name)],
@@ -667,6 +669,8 @@ add_user_conv = ConversationHandler(
 )
 
 change_role_conv = ConversationHandler(
+    name="change_role_conv",
+    persistent=True,
     entry_points=[CallbackQueryHandler(change_role_start, pattern=r"^user_role$")],
     states={
         CHANGE_ROLE_ID: [MessageHandler(filters.TEXT & ~filters.COMMAND, change_role_get_role)],
@@ -676,6 +680,8 @@ change_role_conv = ConversationHandler(
 )
 
 block_user_conv = ConversationHandler(
+    name="block_user_conv",
+    persistent=True,
     entry_points=[CallbackQueryHandler(block_user_start, pattern=r"^user_block$")],
     states={
         BLOCK_USER_ID: [MessageHandler(filters.TEXT & ~filters.COMMAND, block_user_finish)],
@@ -684,6 +690,8 @@ block_user_conv = ConversationHandler(
 )
 
 change_name_conv = ConversationHandler(
+    name="change_name_conv",
+    persistent=True,
     entry_points=[CallbackQueryHandler(change_name_start, pattern=r"^user_fullname$")],
     states={
         CHANGE_NAME_ID: [MessageHandler(filters.TEXT & ~filters.COMMAND, change_name_get_name)],
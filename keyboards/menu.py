@@ -138,6 +138,7 @@ reports_menu_user = ReplyKeyboardMarkup(
 # --- Меню пошуку ---
 search_menu = ReplyKeyboardMarkup(
     [
+        ["🔎 Знайти все"],
         ["🔍 Пошук пайовика"],
         ["🔍 Пошук ділянки"],
         ["🔍 Пошук договору"],
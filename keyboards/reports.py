@@ -44,8 +44,8 @@ def heirs_filter_kb() -> InlineKeyboardMarkup:
     )
 
 
-def report_nav_kb(has_prev: bool, has_next: bool) -> InlineKeyboardMarkup:
-    """Pagination and export keyboard."""
+def report_nav_kb(has_prev: bool, has_next: bool, refresh: bool = False) -> InlineKeyboardMarkup:
+    """Pagination and export keyboard, optionally with a refresh button."""
     rows: list[list[InlineKeyboardButton]] = []
     nav_row: list[InlineKeyboardButton] = []
     if has_prev:
@@ -55,4 +55,6 @@ def report_nav_kb(has_prev: bool, has_next: bool) -> InlineKeyboardMarkup:
     if nav_row:
         rows.append(nav_row)
     rows.append([InlineKeyboardButton("📤 Експорт", callback_data="payrep_export")])
+    if refresh:
+        rows.append([InlineKeyboardButton("🔄 Оновити", callback_data="payrep_refresh")])
     return InlineKeyboardMarkup(rows)
@@ -1,5 +1,8 @@
+import asyncio
 import os
+import functools
 from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
 from telegram import Update
 from telegram.ext import (
     Application, CommandHandler, MessageHandler, CallbackQueryHandler,
@@ -62,7 +65,13 @@ from dialogs.payer import (
 )
 from dialogs.heir import add_heir_conv
 from dialogs.edit_payer import edit_payer_conv
-from dialogs.search import search_payer_conv, search_land_conv, search_contract_conv
+from dialogs.search import (
+    global_search_conv,
+    inline_search_handler,
+    search_payer_conv,
+    search_land_conv,
+    search_contract_conv,
+)
 from dialogs.field import add_field_conv, show_fields, delete_field, delete_field_prompt, to_fields_list, field_card, edit_field
 from dialogs.land import (
     add_land_conv,
@@ -109,7 +118,22 @@ from dialogs.edit_land import edit_land_conv
 from dialogs.edit_land_owner import edit_land_owner_conv
 from dialogs.add_docs_fsm import add_docs_conv, send_pdf, delete_pdf, confirm_delete_doc, cancel_delete_doc  # тільки FTP!
 from dialogs.post_creation import skip_add_docs
-from db import database, ensure_admin
+from db import (
+    database,
+    DATABASE_URL,
+    invalidation,
+    user_cache,
+    company_cache,
+    field_cache,
+    template_cache,
+    report_snapshots,
+    report_cache,
+    ensure_admin,
+    ProcessedUpdate,
+    BotUserData,
+    BotChatData,
+    BotConversation,
+)
 
 from dialogs.admin_tov import admin_tov_add_conv
 from dialogs.edit_company import edit_company_conv
@@ -133,19 +157,54 @@ from crm.event_reminders import start_reminder_tasks, stop_reminder_tasks
 from crm.payer_request import add_request_conv
 from crm.fsm_view_payer_requests import view_requests_conv
 from crm.fsm_update_payer_request import update_request_conv
+from utils.update_queue import UpdateQueue
+from utils.update_dedup import UpdateDeduplicator
+from utils.menu_router import MenuButtonHandler
+from utils.pg_persistence import PostgresPersistence
+from utils.session_store import session_store
+from utils.outbound import outbound
+from utils import metrics
 TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 WEBHOOK_PATH = "/webhook"
 WEBHOOK_URL = os.getenv("WEBHOOK_URL")
 
 app = FastAPI()
-application = Application.builder().token(TOKEN).build()
+# Стан діалогів і user_data пишеться в Postgres пакетами раз на PERSISTENCE_INTERVAL секунд
+persistence = PostgresPersistence(
+    database,
+    BotUserData,
+    BotChatData,
+    BotConversation,
+    update_interval=float(os.getenv("PERSISTENCE_INTERVAL", "5")),
+    # PERSISTENCE_SHARED=1 — кілька воркерів/реплік: стан діалогу читається й пишеться на кожне оновлення
+    shared=os.getenv("PERSISTENCE_SHARED") == "1",
+)
+application = (
+    Application.builder()
+    .token(TOKEN)
+    .request(metrics.TrackedRequest(connection_pool_size=int(os.getenv("BOT_API_POOL_SIZE", "256"))))
+    .persistence(persistence)
+    .build()
+)
 DEFAULT_ADMIN_IDS = [int(i) for i in os.getenv("ADMIN_IDS", "370806943").split(",") if i]
 is_initialized = False
+update_queue = UpdateQueue(
+    metrics.track_updates(functools.partial(persistence.dispatch, application)),
+    workers=int(os.getenv("UPDATE_WORKERS", "8")),
+    maxsize=int(os.getenv("UPDATE_QUEUE_SIZE", "1000")),
+)
+# UPDATE_DEDUP_SHARED=1 claims update ids in Postgres when several replicas run
+update_dedup = UpdateDeduplicator(
+    window=int(os.getenv("UPDATE_DEDUP_WINDOW", "10000")),
+    database=database,
+    table=ProcessedUpdate if os.getenv("UPDATE_DEDUP_SHARED") == "1" else None,
+)
 
 @app.on_event("startup")
 async def on_startup():
     global is_initialized
     await database.connect()
+    invalidation.start(DATABASE_URL)
     for admin_id in DEFAULT_ADMIN_IDS:
         await ensure_admin(admin_id)
     if not is_initialized:
@@ -153,10 +212,23 @@ async def on_startup():
         await application.bot.set_webhook(WEBHOOK_URL)
         start_reminder_tasks(application)
         is_initialized = True
+    # start() запускає періодичний запис persistence
+    await application.start()
+    update_queue.start()
+    session_store.start(application)
+    report_snapshots.start()
 
 @app.on_event("shutdown")
 async def on_shutdown():
+    await update_queue.stop()
+    await session_store.stop()
+    await report_snapshots.stop()
     await stop_reminder_tasks()
+    # stop() робить останній запис persistence, тому до відключення від БД
+    if application.running:
+        await application.stop()
+    await application.shutdown()
+    await invalidation.stop()
     await database.disconnect()
 
 # === Основні handlers ===
@@ -169,44 +241,50 @@ application.add_handler(CommandHandler("demote", cmd_demote))
 application.add_handler(CommandHandler("block", cmd_block))
 application.add_handler(CommandHandler("unblock", cmd_unblock))
 application.add_handler(CommandHandler("refresh", refresh_menu))
-application.add_handler(MessageHandler(filters.Regex("^◀️ Назад$"), to_main_menu))
-application.add_handler(MessageHandler(filters.Regex("^🌐 e-Землевпорядник$"), ezem_menu_handler))
-application.add_handler(MessageHandler(filters.Regex("^🧩 CRM$"), crm_menu_handler))
-application.add_handler(MessageHandler(filters.Regex("^📊 Звіти$"), reports_menu_handler))
-application.add_handler(MessageHandler(filters.Regex("^🚛 Логістика$"), logistics_menu_handler))
-application.add_handler(MessageHandler(filters.Regex("^🤖 Розпізнавання документів$"), doc_recognition_handler))
-application.add_handler(MessageHandler(filters.Regex("^📁 Пайовики$"), payers_menu_handler))
-application.add_handler(MessageHandler(filters.Regex("^🌍 Ділянки$"), lands_menu_handler))
-application.add_handler(MessageHandler(filters.Regex("^📄 Договори$"), contracts_menu_handler))
-application.add_handler(MessageHandler(filters.Regex("^🧾 Виплати$"), payments_menu_handler))
-application.add_handler(MessageHandler(filters.Regex("^📆 Події / Нагадування$"), ezem_events_handler))
-application.add_handler(MessageHandler(filters.Regex("^📬 Звернення та заяви$"), inbox_menu_handler))
-application.add_handler(MessageHandler(filters.Regex("^🔍 Пошук$"), search_menu_handler))
-application.add_handler(MessageHandler(filters.Regex("^👨‍👩‍👧‍👦 Спадкоємці$"), heirs_menu_handler))
-application.add_handler(MessageHandler(filters.Regex("^⚙️ Адмін-панель$"), admin_panel_handler))
-application.add_handler(MessageHandler(filters.Regex("^🧑‍🌾 Потенційні пайовики$"), crm_potential_handler))
-application.add_handler(MessageHandler(filters.Regex("^👥 Поточні пайовики$"), crm_current_handler))
-application.add_handler(MessageHandler(filters.Regex("^📅 Планування$"), crm_planning_handler))
-application.add_handler(MessageHandler(filters.Regex("^📬 Звернення$"), inbox_menu_handler))
-application.add_handler(MessageHandler(filters.Regex("^📆 Події$"), crm_events_handler))
-application.add_handler(MessageHandler(filters.Regex("^🧠 Нагадування$"), crm_reminders_handler))
-application.add_handler(MessageHandler(filters.Regex("^➕ Додати рейс$"), logistics_add_trip_handler))
-application.add_handler(MessageHandler(filters.Regex("^📋 Журнал рейсів$"), logistics_journal_handler))
-application.add_handler(MessageHandler(filters.Regex("^🛻 Техніка$"), logistics_vehicles_handler))
-application.add_handler(MessageHandler(filters.Regex("^🧾 Контрагенти$"), logistics_counterparties_handler))
-application.add_handler(MessageHandler(filters.Regex("^📄 Шаблони ТТН$"), logistics_ttn_handler))
+application.add_handler(MenuButtonHandler({
+    "◀️ Назад": to_main_menu,
+    "🌐 e-Землевпорядник": ezem_menu_handler,
+    "🧩 CRM": crm_menu_handler,
+    "📊 Звіти": reports_menu_handler,
+    "🚛 Логістика": logistics_menu_handler,
+    "🤖 Розпізнавання документів": doc_recognition_handler,
+    "📁 Пайовики": payers_menu_handler,
+    "🌍 Ділянки": lands_menu_handler,
+    "📄 Договори": contracts_menu_handler,
+    "🧾 Виплати": payments_menu_handler,
+    "📆 Події / Нагадування": ezem_events_handler,
+    "📬 Звернення та заяви": inbox_menu_handler,
+    "🔍 Пошук": search_menu_handler,
+    "👨‍👩‍👧‍👦 Спадкоємці": heirs_menu_handler,
+    "⚙️ Адмін-панель": admin_panel_handler,
+    "🧑‍🌾 Потенційні пайовики": crm_potential_handler,
+    "👥 Поточні пайовики": crm_current_handler,
+    "📅 Планування": crm_planning_handler,
+    "📬 Звернення": inbox_menu_handler,
+    "📆 Події": crm_events_handler,
+    "🧠 Нагадування": crm_reminders_handler,
+    "➕ Додати рейс": logistics_add_trip_handler,
+    "📋 Журнал рейсів": logistics_journal_handler,
+    "🛻 Техніка": logistics_vehicles_handler,
+    "🧾 Контрагенти": logistics_counterparties_handler,
+    "📄 Шаблони ТТН": logistics_ttn_handler,
+}))
 
 # --- ПАЙОВИКИ: Підключаємо діалоги до підменю пайовиків
 application.add_handler(add_payer_conv)
 application.add_handler(add_heir_conv)
-application.add_handler(MessageHandler(filters.Regex("^📋 Список пайовиків$"), show_payers))
+application.add_handler(MenuButtonHandler({"📋 Список пайовиків": show_payers}))
+application.add_handler(global_search_conv)
+application.add_handler(inline_search_handler)
 application.add_handler(search_payer_conv)
 application.add_handler(search_land_conv)
 application.add_handler(search_contract_conv)
 application.add_handler(edit_payer_conv)
 application.add_handler(global_add_payment_conv)
-application.add_handler(MessageHandler(filters.Regex("^📋 Перелік виплат$"), show_payments))
-application.add_handler(MessageHandler(filters.Regex("^🔍 Борг перед спадкоємцем$"), list_inheritance_debts))
+application.add_handler(MenuButtonHandler({
+    "📋 Перелік виплат": show_payments,
+    "🔍 Борг перед спадкоємцем": list_inheritance_debts,
+}))
 application.add_handler(payment_report_conv)
 application.add_handler(rent_summary_conv)
 application.add_handler(land_report_conv)
@@ -217,12 +295,12 @@ application.add_handler(company_report_conv)
 
 # --- Потенційні пайовики ---
 application.add_handler(add_potential_conv)
-application.add_handler(MessageHandler(filters.Regex("^📋 Список$"), list_potential))
+application.add_handler(MenuButtonHandler({"📋 Список": list_potential}))
 application.add_handler(filter_potential_conv)
 
 # --- ДІЛЯНКИ/ПОЛЯ ---
 application.add_handler(add_field_conv)
-application.add_handler(MessageHandler(filters.Regex("^📋 Список полів$"), show_fields))
+application.add_handler(MenuButtonHandler({"📋 Список полів": show_fields}))
 # --- Планування та події ---
 application.add_handler(add_event_conv)
 application.add_handler(add_event_from_card_conv)
@@ -232,9 +310,9 @@ application.add_handler(view_requests_conv)
 application.add_handler(update_request_conv)
 
 application.add_handler(add_land_conv)
-application.add_handler(MessageHandler(filters.Regex("^📋 Список ділянок$"), show_lands))
+application.add_handler(MenuButtonHandler({"📋 Список ділянок": show_lands}))
 application.add_handler(add_contract_conv)
-application.add_handler(MessageHandler(filters.Regex("^📋 Список договорів$"), show_contracts))
+application.add_handler(MenuButtonHandler({"📋 Список договорів": show_contracts}))
 
 application.add_handler(CallbackQueryHandler(field_card, pattern=r"^field_card:"))
 application.add_handler(CallbackQueryHandler(delete_field_prompt, pattern=r"^delete_field:\d+$"))
@@ -296,12 +374,14 @@ application.add_handler(template_delete_cb)
 application.add_handler(template_list_cb)
 application.add_handler(template_vars_cb)
 application.add_handler(template_vars_categories_cb)
-application.add_handler(MessageHandler(filters.Regex("^🧾 Шаблони документів$"), admin_templates_handler))
-application.add_handler(MessageHandler(filters.Regex("^📋 Список шаблонів$"), show_templates_cb))
-application.add_handler(MessageHandler(filters.Regex("^👤 Менеджмент користувачів$"), admin_users_handler))
-application.add_handler(MessageHandler(filters.Regex("^🗑️ Видалення об'єктів$"), admin_delete_handler))
-application.add_handler(MessageHandler(filters.Regex("^🔐 Права доступу$"), admin_access_handler))
-application.add_handler(MessageHandler(filters.Regex("^↩️ Головне меню$"), to_main_menu))
+application.add_handler(MenuButtonHandler({
+    "🧾 Шаблони документів": admin_templates_handler,
+    "📋 Список шаблонів": show_templates_cb,
+    "👤 Менеджмент користувачів": admin_users_handler,
+    "🗑️ Видалення об'єктів": admin_delete_handler,
+    "🔐 Права доступу": admin_access_handler,
+    "↩️ Головне меню": to_main_menu,
+}))
 application.add_handler(CallbackQueryHandler(admin_user_list, pattern=r"^user_list$"))
 application.add_handler(add_user_conv)
 application.add_handler(change_role_conv)
@@ -309,17 +389,22 @@ application.add_handler(block_user_conv)
 application.add_handler(change_name_conv)
 application.add_handler(CallbackQueryHandler(admin_users_handler, pattern=r"^admin_users$"))
 # --- АДМІНКА ТОВ ---
-application.add_handler(MessageHandler(filters.Regex("^🏢 ТОВ-орендарі$"), admin_tov_handler))
-application.add_handler(MessageHandler(filters.Regex("^📋 Список ТОВ$"), admin_tov_list_handler))
-application.add_handler(MessageHandler(filters.Regex("^✏️ Редагувати ТОВ$"), admin_tov_edit_handler))
-application.add_handler(MessageHandler(filters.Regex("^🗑️ Видалити ТОВ$"), admin_tov_delete_handler))
-application.add_handler(MessageHandler(filters.Regex("^↩️ Адмін-панель$"), to_admin_panel))
+application.add_handler(MenuButtonHandler({
+    "🏢 ТОВ-орендарі": admin_tov_handler,
+    "📋 Список ТОВ": admin_tov_list_handler,
+    "✏️ Редагувати ТОВ": admin_tov_edit_handler,
+    "🗑️ Видалити ТОВ": admin_tov_delete_handler,
+    "↩️ Адмін-панель": to_admin_panel,
+}))
 application.add_handler(CallbackQueryHandler(admin_company_card_callback, pattern=r"^company_card:\d+$"))
 application.add_handler(CallbackQueryHandler(company_delete_prompt, pattern=r"^company_delete:\d+$"))
 application.add_handler(CallbackQueryHandler(company_delete_confirm, pattern=r"^company_delete_confirm:\d+$"))
 application.add_handler(CallbackQueryHandler(admin_tov_list_handler, pattern=r"^company_list$"))
 application.add_handler(CallbackQueryHandler(admin_panel_handler, pattern=r"^admin_panel$"))
 
+# Після реєстрації всіх handlers: кожен апдейт підписується іменем свого callback
+metrics.instrument_handlers(application)
+
 
 @app.post(WEBHOOK_PATH)
 async def telegram_webhook(request: Request):
@@ -329,5 +414,37 @@ async def telegram_webhook(request: Request):
         is_initialized = True
     data = await request.json()
     update = Update.de_json(data, application.bot)
-    await application.process_update(update)
+    if await update_dedup.is_duplicate(update.update_id):
+        return {"ok": True}
+    try:
+        await update_queue.put(update)
+    except (Exception, asyncio.CancelledError):
+        # Апдейт не прийнято: Telegram надішле його ще раз, і це не дублікат
+        await update_dedup.forget(update.update_id)
+        raise
     return {"ok": True}
+
+
+@app.get("/stats")
+async def stats():
+    return {
+        "updates": update_queue.stats(),
+        "dedup": update_dedup.stats(),
+        "persistence": persistence.stats(),
+        "sessions": session_store.stats(),
+        "outbound": outbound.stats(),
+        "report_snapshots": report_snapshots.stats(),
+        "report_cache": report_cache.stats(),
+        "user_cache": user_cache.stats(),
+        "invalidation": invalidation.stats(),
+        "reference_cache": {
+            "company": company_cache.stats(),
+            "field": field_cache.stats(),
+            "agreement_template": template_cache.stats(),
+        },
+    }
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(database), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,575 @@
+"""Versioned schema migrations.
+
+Web workers never touch the schema. Run ``python migrations.py`` once per
+deploy (Railway runs it as the pre-deploy command) to apply pending steps,
+or ``python migrations.py status`` to see the current version.
+``python migrations.py rollup [--check]`` compares ``payment_rollup`` with
+``payment`` and, without ``--check``, rebuilds it.
+"""
+import sys
+from datetime import datetime
+
+import sqlalchemy
+
+from db import engine, ProcessedUpdate, BotUserData, BotChatData, BotConversation, PaymentRollup, ReportSnapshot, VERSIONED_TABLES, invalidation
+from utils.report_cache import data_version_triggers, install_data_version
+from utils.rollup import check_payment_rollup, install_payment_rollup, rebuild_payment_rollup
+from utils.search import TRIGRAM_EXTENSION
+
+# Довільний ключ advisory lock, щоб дві копії не мігрували одночасно
+MIGRATION_LOCK_ID = 724_015_001
+
+SchemaVersion = sqlalchemy.Table(
+    "schema_version",
+    sqlalchemy.MetaData(),
+    sqlalchemy.Column("version", sqlalchemy.Integer, primary_key=True, autoincrement=False),
+    sqlalchemy.Column("description", sqlalchemy.String(255)),
+    sqlalchemy.Column("applied_at", sqlalchemy.DateTime, default=datetime.utcnow),
+)
+
+
+# Таблиці так, як їх створював db.py до появи міграцій; змінюються лише новими кроками
+SCHEMA_V1 = """
+CREATE TABLE IF NOT EXISTS admin_action (
+    id SERIAL NOT NULL,
+    admin_id BIGINT,
+    action VARCHAR(255),
+    created_at TIMESTAMP WITHOUT TIME ZONE,
+    PRIMARY KEY (id)
+);
+
+CREATE TABLE IF NOT EXISTS agreement_template (
+    id SERIAL NOT NULL,
+    name VARCHAR(255),
+    type VARCHAR(32),
+    template_type VARCHAR(32),
+    file_path VARCHAR(255),
+    is_active BOOLEAN,
+    created_at TIMESTAMP WITHOUT TIME ZONE,
+    PRIMARY KEY (id)
+);
+
+CREATE TABLE IF NOT EXISTS company (
+    id SERIAL NOT NULL,
+    opf VARCHAR(16),
+    full_name VARCHAR(255),
+    short_name VARCHAR(128),
+    name VARCHAR(255) NOT NULL,
+    edrpou VARCHAR(10) NOT NULL,
+    bank_account VARCHAR(34),
+    tax_group VARCHAR(32),
+    is_vat_payer BOOLEAN,
+    vat_ipn VARCHAR(12),
+    address_legal VARCHAR(255),
+    address_postal VARCHAR(255),
+    director VARCHAR(128),
+    created_at TIMESTAMP WITHOUT TIME ZONE,
+    PRIMARY KEY (id),
+    UNIQUE (edrpou)
+);
+
+CREATE TABLE IF NOT EXISTS counterparty (
+    id SERIAL NOT NULL,
+    name VARCHAR(255) NOT NULL,
+    edrpou VARCHAR(8) NOT NULL,
+    director VARCHAR(255),
+    legal_address VARCHAR(255),
+    phone VARCHAR(13),
+    email VARCHAR(255),
+    note TEXT,
+    created_at TIMESTAMP WITHOUT TIME ZONE,
+    PRIMARY KEY (id),
+    UNIQUE (edrpou)
+);
+
+CREATE TABLE IF NOT EXISTS crm_events (
+    id SERIAL NOT NULL,
+    entity_type VARCHAR,
+    entity_id INTEGER,
+    event_datetime TIMESTAMP WITHOUT TIME ZONE,
+    event_type VARCHAR,
+    comment VARCHAR,
+    responsible_user_id BIGINT NOT NULL,
+    status VARCHAR,
+    created_at TIMESTAMP WITHOUT TIME ZONE,
+    created_by_user_id BIGINT,
+    reminder_status JSONB,
+    PRIMARY KEY (id)
+);
+
+CREATE TABLE IF NOT EXISTS delete_log (
+    id SERIAL NOT NULL,
+    admin_id BIGINT,
+    role VARCHAR(10),
+    entity_type VARCHAR(64),
+    entity_id INTEGER,
+    name VARCHAR(255),
+    linked_info VARCHAR(255),
+    created_at TIMESTAMP WITHOUT TIME ZONE,
+    PRIMARY KEY (id)
+);
+
+CREATE TABLE IF NOT EXISTS field (
+    id SERIAL NOT NULL,
+    name VARCHAR(100) NOT NULL,
+    area_actual FLOAT NOT NULL,
+    PRIMARY KEY (id),
+    UNIQUE (name)
+);
+
+CREATE TABLE IF NOT EXISTS payer (
+    id SERIAL NOT NULL,
+    name VARCHAR,
+    ipn VARCHAR(10),
+    oblast VARCHAR,
+    rayon VARCHAR,
+    selo VARCHAR,
+    vul VARCHAR,
+    bud VARCHAR,
+    kv VARCHAR,
+    phone VARCHAR,
+    bank_card VARCHAR,
+    doc_type VARCHAR,
+    passport_series VARCHAR,
+    passport_number VARCHAR,
+    passport_issuer VARCHAR,
+    passport_date VARCHAR,
+    id_number VARCHAR,
+    unzr VARCHAR,
+    idcard_issuer VARCHAR,
+    idcard_date VARCHAR,
+    birth_date VARCHAR,
+    is_deceased BOOLEAN,
+    PRIMARY KEY (id)
+);
+
+CREATE TABLE IF NOT EXISTS potential_payer (
+    id SERIAL NOT NULL,
+    full_name VARCHAR NOT NULL,
+    phone VARCHAR,
+    village VARCHAR,
+    area_estimate FLOAT,
+    note VARCHAR,
+    status VARCHAR,
+    last_contact_date DATE,
+    PRIMARY KEY (id)
+);
+
+CREATE TABLE IF NOT EXISTS uploaded_docs (
+    id SERIAL NOT NULL,
+    entity_type VARCHAR(32),
+    entity_id INTEGER,
+    doc_type VARCHAR(64),
+    remote_path VARCHAR(255),
+    PRIMARY KEY (id)
+);
+
+CREATE TABLE IF NOT EXISTS "user" (
+    id SERIAL NOT NULL,
+    telegram_id BIGINT,
+    full_name VARCHAR(255),
+    username VARCHAR(255),
+    role VARCHAR(10),
+    is_active BOOLEAN,
+    created_at TIMESTAMP WITHOUT TIME ZONE,
+    PRIMARY KEY (id),
+    UNIQUE (telegram_id)
+);
+
+CREATE TABLE IF NOT EXISTS contract (
+    id SERIAL NOT NULL,
+    company_id INTEGER,
+    payer_id INTEGER,
+    number VARCHAR(32),
+    date_signed TIMESTAMP WITHOUT TIME ZONE,
+    date_valid_from TIMESTAMP WITHOUT TIME ZONE,
+    date_valid_to TIMESTAMP WITHOUT TIME ZONE,
+    duration_years INTEGER,
+    rent_amount NUMERIC(12, 2),
+    status VARCHAR(32),
+    registration_number VARCHAR(64),
+    registration_date DATE,
+    template_id INTEGER,
+    created_at TIMESTAMP WITHOUT TIME ZONE,
+    updated_at TIMESTAMP WITHOUT TIME ZONE,
+    PRIMARY KEY (id),
+    CONSTRAINT uq_contract_number UNIQUE (company_id, number),
+    FOREIGN KEY(company_id) REFERENCES company (id),
+    FOREIGN KEY(payer_id) REFERENCES payer (id),
+    FOREIGN KEY(template_id) REFERENCES agreement_template (id)
+);
+
+CREATE TABLE IF NOT EXISTS heir (
+    id SERIAL NOT NULL,
+    deceased_payer_id INTEGER,
+    heir_payer_id INTEGER,
+    documents JSONB,
+    created_at TIMESTAMP WITHOUT TIME ZONE,
+    PRIMARY KEY (id),
+    FOREIGN KEY(deceased_payer_id) REFERENCES payer (id),
+    FOREIGN KEY(heir_payer_id) REFERENCES payer (id)
+);
+
+CREATE TABLE IF NOT EXISTS inheritance_transfer (
+    id SERIAL NOT NULL,
+    deceased_payer_id INTEGER,
+    heir_payer_id INTEGER,
+    asset_type VARCHAR(32),
+    asset_id INTEGER,
+    created_at TIMESTAMP WITHOUT TIME ZONE,
+    PRIMARY KEY (id),
+    FOREIGN KEY(deceased_payer_id) REFERENCES payer (id),
+    FOREIGN KEY(heir_payer_id) REFERENCES payer (id)
+);
+
+CREATE TABLE IF NOT EXISTS land_plot (
+    id SERIAL NOT NULL,
+    cadaster VARCHAR(25) NOT NULL,
+    area FLOAT NOT NULL,
+    ngo FLOAT,
+    field_id INTEGER,
+    payer_id INTEGER,
+    region VARCHAR,
+    district VARCHAR,
+    council VARCHAR,
+    PRIMARY KEY (id),
+    UNIQUE (cadaster),
+    FOREIGN KEY(field_id) REFERENCES field (id),
+    FOREIGN KEY(payer_id) REFERENCES payer (id)
+);
+
+CREATE TABLE IF NOT EXISTS payer_requests (
+    id SERIAL NOT NULL,
+    payer_id INTEGER,
+    type VARCHAR,
+    description VARCHAR,
+    date_submitted DATE,
+    status VARCHAR,
+    document_path VARCHAR,
+    responsible_user_id INTEGER,
+    created_at TIMESTAMP WITHOUT TIME ZONE,
+    PRIMARY KEY (id),
+    FOREIGN KEY(payer_id) REFERENCES payer (id),
+    FOREIGN KEY(responsible_user_id) REFERENCES "user" (id)
+);
+
+CREATE TABLE IF NOT EXISTS potential_land_plot (
+    id SERIAL NOT NULL,
+    potential_payer_id INTEGER,
+    cadastre VARCHAR(25),
+    area FLOAT,
+    PRIMARY KEY (id),
+    FOREIGN KEY(potential_payer_id) REFERENCES potential_payer (id)
+);
+
+CREATE TABLE IF NOT EXISTS contract_land_plot (
+    id SERIAL NOT NULL,
+    contract_id INTEGER,
+    land_plot_id INTEGER,
+    PRIMARY KEY (id),
+    FOREIGN KEY(contract_id) REFERENCES contract (id),
+    FOREIGN KEY(land_plot_id) REFERENCES land_plot (id)
+);
+
+CREATE TABLE IF NOT EXISTS land_plot_owner (
+    id SERIAL NOT NULL,
+    land_plot_id INTEGER,
+    payer_id INTEGER,
+    share FLOAT,
+    PRIMARY KEY (id),
+    FOREIGN KEY(land_plot_id) REFERENCES land_plot (id),
+    FOREIGN KEY(payer_id) REFERENCES payer (id)
+);
+
+CREATE TABLE IF NOT EXISTS payer_contract (
+    id SERIAL NOT NULL,
+    contract_id INTEGER,
+    payer_id INTEGER,
+    PRIMARY KEY (id),
+    FOREIGN KEY(contract_id) REFERENCES contract (id),
+    FOREIGN KEY(payer_id) REFERENCES payer (id)
+);
+
+CREATE TABLE IF NOT EXISTS payment (
+    id SERIAL NOT NULL,
+    agreement_id INTEGER,
+    amount NUMERIC(12, 2) NOT NULL,
+    payment_date DATE NOT NULL,
+    payment_type VARCHAR,
+    notes VARCHAR,
+    status VARCHAR,
+    created_at TIMESTAMP WITHOUT TIME ZONE,
+    PRIMARY KEY (id),
+    FOREIGN KEY(agreement_id) REFERENCES contract (id)
+);
+
+CREATE TABLE IF NOT EXISTS sublease (
+    id SERIAL NOT NULL,
+    land_plot_id INTEGER,
+    from_company_id INTEGER,
+    to_company_id INTEGER,
+    counterparty_id INTEGER,
+    date_from DATE,
+    date_to DATE,
+    PRIMARY KEY (id),
+    FOREIGN KEY(land_plot_id) REFERENCES land_plot (id),
+    FOREIGN KEY(from_company_id) REFERENCES company (id),
+    FOREIGN KEY(to_company_id) REFERENCES company (id),
+    FOREIGN KEY(counterparty_id) REFERENCES counterparty (id)
+);
+
+CREATE TABLE IF NOT EXISTS inheritance_debt (
+    id SERIAL NOT NULL,
+    payer_id INTEGER,
+    heir_id INTEGER,
+    contract_id INTEGER,
+    amount NUMERIC(12, 2) NOT NULL,
+    date_recorded DATE,
+    paid BOOLEAN,
+    payment_id INTEGER,
+    PRIMARY KEY (id),
+    FOREIGN KEY(payer_id) REFERENCES payer (id),
+    FOREIGN KEY(heir_id) REFERENCES payer (id),
+    FOREIGN KEY(contract_id) REFERENCES contract (id),
+    FOREIGN KEY(payment_id) REFERENCES payment (id)
+);
+"""
+
+
+def _create_tables(conn):
+    conn.execute(sqlalchemy.text(SCHEMA_V1))
+
+
+def _legacy_columns(conn):
+    """Columns that older databases may lack (were added at import time)."""
+    statements = [
+        'ALTER TABLE "user" ADD COLUMN IF NOT EXISTS full_name VARCHAR(255)',
+        'ALTER TABLE "land_plot" ADD COLUMN IF NOT EXISTS region VARCHAR',
+        'ALTER TABLE "land_plot" ADD COLUMN IF NOT EXISTS district VARCHAR',
+        'ALTER TABLE "land_plot" ADD COLUMN IF NOT EXISTS council VARCHAR',
+        'ALTER TABLE "payer" ADD COLUMN IF NOT EXISTS bank_card VARCHAR',
+        'ALTER TABLE "payer" ADD COLUMN IF NOT EXISTS is_deceased BOOLEAN DEFAULT FALSE',
+        'ALTER TABLE "contract" ADD COLUMN IF NOT EXISTS rent_amount NUMERIC(12,2)',
+        'ALTER TABLE "contract" ADD COLUMN IF NOT EXISTS payer_id INTEGER REFERENCES payer(id)',
+        'ALTER TABLE "contract" ADD COLUMN IF NOT EXISTS status VARCHAR',
+        'ALTER TABLE "contract" ADD COLUMN IF NOT EXISTS registration_number VARCHAR',
+        'ALTER TABLE "contract" ADD COLUMN IF NOT EXISTS registration_date DATE',
+        'ALTER TABLE "contract" ADD COLUMN IF NOT EXISTS template_id INTEGER REFERENCES agreement_template(id)',
+        "ALTER TABLE \"agreement_template\" ADD COLUMN IF NOT EXISTS template_type VARCHAR(32) DEFAULT 'single'",
+        'ALTER TABLE "crm_events" ADD COLUMN IF NOT EXISTS event_datetime TIMESTAMP',
+        'ALTER TABLE "crm_events" ADD COLUMN IF NOT EXISTS created_by_user_id BIGINT',
+        "ALTER TABLE \"crm_events\" ADD COLUMN IF NOT EXISTS reminder_status JSONB DEFAULT '{}'::jsonb",
+        'ALTER TABLE "crm_events" ADD COLUMN IF NOT EXISTS responsible_user_id BIGINT NOT NULL DEFAULT 0',
+        'ALTER TABLE "payer_requests" ADD COLUMN IF NOT EXISTS responsible_user_id INTEGER REFERENCES "user"(id)',
+        'ALTER TABLE "payment" ADD COLUMN IF NOT EXISTS status VARCHAR DEFAULT \'paid\'',
+    ]
+    for stmt in statements:
+        conn.execute(sqlalchemy.text(stmt))
+
+
+def _bot_state_tables(conn):
+    # Table.create, а не metadata.create_all: той запускає DDL-події всієї metadata
+    for table in (ProcessedUpdate, BotUserData, BotChatData, BotConversation):
+        table.create(conn, checkfirst=True)
+
+
+def _create_indexes(conn, statements: list[str]):
+    for stmt in statements:
+        conn.execute(sqlalchemy.text(stmt))
+
+
+def _indexes(conn):
+    """Indexes on foreign keys and report filter columns."""
+    _create_indexes(
+        conn,
+        [
+            "CREATE INDEX IF NOT EXISTS ix_land_plot_field_id ON land_plot (field_id)",
+            "CREATE INDEX IF NOT EXISTS ix_land_plot_payer_id ON land_plot (payer_id)",
+            "CREATE INDEX IF NOT EXISTS ix_land_plot_owner_plot_payer ON land_plot_owner (land_plot_id, payer_id)",
+            "CREATE INDEX IF NOT EXISTS ix_land_plot_owner_payer_id ON land_plot_owner (payer_id)",
+            "CREATE INDEX IF NOT EXISTS ix_contract_payer_id ON contract (payer_id)",
+            "CREATE INDEX IF NOT EXISTS ix_contract_template_id ON contract (template_id)",
+            "CREATE INDEX IF NOT EXISTS ix_contract_land_plot_contract_plot ON contract_land_plot (contract_id, land_plot_id)",
+            "CREATE INDEX IF NOT EXISTS ix_contract_land_plot_plot_id ON contract_land_plot (land_plot_id)",
+            "CREATE INDEX IF NOT EXISTS ix_payer_contract_contract_payer ON payer_contract (contract_id, payer_id)",
+            "CREATE INDEX IF NOT EXISTS ix_payer_contract_payer_id ON payer_contract (payer_id)",
+            "CREATE INDEX IF NOT EXISTS ix_sublease_land_plot_id ON sublease (land_plot_id)",
+            "CREATE INDEX IF NOT EXISTS ix_sublease_from_company_id ON sublease (from_company_id)",
+            "CREATE INDEX IF NOT EXISTS ix_sublease_to_company_id ON sublease (to_company_id)",
+            "CREATE INDEX IF NOT EXISTS ix_sublease_counterparty_id ON sublease (counterparty_id)",
+            "CREATE INDEX IF NOT EXISTS ix_heir_deceased_payer_id ON heir (deceased_payer_id)",
+            "CREATE INDEX IF NOT EXISTS ix_heir_heir_payer_id ON heir (heir_payer_id)",
+            "CREATE INDEX IF NOT EXISTS ix_inheritance_transfer_deceased_payer_id ON inheritance_transfer (deceased_payer_id)",
+            "CREATE INDEX IF NOT EXISTS ix_inheritance_transfer_heir_payer_id ON inheritance_transfer (heir_payer_id)",
+            "CREATE INDEX IF NOT EXISTS ix_uploaded_docs_entity ON uploaded_docs (entity_type, entity_id, doc_type)",
+            "CREATE INDEX IF NOT EXISTS ix_payment_agreement_date ON payment (agreement_id, payment_date)",
+            "CREATE INDEX IF NOT EXISTS ix_payment_payment_date ON payment (payment_date)",
+            "CREATE INDEX IF NOT EXISTS ix_inheritance_debt_contract_id ON inheritance_debt (contract_id)",
+            "CREATE INDEX IF NOT EXISTS ix_inheritance_debt_payer_id ON inheritance_debt (payer_id)",
+            "CREATE INDEX IF NOT EXISTS ix_inheritance_debt_heir_id ON inheritance_debt (heir_id)",
+            "CREATE INDEX IF NOT EXISTS ix_inheritance_debt_payment_id ON inheritance_debt (payment_id)",
+            "CREATE INDEX IF NOT EXISTS ix_potential_land_plot_payer_id ON potential_land_plot (potential_payer_id)",
+            "CREATE INDEX IF NOT EXISTS ix_payer_requests_payer_id ON payer_requests (payer_id)",
+            "CREATE INDEX IF NOT EXISTS ix_payer_requests_responsible_user_id ON payer_requests (responsible_user_id)",
+            "CREATE INDEX IF NOT EXISTS ix_crm_events_status_datetime ON crm_events (status, event_datetime)",
+            "CREATE INDEX IF NOT EXISTS ix_crm_events_event_date ON crm_events (date(event_datetime))",
+        ],
+    )
+
+
+def _trigram_indexes(conn):
+    """pg_trgm and the GIN indexes behind fuzzy name and cadastre search."""
+    conn.execute(TRIGRAM_EXTENSION)
+    _create_indexes(
+        conn,
+        [
+            "CREATE INDEX IF NOT EXISTS ix_payer_name_trgm ON payer USING gin (name gin_trgm_ops)",
+            "CREATE INDEX IF NOT EXISTS ix_land_plot_cadaster_trgm ON land_plot USING gin (cadaster gin_trgm_ops)",
+            "CREATE INDEX IF NOT EXISTS ix_counterparty_name_trgm ON counterparty USING gin (name gin_trgm_ops)",
+            "CREATE INDEX IF NOT EXISTS ix_counterparty_director_trgm ON counterparty USING gin (director gin_trgm_ops)",
+            "CREATE INDEX IF NOT EXISTS ix_potential_payer_full_name_trgm ON potential_payer USING gin (full_name gin_trgm_ops)",
+            "CREATE INDEX IF NOT EXISTS ix_potential_land_plot_cadastre_trgm ON potential_land_plot USING gin (cadastre gin_trgm_ops)",
+        ],
+    )
+
+
+def _contract_number_index(conn):
+    _create_indexes(
+        conn, ["CREATE INDEX IF NOT EXISTS ix_contract_number_trgm ON contract USING gin (number gin_trgm_ops)"]
+    )
+
+
+def _keyset_indexes(conn):
+    """Payment report pages by (payment_date, id); the single-column index is covered."""
+    conn.execute(sqlalchemy.text("DROP INDEX IF EXISTS ix_payment_payment_date"))
+    _create_indexes(conn, ["CREATE INDEX IF NOT EXISTS ix_payment_date_id ON payment (payment_date, id)"])
+
+
+def _payment_rollup(conn):
+    """payment_rollup table, its triggers on payment, and the initial fill."""
+    PaymentRollup.create(conn, checkfirst=True)
+    install_payment_rollup(conn)
+    rebuild_payment_rollup(conn)
+
+
+def _report_snapshots(conn):
+    ReportSnapshot.create(conn, checkfirst=True)
+
+
+def _data_version(conn):
+    """data_version table and the triggers that bump it on the report tables."""
+    # Крок 10 у тому вигляді, як його застосовано; крок 11 замінює функцію й видаляє таблицю
+    conn.execute(
+        sqlalchemy.text(
+            "CREATE TABLE IF NOT EXISTS data_version "
+            "(name VARCHAR(64) PRIMARY KEY, version BIGINT NOT NULL DEFAULT 0)"
+        )
+    )
+    conn.execute(
+        sqlalchemy.text(
+            """
+CREATE OR REPLACE FUNCTION data_version_bump() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO data_version (name, version) VALUES (TG_TABLE_NAME, 1)
+    ON CONFLICT (name) DO UPDATE SET version = data_version.version + 1;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+        )
+    )
+    for ddl in data_version_triggers(VERSIONED_TABLES):
+        conn.execute(ddl)
+
+
+def _data_version_notify(conn):
+    """Report tables announce changes via NOTIFY; the shared counter table is gone."""
+    install_data_version(conn, invalidation.channel, VERSIONED_TABLES)
+    conn.execute(sqlalchemy.text("DROP TABLE IF EXISTS data_version"))
+
+
+# Порядок важливий: нові кроки додаються лише в кінець списку, а застосовані
+# кроки не змінюються. Кожен крок має бути ідемпотентним: бази, створені ще
+# DDL при імпорті db.py, мають версію 0, але вже містять частину схеми.
+MIGRATIONS = [
+    (1, "create tables", _create_tables),
+    (2, "legacy columns", _legacy_columns),
+    (3, "update dedup and bot persistence tables", _bot_state_tables),
+    (4, "foreign key and report filter indexes", _indexes),
+    (5, "pg_trgm search indexes", _trigram_indexes),
+    (6, "contract number search index", _contract_number_index),
+    (7, "keyset pagination indexes", _keyset_indexes),
+    (8, "payment rollup", _payment_rollup),
+    (9, "report snapshots", _report_snapshots),
+    (10, "data versions for the report cache", _data_version),
+    (11, "report cache versions via NOTIFY", _data_version_notify),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(conn) -> int:
+    """Return applied schema version, 0 for an unmanaged database."""
+    exists = conn.execute(sqlalchemy.text("SELECT to_regclass('schema_version')")).scalar()
+    if not exists:
+        return 0
+    version = conn.execute(sqlalchemy.select(sqlalchemy.func.max(SchemaVersion.c.version))).scalar()
+    return version or 0
+
+
+def is_current(bind=engine) -> bool:
+    """Fast check without any DDL."""
+    with bind.connect() as conn:
+        return current_version(conn) >= LATEST_VERSION
+
+
+def migrate(bind=engine) -> list[int]:
+    """Apply pending migrations and return versions that were applied."""
+    if is_current(bind):
+        return []
+    applied: list[int] = []
+    with bind.begin() as conn:
+        conn.execute(sqlalchemy.text("SELECT pg_advisory_xact_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+        SchemaVersion.create(conn, checkfirst=True)
+        version = current_version(conn)
+        for number, description, step in MIGRATIONS:
+            if number <= version:
+                continue
+            step(conn)
+            conn.execute(
+                SchemaVersion.insert().values(
+                    version=number,
+                    description=description,
+                    applied_at=datetime.utcnow(),
+                )
+            )
+            applied.append(number)
+    return applied
+
+
+def main(argv: list[str]) -> int:
+    command = argv[1] if len(argv) > 1 else "upgrade"
+    if command == "status":
+        with engine.connect() as conn:
+            version = current_version(conn)
+        print(f"schema version {version}, latest {LATEST_VERSION}")
+        return 0 if version >= LATEST_VERSION else 1
+    if command == "upgrade":
+        applied = migrate()
+        if applied:
+            print("applied migrations:", ", ".join(str(v) for v in applied))
+        else:
+            print(f"schema is up to date (version {LATEST_VERSION})")
+        return 0
+    if command == "rollup":
+        check_only = "--check" in argv[2:]
+        with engine.begin() as conn:
+            wrong = check_payment_rollup(conn) if check_only else rebuild_payment_rollup(conn)
+        print(f"payment_rollup: {wrong} rows out of sync" + ("" if check_only else ", rebuilt"))
+        return 1 if check_only and wrong else 0
+    print(f"unknown command: {command}")
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
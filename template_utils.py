@@ -8,8 +8,6 @@ import re
 import zipfile
 from collections import Counter
 
-from docxtpl import DocxTemplate
-
 from template_vars import TEMPLATE_VARIABLES, EMPTY_VALUE, SUPPORTED_VARS
 
 
@@ -22,6 +20,9 @@ ALLOWED_VARS = set(VAR_DESCRIPTIONS.keys())
 
 def find_unsupported_vars(template_path: str, template_type: str | None = None) -> list[str]:
     """Return list of placeholders not supported by the system."""
+    # docxtpl тягне Jinja2 і python-docx, тому імпортуємо лише тут
+    from docxtpl import DocxTemplate
+
     doc = DocxTemplate(template_path)
     found = {f"{{{{{v}}}}}" for v in doc.get_undeclared_template_variables()}
     allowed = set(ALLOWED_VARS)
@@ -0,0 +1,77 @@
+import sys
+import pathlib
+from datetime import date, datetime
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+from utils.accruals import build_ledger
+
+
+def test_ledger_prorates_partial_years_and_sums_per_company():
+    contracts = [
+        # 2024 — високосний: 184 дні з 366, решта 181 день з 365
+        {"id": 2, "company_id": 1, "date_valid_from": datetime(2024, 7, 1),
+         "date_valid_to": datetime(2025, 6, 30), "rent_amount": 366},
+        {"id": 1, "company_id": 1, "date_valid_from": datetime(2024, 1, 1),
+         "date_valid_to": None, "rent_amount": 100},
+        {"id": 3, "company_id": None, "date_valid_from": datetime(2025, 1, 1),
+         "date_valid_to": datetime(2025, 12, 31), "rent_amount": None},
+    ]
+    payments = [
+        {"contract_id": 2, "year": 2024, "amount": 84},
+        {"contract_id": 3, "year": 2025, "amount": 10},
+        # невідомий договір і рік поза звітом не враховуються
+        {"contract_id": 9, "year": 2024, "amount": 5},
+        {"contract_id": 1, "year": 2030, "amount": 5},
+    ]
+    ledger = build_ledger(contracts, payments, years=[2024, 2025])
+
+    assert ledger.contract_ids.tolist() == [1, 2, 3]
+    assert ledger.accrued.round(2).tolist() == [[100, 100], [184, 181.5], [0, 0]]
+    assert ledger.debt[ledger.row(2), ledger.column(2024)] == 100
+    assert ledger.row(9) is None and ledger.column(2030) is None
+    assert ledger.company_totals() == [
+        (None, 2025, 0.0, 10.0),
+        (1, 2024, 284.0, 84.0),
+        (1, 2025, 281.5, 0.0),
+    ]
+
+
+def test_ledger_stops_accruing_at_as_of():
+    contracts = [
+        {"id": 1, "company_id": 1, "date_valid_from": datetime(2023, 1, 1),
+         "date_valid_to": None, "rent_amount": 365},
+    ]
+    ledger = build_ledger(contracts, [], as_of=date(2024, 1, 31))
+    assert ledger.years.tolist() == [2023, 2024]
+    assert ledger.accrued[0, 0] == 365
+    assert ledger.accrued[0, 1] == 365 * 31 / 366
+
+
+def test_ledger_without_years_has_no_columns():
+    contracts = [
+        {"id": 1, "company_id": 1, "date_valid_from": datetime(2030, 1, 1),
+         "date_valid_to": None, "rent_amount": 100},
+    ]
+    ledger = build_ledger(contracts, [{"contract_id": 1, "year": 2030, "amount": 5}], years=[])
+    assert ledger.row(1) == 0
+    assert ledger.accrued.shape == (1, 0) and ledger.paid.shape == (1, 0)
+    assert ledger.column(2030) is None
+    assert ledger.company_totals() == []
+
+
+def test_ledger_span_includes_payment_years_and_is_capped():
+    contracts = [
+        {"id": 1, "company_id": 1, "date_valid_from": datetime(2024, 1, 1),
+         "date_valid_to": datetime(2925, 12, 31), "rent_amount": 100},
+    ]
+    payments = [
+        # аванс за рік до початку договору
+        {"contract_id": 1, "year": 2023, "amount": 50},
+    ]
+    ledger = build_ledger(contracts, payments, as_of=date(2024, 6, 30))
+    assert ledger.years.tolist() == [2023, 2024]
+    assert ledger.paid.sum() == 50
+
+    ledger = build_ledger(contracts, payments)
+    assert ledger.years[0] == 2023
+    assert ledger.years[-1] == date.today().year + 50
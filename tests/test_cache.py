@@ -0,0 +1,51 @@
+import sys
+import pathlib
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+from utils.cache import TTLCache, MISSING
+
+
+def test_ttl_cache_negative_entries_and_invalidation():
+    cache = TTLCache(ttl=60, negative_ttl=0)
+    assert cache.get(1) is MISSING
+    cache.set(1, {"role": "admin"})
+    cache.set(2, None)
+    assert cache.get(1) == {"role": "admin"}
+    # негативний запис з нульовим TTL вже прострочений
+    assert cache.get(2) is MISSING
+
+    generation = cache.generation()
+    cache.invalidate(1)
+    cache.set(1, {"role": "stale"}, generation)
+    assert cache.get(1) is MISSING
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 3
+
+
+def test_table_cache_serves_snapshot_until_cleared():
+    import asyncio
+    import sqlalchemy
+    from utils.cache import TableCache
+
+    table = sqlalchemy.table("company", sqlalchemy.column("id"), sqlalchemy.column("name"))
+
+    class FakeDatabase:
+        def __init__(self):
+            self.queries = 0
+            self.rows = [{"id": 1, "name": "Агро"}]
+
+        async def fetch_all(self, query):
+            self.queries += 1
+            await asyncio.sleep(0)
+            return list(self.rows)
+
+    async def run():
+        db = FakeDatabase()
+        cache = TableCache(db, table)
+        await asyncio.gather(*(cache.all() for _ in range(5)))
+        assert (await cache.get(1))["name"] == "Агро"
+        db.rows = [{"id": 1, "name": "Агро Плюс"}]
+        cache.invalidate(1)
+        assert (await cache.get(1))["name"] == "Агро Плюс"
+        return db.queries
+
+    assert asyncio.run(run()) == 2
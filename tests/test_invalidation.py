@@ -0,0 +1,36 @@
+import sys
+import pathlib
+import asyncio
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+from utils.cache import TTLCache, MISSING
+from utils.invalidation import InvalidationBus
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.notifications = []
+
+    async def execute(self, query, values=None):
+        self.notifications.append(values["payload"])
+
+
+def test_notify_invalidates_locally_and_in_other_workers():
+    db = FakeDatabase()
+    workers = [InvalidationBus(), InvalidationBus()]
+    caches = [TTLCache(), TTLCache()]
+    for bus, cache in zip(workers, caches):
+        bus.register("user", cache)
+        cache.set(42, {"role": "user"})
+        cache.set(7, {"role": "admin"})
+
+    asyncio.run(workers[0].notify(db, "user", 42))
+    assert caches[0].get(42) is MISSING
+    assert caches[1].get(42) is not MISSING
+
+    # Postgres доставляє NOTIFY усім слухачам, включно з відправником
+    for bus in workers:
+        bus._on_notify(None, 0, bus.channel, db.notifications[0])
+    assert caches[1].get(42) is MISSING
+    assert caches[1].get(7) == {"role": "admin"}
+    assert workers[0].received == 0 and workers[1].received == 1
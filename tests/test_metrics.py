@@ -0,0 +1,68 @@
+import sys
+import pathlib
+import asyncio
+from types import SimpleNamespace
+
+from telegram.ext import CallbackQueryHandler, ConversationHandler
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+from utils import metrics
+from utils.menu_router import MenuButtonHandler
+
+
+async def show_list(update, context):
+    metrics.current().db_queries += 3
+    ftp_op()
+
+
+async def open_card(update, context):
+    return ConversationHandler.END
+
+
+@metrics.track_ftp
+def ftp_op():
+    return None
+
+
+def test_handlers_are_named_and_observed():
+    menu = MenuButtonHandler({"📋 Список": show_list})
+    conv = ConversationHandler(
+        entry_points=[CallbackQueryHandler(open_card, pattern="^card$")],
+        states={},
+        fallbacks=[],
+    )
+    application = SimpleNamespace(handlers={0: [menu, conv]})
+    metrics.instrument_handlers(application)
+    metrics.instrument_handlers(application)
+
+    async def process(update):
+        await menu.buttons["📋 Список"](update, None)
+
+    asyncio.run(metrics.track_updates(process)(object()))
+    name = f"{__name__}.show_list"
+    assert conv.entry_points[0].callback.metrics_name.endswith(".open_card")
+    text = metrics.render()
+    assert f'bot_update_db_queries_sum{{handler="{name}"}} 3' in text
+    assert f'bot_update_ftp_ops_count{{handler="{name}"}} 1' in text
+    assert f'bot_update_seconds_bucket{{handler="{name}",le="+Inf"}} 1' in text
+
+
+def test_tracked_database_logs_slow_queries_and_repeats(caplog):
+    import sqlalchemy
+
+    table = sqlalchemy.table("payer", sqlalchemy.column("id"))
+    db = metrics.TrackedDatabase(
+        "postgresql://u:p@localhost/db", slow_query_seconds=0.1, n_plus_one_threshold=3
+    )
+
+    async def process(update):
+        for payer_id in range(5):
+            query = sqlalchemy.select(table).where(table.c.id == payer_id)
+            db._observe(query, None, 0.2 if payer_id == 0 else 0.001)
+
+    with caplog.at_level("WARNING", logger="utils.metrics"):
+        asyncio.run(metrics.track_updates(process)(object()))
+    messages = [r.getMessage() for r in caplog.records]
+    assert db.slow_queries == 1 and "id_1': 0" in messages[0]
+    assert db.n_plus_one == 1
+    assert "tests/test_metrics.py" in messages[1] and "process" in messages[1]
@@ -0,0 +1,52 @@
+import sys
+import pathlib
+import asyncio
+
+from telegram import InlineKeyboardButton
+from telegram.error import RetryAfter
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+from utils.outbound import OutboundSender, pack_messages
+
+
+def test_pack_messages_respects_limits():
+    items = [
+        (f"{i}. " + "x" * 90, [InlineKeyboardButton(f"Картка {i}", callback_data=f"c:{i}")])
+        for i in range(100)
+    ]
+    messages = pack_messages(items, limit=1000, max_buttons=8)
+    assert all(len(text) <= 1000 for text, _ in messages)
+    assert sum(len(markup.inline_keyboard) for _, markup in messages) == 100
+    assert "\n\n".join(text for text, _ in messages) == "\n\n".join(t for t, _ in items)
+    assert len(pack_messages([("a" * 2500, [])], limit=1000)) == 3
+
+
+class FakeBot:
+    def __init__(self):
+        self.sent = []
+        self.floods = 1
+
+    async def send_message(self, chat_id, text, **kwargs):
+        if self.floods:
+            self.floods -= 1
+            raise RetryAfter(0)
+        self.sent.append((asyncio.get_running_loop().time(), chat_id, text))
+
+
+def test_sender_limits_rate_and_retries():
+    async def run():
+        sender = OutboundSender(global_rate=5, per_chat_interval=0.1)
+        bot = FakeBot()
+        await asyncio.gather(
+            *(sender.send(bot, i % 2, str(i)) for i in range(8))
+        )
+        return sender, bot
+
+    sender, bot = asyncio.run(run())
+    assert sender.sent == 8 and sender.retries == 1
+    times = [t for t, _, _ in bot.sent]
+    # no more than 5 messages in any 1s window
+    assert all(times[i + 5] - times[i] >= 0.99 for i in range(len(times) - 5))
+    for chat_id in (0, 1):
+        chat_times = [t for t, c, _ in bot.sent if c == chat_id]
+        assert all(b - a >= 0.099 for a, b in zip(chat_times, chat_times[1:]))
@@ -0,0 +1,27 @@
+import sys
+import pathlib
+from datetime import date, datetime
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+from utils.pagination import CursorStack, decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip_and_stack():
+    token = encode_cursor(date(2024, 5, 1), 7)
+    assert decode_cursor(token) == (date(2024, 5, 1), 7)
+    assert decode_cursor(encode_cursor("0123456789:01:001:0001", datetime(2024, 1, 2, 3, 4), 0)) == (
+        "0123456789:01:001:0001",
+        datetime(2024, 1, 2, 3, 4),
+        0,
+    )
+
+    user_data: dict = {}
+    pages = CursorStack(user_data, "cursors")
+    assert pages.current is None and not pages.has_prev
+    pages.next(token)
+    assert CursorStack(user_data, "cursors").current == token
+    pages.prev()
+    pages.prev()
+    assert pages.current is None
+    CursorStack.reset(user_data, "cursors")
+    assert user_data["cursors"] == [None]
@@ -0,0 +1,181 @@
+import sys
+import pathlib
+import asyncio
+import pickle
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+import sqlalchemy
+from sqlalchemy.dialects import postgresql
+from telegram import CallbackQuery, Chat, Message, Update, User
+from telegram.ext import ConversationHandler
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+from utils.pg_persistence import PostgresPersistence, check_shared_support
+
+metadata = sqlalchemy.MetaData()
+users = sqlalchemy.Table(
+    "u", metadata,
+    sqlalchemy.Column("user_id", sqlalchemy.BigInteger, primary_key=True),
+    sqlalchemy.Column("data", sqlalchemy.LargeBinary),
+    sqlalchemy.Column("updated_at", sqlalchemy.DateTime),
+)
+chats = sqlalchemy.Table(
+    "c", metadata,
+    sqlalchemy.Column("chat_id", sqlalchemy.BigInteger, primary_key=True),
+    sqlalchemy.Column("data", sqlalchemy.LargeBinary),
+    sqlalchemy.Column("updated_at", sqlalchemy.DateTime),
+)
+conversations = sqlalchemy.Table(
+    "conv", metadata,
+    sqlalchemy.Column("name", sqlalchemy.String, primary_key=True),
+    sqlalchemy.Column("key", sqlalchemy.String, primary_key=True),
+    sqlalchemy.Column("state", sqlalchemy.LargeBinary),
+    sqlalchemy.Column("updated_at", sqlalchemy.DateTime),
+)
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.statements = []
+        self.transactions = 0
+
+    @asynccontextmanager
+    async def transaction(self):
+        self.transactions += 1
+        yield
+
+    async def execute(self, stmt):
+        self.statements.append(stmt)
+
+
+def test_persistence_batches_changes_and_skips_unchanged():
+    async def run():
+        db = FakeDatabase()
+        persistence = PostgresPersistence(db, users, chats, conversations)
+        # Так PTB викликає update_* за один прохід
+        await asyncio.gather(
+            persistence.update_user_data(1, {"ev_rows": [{"id": 1}]}),
+            persistence.update_user_data(2, {"page": 3}),
+            persistence.update_conversation("add_field_conv", (1, 1), 0),
+            persistence.update_conversation("search_payer_conv", (2, 2), None),
+        )
+        await persistence.flush()
+        first = (db.transactions, len(db.statements))
+        await persistence.update_user_data(1, {"ev_rows": [{"id": 1}]})
+        await persistence.flush()
+        return first, db.transactions, persistence.stats()
+
+    first, transactions, stats = asyncio.run(run())
+    # users upsert, conversation upsert, conversation delete in one transaction
+    assert first == (1, 3)
+    assert transactions == 1
+    assert stats["skipped"] == 1
+    assert stats["writes"] == 4
+
+
+def test_persistence_keeps_a_bounded_set_of_digests():
+    async def run():
+        persistence = PostgresPersistence(FakeDatabase(), users, chats, conversations, max_digests=2)
+        for user_id in (1, 2, 3):
+            await persistence.update_user_data(user_id, {"page": 1})
+        await persistence.flush()
+        # дайджест користувача 1 витіснено — запис повторюється, а не губиться
+        await persistence.update_user_data(3, {"page": 1})
+        await persistence.update_user_data(1, {"page": 1})
+        await persistence.flush()
+        return persistence
+
+    persistence = asyncio.run(run())
+    assert len(persistence._digests) == 2
+    assert persistence.stats()["skipped"] == 1
+    assert persistence.stats()["writes"] == 4
+
+
+def test_installed_ptb_has_what_shared_mode_needs():
+    # Падає при оновленні PTB, яке прибрало чи перейменувало ці внутрішні частини
+    check_shared_support()
+
+
+class SharedDatabase(FakeDatabase):
+    """Keeps ``conversations`` rows in a dict shared by several instances."""
+
+    def __init__(self, rows: dict):
+        super().__init__()
+        self.rows = rows
+
+    async def execute(self, stmt):
+        await super().execute(stmt)
+        if stmt.table is not conversations:
+            return
+        params = stmt.compile(dialect=postgresql.dialect()).params
+        if isinstance(stmt, sqlalchemy.sql.Delete):
+            for slot in params["param_1"]:
+                self.rows.pop(slot, None)
+            return
+        for i in range(len(params) // 4):
+            self.rows[(params[f"name_m{i}"], params[f"key_m{i}"])] = params[f"state_m{i}"]
+
+    async def fetch_all(self, query):
+        params = query.compile(dialect=postgresql.dialect()).params
+        if "param_1" not in params:
+            # get_conversations при старті
+            return [
+                {"name": name, "key": key, "state": state}
+                for (name, key), state in self.rows.items()
+                if name == params["name_1"]
+            ]
+        slots = params["param_1"]
+        return [
+            {"name": name, "key": key, "state": self.rows[(name, key)]}
+            for name, key in slots
+            if (name, key) in self.rows
+        ]
+
+
+class Replica:
+    """What ``persistence.dispatch`` needs from an ``Application``."""
+
+    def __init__(self, persistence, handler):
+        self.persistence = persistence
+        self.handlers = {0: [handler]}
+        self.processed = []
+
+    async def process_update(self, update):
+        key = self.handlers[0][0]._get_key(update)
+        self.processed.append(self.handlers[0][0]._conversations.get(key))
+        step, state = update.callback_query.data.split(":")
+        await self.persistence.update_conversation("dialog", key, None if state == "end" else int(state))
+
+    async def update_persistence(self):
+        pass
+
+
+def _callback(update_id: int, data: str) -> Update:
+    user = User(7, "Петро", False)
+    chat = Chat(7, "private")
+    message = Message(1, datetime(2024, 1, 1), chat, from_user=user)
+    return Update(update_id, callback_query=CallbackQuery(str(update_id), user, "chat", data=data, message=message))
+
+
+def test_shared_persistence_sees_conversation_state_of_another_replica():
+    rows = {}
+
+    async def replica():
+        persistence = PostgresPersistence(SharedDatabase(rows), users, chats, conversations, shared=True)
+        handler = ConversationHandler([], {}, [], name="dialog", persistent=True)
+        app = Replica(persistence, handler)
+        await handler._initialize_persistence(app)
+        return app
+
+    async def run():
+        a, b = await replica(), await replica()
+        await a.persistence.dispatch(a, _callback(1, "step:1"))
+        await b.persistence.dispatch(b, _callback(2, "step:2"))
+        await a.persistence.dispatch(a, _callback(3, "step:end"))
+        await b.persistence.dispatch(b, _callback(4, "step:3"))
+        return a.processed, b.processed
+
+    # кожна репліка бачить стан, який записала інша
+    assert asyncio.run(run()) == ([None, 2], [1, None])
+    assert rows == {("dialog", "[7, 7]"): pickle.dumps(3, protocol=pickle.HIGHEST_PROTOCOL)}
@@ -0,0 +1,54 @@
+import sys
+import pathlib
+import asyncio
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+from utils.report_cache import ReportCache, data_version_function
+
+
+def test_report_pages_are_reused_until_a_table_version_changes():
+    cache = ReportCache()
+    calls = []
+
+    async def payment_report(payer, heirs_only, limit=None, after=None):
+        calls.append((payer, heirs_only, after))
+        return [{"id": 2}, {"id": 1}]
+
+    cache.register("payment_report", payment_report, ("payment", "payer"))
+
+    async def scenario():
+        first = await cache.page("payment_report", " Іваненко ", False, limit=2)
+        # та сама сторінка — без нового запиту
+        assert await cache.page("payment_report", "Іваненко", False, limit=2) is first
+        cache.invalidate("field")
+        await cache.page("payment_report", "Іваненко", False, limit=2)
+        assert calls == [("Іваненко", False, None)]
+
+        # наступна сторінка — окремий ключ
+        await cache.page("payment_report", "Іваненко", False, limit=2, after="c1")
+        assert calls[-1] == ("Іваненко", False, "c1")
+
+        await cache.page("payment_report", "", False, limit=2)
+        assert calls[-1] == (None, False, None)
+
+        cache.invalidate("payment")
+        await cache.page("payment_report", "Іваненко", False, limit=2)
+        assert calls[-1] == ("Іваненко", False, None)
+
+        cache.clear()
+        await cache.page("payment_report", "Іваненко", False, limit=2)
+        assert len(calls) == 5
+
+        # експорт — весь результат, далі з кешу
+        full = await cache.page("payment_report", "Іваненко", False)
+        assert await cache.page("payment_report", "Іваненко", False) is full
+        assert len(calls) == 6
+
+    asyncio.run(scenario())
+    assert cache.stats()["loads"] == 6
+
+
+def test_trigger_function_notifies_the_invalidation_channel():
+    ddl = str(data_version_function("cache_invalidation").statement)
+    assert "pg_notify('cache_invalidation'" in ddl
+    assert "data_version" in ddl
@@ -0,0 +1,39 @@
+import sys
+import pathlib
+
+from sqlalchemy.dialects import postgresql
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+from utils.rollup import PAYMENT_ROLLUP_FUNCTION, PAYMENT_ROLLUP_TRIGGERS, rebuild_payment_rollup
+
+
+class FakeConnection:
+    def __init__(self, wrong):
+        self.wrong = wrong
+        self.statements = []
+
+    def execute(self, statement):
+        self.statements.append(" ".join(str(statement).split()))
+        return self
+
+    def scalar(self):
+        return self.wrong
+
+
+def test_rebuild_locks_payment_and_reports_drift():
+    conn = FakeConnection(wrong=3)
+    assert rebuild_payment_rollup(conn) == 3
+    lock, check, delete, insert = conn.statements
+    assert lock == "LOCK TABLE payment IN SHARE MODE"
+    assert "FULL JOIN payment_rollup" in check
+    assert delete == "DELETE FROM payment_rollup"
+    assert insert.startswith("INSERT INTO payment_rollup (contract_id, year, paid, count) SELECT agreement_id")
+
+
+def test_trigger_ddl_covers_every_write():
+    dialect = postgresql.dialect()
+    function = str(PAYMENT_ROLLUP_FUNCTION.compile(dialect=dialect))
+    assert "ON CONFLICT (contract_id, year) DO UPDATE" in function
+    triggers = [str(ddl.compile(dialect=dialect)) for ddl in PAYMENT_ROLLUP_TRIGGERS]
+    assert "AFTER INSERT OR DELETE OR UPDATE OF agreement_id, amount, payment_date ON payment" in triggers[1]
+    assert "AFTER TRUNCATE ON payment" in triggers[3]
@@ -0,0 +1,60 @@
+import sys
+import pathlib
+import asyncio
+
+import sqlalchemy
+from sqlalchemy.dialects import postgresql
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+from utils.search import fuzzy_query, fuzzy_search, trigram_index
+
+
+def test_fuzzy_query_uses_trigram_operators_ranking_and_limit():
+    metadata = sqlalchemy.MetaData()
+    payer = sqlalchemy.Table(
+        "payer",
+        metadata,
+        sqlalchemy.Column("id", sqlalchemy.Integer, primary_key=True),
+        sqlalchemy.Column("name", sqlalchemy.String),
+        trigram_index("ix_payer_name_trgm", "name"),
+    )
+    ddl = str(sqlalchemy.schema.CreateIndex(next(iter(payer.indexes))).compile(dialect=postgresql.dialect()))
+    assert "USING gin (name gin_trgm_ops)" in ddl
+
+    compiled = fuzzy_query(sqlalchemy.select(payer), [payer.c.name], "Шевч_нко%", limit=10).compile(
+        dialect=postgresql.dialect()
+    )
+    sql = " ".join(str(compiled).split())
+    assert "payer.name ILIKE" in sql and "%>" in sql
+    assert "ORDER BY greatest(word_similarity(" in sql and "LIMIT" in sql
+    # символи шаблону LIKE з запиту екрануються
+    assert r"%Шевч\_нко\%%" in compiled.params.values()
+    assert 10 in compiled.params.values()
+
+
+def test_fuzzy_search_skips_blank_input():
+    class FakeDatabase:
+        queries = 0
+
+        async def fetch_all(self, query):
+            self.queries += 1
+            return [{"id": 1}]
+
+    database = FakeDatabase()
+    table = sqlalchemy.table("payer", sqlalchemy.column("id"), sqlalchemy.column("name"))
+    assert asyncio.run(fuzzy_search(database, sqlalchemy.select(table), [table.c.name], "  ")) == []
+    assert asyncio.run(fuzzy_search(database, sqlalchemy.select(table), [table.c.name], "Іван")) == [{"id": 1}]
+    assert database.queries == 1
+
+
+def test_classify_recognizes_identifiers():
+    from utils.search import classify
+
+    assert classify("3012345678") == ("ipn", "3012345678")
+    assert classify("+38 (067) 123-45-67") == ("phone", "+380671234567")
+    assert classify("0671234567") == ("phone", "+380671234567")
+    assert classify("12345678") == ("edrpou", "12345678")
+    assert classify("1234567890 01 001 0001") == ("cadaster", "1234567890:01:001:0001")
+    assert classify("№ 0012/2024") == ("contract", "0012/2024")
+    assert classify("42") == ("id", "42")
+    assert classify(" Шевченко Тарас ") == ("text", "Шевченко Тарас")
@@ -0,0 +1,63 @@
+import sys
+import pathlib
+from types import SimpleNamespace
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+from utils.session_store import SessionStore, approx_size
+
+
+def _context():
+    return SimpleNamespace(user_data={})
+
+
+def test_session_store_evicts_idle_and_over_cap():
+    rows = [{"id": i, "description": "x" * 100} for i in range(50)]
+    size = approx_size(rows)
+    store = SessionStore(idle_timeout=60, max_bytes=int(size * 2.5))
+
+    a, b, c = _context(), _context(), _context()
+    store.put(a, "rows", rows)
+    store.put(b, "rows", [dict(r) for r in rows])
+    store.get(a, "rows")
+    store.put(c, "rows", [dict(r) for r in rows])
+    # b was least recently used
+    assert "rows" not in b.user_data
+    assert store.get(b, "rows") is None
+    assert store.evicted_cap == 1
+    assert store.cached_bytes == approx_size(a.user_data["rows"]) + approx_size(c.user_data["rows"])
+    # заміна значення не рахує старе двічі
+    store.put(a, "rows", rows[:10])
+    assert store.cached_bytes == approx_size(rows[:10]) + approx_size(c.user_data["rows"])
+
+    c.user_data.clear()
+    store.sweep(now=10**9)
+    assert "rows" not in a.user_data
+    assert store.evicted_idle == 1
+    assert store.stats()["cached_entries"] == 0
+    assert store.cached_bytes == 0
+
+
+def test_session_store_adopts_restored_values_and_keeps_oversized_ones():
+    rows = [{"id": i, "description": "x" * 100} for i in range(50)]
+    store = SessionStore(idle_timeout=60, max_bytes=approx_size(rows) // 2)
+    store.register("ev_rows")
+    # так user_data приходить з persistence після перезапуску
+    restored = {"ev_rows": [dict(r) for r in rows], "page": 2}
+    application = SimpleNamespace(user_data={1: restored}, mark_data_for_update_persistence=lambda **kw: None)
+    store.adopt(application)
+    assert store.stats()["cached_entries"] == 1
+
+    # більше за весь ліміт: не витісняється одразу, наступна сторінка бере з кешу
+    c = _context()
+    store.put(c, "rows", rows)
+    assert store.get(c, "rows") is rows
+    assert store.oversized == 2 and store.evicted_cap == 0
+
+    d = _context()
+    d.user_data["rows"] = rows[:1]
+    assert store.get(d, "rows") == rows[:1]
+    assert store.stats()["cached_entries"] == 3
+
+    store.sweep(now=10**9)
+    assert "ev_rows" not in restored and "rows" not in c.user_data
+    assert store.stats()["cached_entries"] == 0
@@ -0,0 +1,145 @@
+import sys
+import pathlib
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import sqlalchemy
+from sqlalchemy.dialects import postgresql
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+from utils.snapshots import ReportSnapshots
+
+metadata = sqlalchemy.MetaData()
+ReportSnapshot = sqlalchemy.Table(
+    "report_snapshot",
+    metadata,
+    sqlalchemy.Column("report", sqlalchemy.String(64), primary_key=True),
+    sqlalchemy.Column("key", sqlalchemy.Integer, primary_key=True),
+    sqlalchemy.Column("rows", sqlalchemy.Text),
+    sqlalchemy.Column("refreshed_at", sqlalchemy.DateTime),
+)
+
+
+class FakeDatabase:
+    """Keeps the upserted snapshots in a dict keyed by (report, key).
+
+    Instances created with the same ``snapshots`` and ``locks`` behave like
+    workers sharing one table; advisory locks are released when the
+    transaction that took them ends.
+    """
+
+    def __init__(self, snapshots=None, locks=None):
+        self.snapshots = {} if snapshots is None else snapshots
+        self.locks = set() if locks is None else locks
+        self._held = []
+
+    @asynccontextmanager
+    async def transaction(self):
+        try:
+            yield
+        finally:
+            for lock in self._held:
+                self.locks.discard(lock)
+            self._held = []
+
+    async def fetch_val(self, query):
+        params = list(query.compile(dialect=postgresql.dialect()).params.values())
+        lock = tuple(params)
+        if lock in self.locks:
+            return False
+        self.locks.add(lock)
+        self._held.append(lock)
+        return True
+
+    async def execute(self, query):
+        params = query.compile(dialect=postgresql.dialect()).params
+        self.snapshots[(params["report"], params["key"])] = {
+            "rows": params["rows"],
+            "refreshed_at": params["refreshed_at"],
+        }
+
+    async def fetch_one(self, query):
+        params = list(query.compile(dialect=postgresql.dialect()).params.values())
+        return self.snapshots.get(tuple(params))
+
+    async def fetch_all(self, query):
+        cutoff = query.compile(dialect=postgresql.dialect()).params["refreshed_at_1"]
+        return [
+            {"report": report, "key": key, "refreshed_at": row["refreshed_at"]}
+            for (report, key), row in self.snapshots.items()
+            if row["refreshed_at"] < cutoff
+        ]
+
+
+def test_snapshots_build_once_then_read_and_refresh_when_stale():
+    database = FakeDatabase()
+    snapshots = ReportSnapshots(database, ReportSnapshot, max_age=timedelta(minutes=5))
+    calls = []
+
+    async def company_report(year):
+        calls.append(year)
+        await asyncio.sleep(0)
+        return [{"name": "ТОВ 'Зоря'", "rent_total": Decimal("1000.50"), "year": year}]
+
+    snapshots.register("company_report", company_report)
+
+    async def scenario():
+        # одночасні запити на відсутній знімок будують його один раз
+        first, second = await asyncio.gather(
+            snapshots.get("company_report", 2024), snapshots.get("company_report", 2024)
+        )
+        assert first == second
+        rows, refreshed_at = await snapshots.get("company_report", 2024)
+        assert rows == [{"name": "ТОВ 'Зоря'", "rent_total": 1000.5, "year": 2024}]
+        assert calls == [2024] and snapshots.hits == 1
+
+        assert await snapshots.refresh_stale() == 0
+        database.snapshots[("company_report", 2024)]["refreshed_at"] = datetime.utcnow() - timedelta(minutes=10)
+        assert await snapshots.refresh_stale() == 1
+        assert calls == [2024, 2024]
+        assert (await snapshots.get("company_report", 2024))[1] > refreshed_at
+
+        # знімок ніхто не відкривав після оновлення — фоновий цикл його не чіпає
+        database.snapshots[("company_report", 2024)]["refreshed_at"] = datetime.utcnow() - timedelta(minutes=10)
+        snapshots._read[("company_report", 2024)] = datetime.utcnow() - timedelta(minutes=20)
+        assert await snapshots.refresh_stale() == 0
+        # а читання застарілого знімка перебудовує його одразу
+        rows, refreshed_at = await snapshots.get("company_report", 2024)
+        assert calls == [2024, 2024, 2024]
+        assert refreshed_at > datetime.utcnow() - timedelta(minutes=1)
+
+    asyncio.run(scenario())
+
+
+def test_workers_do_not_rebuild_the_same_snapshot():
+    snapshots, locks = {}, set()
+    calls = []
+
+    async def company_report():
+        calls.append(1)
+        return [{"name": "ТОВ 'Зоря'"}]
+
+    workers = []
+    for _ in range(2):
+        worker = ReportSnapshots(FakeDatabase(snapshots, locks), ReportSnapshot, max_age=timedelta(minutes=5))
+        worker.register("company_report", company_report)
+        workers.append(worker)
+
+    async def scenario():
+        a, b = workers
+        await a.get("company_report")
+        await b.get("company_report")
+        snapshots[("company_report", 0)]["refreshed_at"] = datetime.utcnow() - timedelta(minutes=10)
+        # обидва воркери віддавали знімок, але перебудовує лише перший
+        assert await a.refresh_stale() == 1
+        assert await b.refresh_stale() == 0
+        # поки інший воркер будує знімок (тримає блокування), цей його пропускає
+        snapshots[("company_report", 0)]["refreshed_at"] = datetime.utcnow() - timedelta(minutes=10)
+        locks.add(("company_report", 0))
+        assert await b.refresh_stale() == 0
+
+    asyncio.run(scenario())
+    assert len(calls) == 2
+    assert workers[1].stats()["skipped"] == 1
@@ -0,0 +1,83 @@
+import sys
+import pathlib
+import asyncio
+
+import sqlalchemy
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+from utils.update_dedup import UpdateDeduplicator
+
+
+def test_duplicates_are_dropped_within_window():
+    dedup = UpdateDeduplicator(window=2)
+
+    async def run():
+        return [await dedup.is_duplicate(i) for i in (1, 2, 1, 3, 4, 1)]
+
+    # 1 is evicted from the two-item window once 3 and 4 arrive
+    assert asyncio.run(run()) == [False, False, True, False, False, False]
+    assert dedup.stats()["duplicates"] == 1
+
+
+def test_failed_claim_does_not_mark_update_as_seen():
+    table = sqlalchemy.Table(
+        "processed_update",
+        sqlalchemy.MetaData(),
+        sqlalchemy.Column("update_id", sqlalchemy.BigInteger, primary_key=True),
+        sqlalchemy.Column("created_at", sqlalchemy.DateTime),
+    )
+
+    class FlakyDatabase:
+        def __init__(self):
+            self.calls = 0
+
+        async def fetch_one(self, query):
+            self.calls += 1
+            if self.calls == 1:
+                raise ConnectionResetError("connection reset")
+            return {"update_id": 7}
+
+    dedup = UpdateDeduplicator(database=FlakyDatabase(), table=table)
+
+    async def run():
+        try:
+            await dedup.is_duplicate(7)
+        except ConnectionResetError:
+            pass
+        # повторна доставка від Telegram обробляється
+        return await dedup.is_duplicate(7), await dedup.is_duplicate(7)
+
+    assert asyncio.run(run()) == (False, True)
+
+
+def test_forgotten_update_is_accepted_again():
+    table = sqlalchemy.Table(
+        "processed_update",
+        sqlalchemy.MetaData(),
+        sqlalchemy.Column("update_id", sqlalchemy.BigInteger, primary_key=True),
+        sqlalchemy.Column("created_at", sqlalchemy.DateTime),
+    )
+
+    class ClaimDatabase:
+        def __init__(self):
+            self.claimed = set()
+
+        async def fetch_one(self, query):
+            update_id = query.compile().params["update_id"]
+            if update_id in self.claimed:
+                return None
+            self.claimed.add(update_id)
+            return {"update_id": update_id}
+
+        async def execute(self, query):
+            self.claimed.discard(query.compile().params["update_id_1"])
+
+    dedup = UpdateDeduplicator(database=ClaimDatabase(), table=table)
+
+    async def run():
+        first = await dedup.is_duplicate(8)
+        # черга не прийняла апдейт — знімаємо позначку й у памʼяті, і в Postgres
+        await dedup.forget(8)
+        return first, await dedup.is_duplicate(8), await dedup.is_duplicate(8)
+
+    assert asyncio.run(run()) == (False, False, True)
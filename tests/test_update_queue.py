@@ -0,0 +1,38 @@
+import sys
+import pathlib
+import asyncio
+from types import SimpleNamespace
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+from utils.update_queue import UpdateQueue
+
+
+def _update(update_id: int, chat_id: int):
+    return SimpleNamespace(
+        update_id=update_id,
+        effective_chat=SimpleNamespace(id=chat_id),
+        effective_user=None,
+    )
+
+
+def test_update_queue_keeps_order_per_chat_and_drains():
+    processed: list[tuple[int, int]] = []
+
+    async def process(update):
+        # Earlier updates sleep longer, so only per-chat ordering keeps them sorted.
+        await asyncio.sleep(0.01 * (5 - update.update_id % 5))
+        processed.append((update.effective_chat.id, update.update_id))
+
+    async def run():
+        queue = UpdateQueue(process, workers=4, maxsize=3)
+        for i in range(10):
+            await queue.put(_update(i, i % 2))
+        await queue.stop()
+        return queue.stats()
+
+    stats = asyncio.run(run())
+    assert stats["processed"] == 10
+    assert stats["depth"] == 0
+    for chat_id in (0, 1):
+        ids = [u for c, u in processed if c == chat_id]
+        assert ids == sorted(ids)
@@ -0,0 +1,226 @@
+"""Rent accruals, payments and debt per contract and year, computed with NumPy.
+
+Contracts become parallel arrays (start, end, annual rent) and the rent is
+spread over calendar years in one broadcast: a year is charged for the
+days of it the contract covers, so a contract signed on 1 July accrues half
+of that year's rent. Payments, already summed per contract and year, are
+scattered into a matrix of the same shape, and debt is the difference.
+Per-contract reports (payment summary, year report, inheritance debt)
+build a :class:`Ledger` (``db.load_ledger``) instead of looping over years
+themselves; the company/year matrix is aggregated in SQL by
+``db.get_company_payments_by_year`` with the same proration.
+"""
+import logging
+from dataclasses import dataclass
+from datetime import date
+from typing import Iterable, Mapping, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+NO_COMPANY = -1
+# Договір оренди землі укладається не більше ніж на 50 років: роки поза
+# цими межами від поточного — помилка вводу, а не рядки матриці
+MAX_TERM_YEARS = 50
+_OPEN_END = np.datetime64("9999-12-30", "D")
+_DAY = np.timedelta64(1, "D")
+_EPOCH = date(1970, 1, 1).toordinal()
+_NAT = np.iinfo(np.int64).min
+
+
+def year_starts(years: np.ndarray) -> np.ndarray:
+    return (np.asarray(years) - 1970).astype("datetime64[Y]").astype("datetime64[D]")
+
+
+def epoch_day(value: date | None) -> int | None:
+    """Days since 1970-01-01, the form dates are passed to :func:`ledger_from_columns`."""
+    return None if value is None else value.toordinal() - _EPOCH
+
+
+def _year(day: np.datetime64) -> int:
+    return int(day.astype("datetime64[Y]").astype(np.int64)) + 1970
+
+
+def _column(values, dtype=np.float64) -> np.ndarray:
+    # None стає NaN: список чисел numpy перетворює без Python-циклу
+    return np.asarray(values if values is not None else [], dtype=dtype)
+
+
+def _days(values) -> np.ndarray:
+    days = _column(values)
+    missing = np.isnan(days)
+    return np.where(missing, _NAT, np.nan_to_num(days)).astype(np.int64).astype("datetime64[D]")
+
+
+def accrue(starts: np.ndarray, ends: np.ndarray, rents: np.ndarray, years: np.ndarray) -> np.ndarray:
+    """Rent accrued by each contract in each of ``years``: ``(contracts, years)``.
+
+    ``starts``/``ends`` are ``datetime64[D]``, both inclusive; ``NaT`` in
+    ``ends`` means the contract has no end date.
+    """
+    first = year_starts(years)
+    after = year_starts(np.asarray(years) + 1)
+    stop = np.where(np.isnat(ends), _OPEN_END, ends) + _DAY
+    covered = np.minimum(stop[:, None], after) - np.maximum(starts[:, None], first)
+    covered = np.clip(covered.astype(np.int64), 0, None)
+    return rents[:, None] * covered / (after - first).astype(np.int64)
+
+
+def tally(rows: np.ndarray, columns: np.ndarray, amounts: np.ndarray, shape: tuple[int, int]) -> np.ndarray:
+    """Sum ``amounts`` into a ``shape`` matrix; out-of-range cells are dropped."""
+    keep = (rows >= 0) & (rows < shape[0]) & (columns >= 0) & (columns < shape[1])
+    flat = rows[keep] * shape[1] + columns[keep]
+    return np.bincount(flat, weights=amounts[keep], minlength=shape[0] * shape[1]).reshape(shape)
+
+
+@dataclass
+class Ledger:
+    """Accrued and paid rent, one row per contract and one column per year."""
+
+    contract_ids: np.ndarray
+    company_ids: np.ndarray
+    years: np.ndarray
+    accrued: np.ndarray
+    paid: np.ndarray
+
+    @property
+    def debt(self) -> np.ndarray:
+        return self.accrued - self.paid
+
+    def row(self, contract_id: int) -> int | None:
+        i = int(np.searchsorted(self.contract_ids, contract_id))
+        if i < len(self.contract_ids) and self.contract_ids[i] == contract_id:
+            return i
+        return None
+
+    def column(self, year: int) -> int | None:
+        if len(self.years) and self.years[0] <= year <= self.years[-1]:
+            return int(year - self.years[0])
+        return None
+
+    def by_company(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """``(company_ids, accrued, paid)`` with rows summed per company."""
+        companies, inverse = np.unique(self.company_ids, return_inverse=True)
+        shape = (len(companies), len(self.years))
+        rows = np.repeat(inverse, shape[1])
+        columns = np.tile(np.arange(shape[1]), len(inverse))
+        return (
+            companies,
+            tally(rows, columns, self.accrued.ravel(), shape),
+            tally(rows, columns, self.paid.ravel(), shape),
+        )
+
+    def company_totals(self) -> list[tuple[int | None, int, float, float]]:
+        """Non-empty ``(company_id, year, accrued, paid)`` cells, rounded to kopecks."""
+        companies, accrued, paid = self.by_company()
+        accrued, paid = accrued.round(2), paid.round(2)
+        rows, columns = np.nonzero((accrued != 0) | (paid != 0))
+        return [
+            (
+                None if companies[i] == NO_COMPANY else int(companies[i]),
+                int(self.years[j]),
+                float(accrued[i, j]),
+                float(paid[i, j]),
+            )
+            for i, j in zip(rows, columns)
+        ]
+
+
+def _span(starts: np.ndarray, ends: np.ndarray, payment_years: np.ndarray, as_of: date | None) -> np.ndarray:
+    """Years from the earliest start or payment to the latest end, payment or current year.
+
+    Advance payments made before the start and late payments after the end
+    keep their own columns. The span is clipped to :data:`MAX_TERM_YEARS`
+    around the current year, so a mistyped date cannot blow up the matrix.
+    """
+    current = (as_of or date.today()).year
+    first = last = current
+    if len(starts):
+        first = _year(starts.min())
+    finite = ends[~np.isnat(ends)]
+    if len(finite):
+        last = max(last, _year(finite.max()))
+    if len(payment_years):
+        first = min(first, int(payment_years.min()))
+        last = max(last, int(payment_years.max()))
+    low, high = current - MAX_TERM_YEARS, current + MAX_TERM_YEARS
+    if first < low or last > high:
+        logger.warning("Ledger years %s-%s clipped to %s-%s", first, last, low, high)
+    return np.arange(max(first, low), min(last, high) + 1)
+
+
+def ledger_from_columns(
+    contract_ids,
+    company_ids,
+    starts,
+    ends,
+    rents,
+    payment_contract_ids,
+    payment_years,
+    payment_amounts,
+    years: Sequence[int] | None = None,
+    as_of: date | None = None,
+) -> Ledger:
+    """Ledger from parallel lists (or arrays), one entry per contract.
+
+    Dates are days since 1970-01-01 (:func:`epoch_day`); ``None`` is no
+    company, no end date or no rent. Payments are three more parallel
+    lists, summed per contract and year. Every contract must have a start
+    date. Nothing accrues after ``as_of``. Without ``years`` the ledger
+    spans every year with a contract day or a payment (see :func:`_span`).
+    """
+    ids = _column(contract_ids, np.int64)
+    order = np.argsort(ids, kind="stable")
+    ids = ids[order]
+    companies = _column(company_ids)[order]
+    companies = np.where(np.isnan(companies), NO_COMPANY, np.nan_to_num(companies)).astype(np.int64)
+    starts = _days(starts)[order]
+    ends = _days(ends)[order]
+    rents = np.nan_to_num(_column(rents))[order]
+    if as_of is not None:
+        ends = np.minimum(np.where(np.isnat(ends), _OPEN_END, ends), np.datetime64(as_of, "D"))
+
+    payment_years = _column(payment_years, np.int64)
+    if years is None:
+        years = _span(starts, ends, payment_years, as_of)
+    years = np.asarray(years, dtype=np.int64)
+
+    accrued = accrue(starts, ends, rents, years)
+
+    pay_ids = _column(payment_contract_ids, np.int64)
+    rows = np.searchsorted(ids, pay_ids)
+    known = rows < len(ids)
+    known[known] = ids[rows[known]] == pay_ids[known]
+    rows = np.where(known, rows, -1)
+    columns = payment_years - (years[0] if len(years) else 0)
+    paid = tally(rows, columns, np.nan_to_num(_column(payment_amounts)), accrued.shape)
+
+    return Ledger(ids, companies, years, accrued, paid)
+
+
+def build_ledger(
+    contracts: Sequence[Mapping],
+    payments: Iterable[Mapping],
+    years: Sequence[int] | None = None,
+    as_of: date | None = None,
+) -> Ledger:
+    """:func:`ledger_from_columns` for row mappings.
+
+    ``contracts`` have ``id``, ``company_id``, ``date_valid_from``,
+    ``date_valid_to`` and ``rent_amount``; ``payments`` have
+    ``contract_id``, ``year`` and ``amount``.
+    """
+    payments = list(payments)
+    return ledger_from_columns(
+        [c["id"] for c in contracts],
+        [c["company_id"] for c in contracts],
+        [epoch_day(c["date_valid_from"]) for c in contracts],
+        [epoch_day(c["date_valid_to"]) for c in contracts],
+        [None if c["rent_amount"] is None else float(c["rent_amount"]) for c in contracts],
+        [p["contract_id"] for p in payments],
+        [p["year"] for p in payments],
+        [None if p["amount"] is None else float(p["amount"]) for p in payments],
+        years,
+        as_of,
+    )
@@ -0,0 +1,133 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+MISSING = object()
+
+
+class TTLCache:
+    """Small in-process cache with per-entry expiry and LRU size bound.
+
+    ``None`` is a valid cached value (negative caching); it lives for
+    ``negative_ttl`` seconds. :meth:`get` returns :data:`MISSING` on a miss.
+    Take :meth:`generation` before loading a value and pass it to :meth:`set`,
+    so a value loaded concurrently with an invalidation is not stored.
+    """
+
+    def __init__(self, ttl: float = 60, maxsize: int = 10000, negative_ttl: float | None = None):
+        self.ttl = ttl
+        self.negative_ttl = ttl if negative_ttl is None else negative_ttl
+        self.maxsize = maxsize
+        self._data: OrderedDict = OrderedDict()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is not None:
+            expires, value = entry
+            if expires > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._data[key]
+        self.misses += 1
+        return MISSING
+
+    def generation(self) -> int:
+        return self._generation
+
+    def set(self, key, value, generation: int | None = None):
+        if generation is not None and generation != self._generation:
+            return
+        ttl = self.negative_ttl if value is None else self.ttl
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key):
+        self._generation += 1
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._generation += 1
+        self._data.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 3) if total else None,
+        }
+
+
+class TableCache:
+    """Read-through snapshot of a small reference table.
+
+    The whole table is loaded on first use and served from memory until
+    :meth:`clear` (or :meth:`invalidate`, so it can be registered on the
+    invalidation bus) bumps ``version``. ``ttl`` is only a safety net for
+    missed invalidations. Concurrent readers share one reload.
+    """
+
+    def __init__(self, database, table, order_by=None, ttl: float = 3600):
+        self._database = database
+        self._table = table
+        self._order_by = order_by
+        self.ttl = ttl
+        self.version = 0
+        self._rows: list | None = None
+        self._by_id: dict = {}
+        self._expires = 0.0
+        self._lock = asyncio.Lock()
+        self.loads = 0
+        self.hits = 0
+
+    async def _load(self) -> list:
+        async with self._lock:
+            if self._rows is not None and self._expires > time.monotonic():
+                return self._rows
+            version = self.version
+            query = self._table.select()
+            if self._order_by is not None:
+                query = query.order_by(self._order_by)
+            rows = await self._database.fetch_all(query)
+            self.loads += 1
+            if version == self.version:
+                self._rows = rows
+                self._by_id = {row["id"]: row for row in rows}
+                self._expires = time.monotonic() + self.ttl
+            return rows
+
+    async def all(self) -> list:
+        if self._rows is not None and self._expires > time.monotonic():
+            self.hits += 1
+            return self._rows
+        return await self._load()
+
+    async def get(self, row_id):
+        rows = await self.all()
+        if rows is self._rows:
+            return self._by_id.get(row_id)
+        # Знімок застарів під час завантаження — шукаємо у щойно прочитаних рядках
+        return next((row for row in rows if row["id"] == row_id), None)
+
+    def invalidate(self, key=None):
+        self.clear()
+
+    def clear(self):
+        self.version += 1
+        self._rows = None
+        self._by_id = {}
+
+    def stats(self) -> dict:
+        return {
+            "version": self.version,
+            "rows": len(self._rows) if self._rows is not None else None,
+            "loads": self.loads,
+            "hits": self.hits,
+        }
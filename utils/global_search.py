@@ -0,0 +1,115 @@
+"""Search payers, contracts, land plots and counterparties in one query.
+
+The input is classified first (:func:`utils.search.classify`), so an ІПН,
+phone, ЄДРПОУ, cadastre or contract number only hits the columns it can
+match. Each entity contributes a ``SELECT`` of the same shape
+(``kind, id, title, detail, flag, rank``), and the branches are combined
+with ``UNION ALL`` and ranked together.
+"""
+import re
+from typing import Collection
+
+import sqlalchemy
+
+from db import database, Company, Contract, Counterparty, LandPlot, Payer
+from utils.search import SEARCH_LIMIT, classify, fuzzy_match, similarity
+
+KINDS = ("payer", "contract", "land", "counterparty")
+EXACT = 1.0
+
+
+def _select(kind: str, id_column, title, detail, rank, flag=None):
+    return sqlalchemy.select(
+        sqlalchemy.literal(kind).label("kind"),
+        id_column.label("id"),
+        sqlalchemy.cast(title, sqlalchemy.String).label("title"),
+        sqlalchemy.cast(detail, sqlalchemy.String).label("detail"),
+        sqlalchemy.func.coalesce(flag, sqlalchemy.false()).label("flag")
+        if flag is not None
+        else sqlalchemy.false().label("flag"),
+        sqlalchemy.cast(rank, sqlalchemy.Float).label("rank"),
+    )
+
+
+def _payers(condition, rank=EXACT):
+    return _select("payer", Payer.c.id, Payer.c.name, Payer.c.ipn, rank, Payer.c.is_deceased).where(condition)
+
+
+def _contracts(condition, rank=EXACT):
+    return (
+        _select(
+            "contract",
+            Contract.c.id,
+            Contract.c.number,
+            sqlalchemy.func.coalesce(Company.c.short_name, Company.c.full_name),
+            rank,
+        )
+        .select_from(Contract.outerjoin(Company, Company.c.id == Contract.c.company_id))
+        .where(condition)
+    )
+
+
+def _lands(condition, rank=EXACT):
+    return _select("land", LandPlot.c.id, LandPlot.c.cadaster, LandPlot.c.area, rank).where(condition)
+
+
+def _counterparties(condition, rank=EXACT):
+    return _select(
+        "counterparty", Counterparty.c.id, Counterparty.c.name, Counterparty.c.edrpou, rank
+    ).where(condition)
+
+
+def _fuzzy(branch, columns, value, limit):
+    rank = sqlalchemy.func.greatest(*(similarity(column, value) for column in columns))
+    condition = sqlalchemy.or_(*(fuzzy_match(column, value) for column in columns))
+    return branch(condition, rank).order_by(rank.desc()).limit(limit)
+
+
+def build_query(text: str, limit: int = SEARCH_LIMIT, kinds: Collection[str] = KINDS):
+    """The combined query, or ``None`` when no branch of ``kinds`` applies."""
+    kind, value = classify(text)
+    if kind == "ipn":
+        branches = [("payer", _payers(Payer.c.ipn == value))]
+    elif kind == "phone":
+        # ІПН людей, народжених до 1928 р., теж починається з 0
+        digits = re.sub(r"\D", "", text)
+        branches = [
+            ("payer", _payers((Payer.c.phone == value) | (Payer.c.ipn == digits))),
+            ("counterparty", _counterparties(Counterparty.c.phone == value)),
+        ]
+    elif kind == "edrpou":
+        branches = [("counterparty", _counterparties(Counterparty.c.edrpou == value))]
+    elif kind == "cadaster":
+        branches = [("land", _fuzzy(_lands, [LandPlot.c.cadaster], value, limit))]
+    elif kind == "contract":
+        branches = [("contract", _fuzzy(_contracts, [Contract.c.number], value, limit))]
+    elif kind == "id":
+        number = int(value)
+        branches = [
+            ("payer", _payers(Payer.c.id == number)),
+            ("contract", _contracts(Contract.c.id == number)),
+            ("land", _lands(LandPlot.c.id == number)),
+            ("contract", _fuzzy(_contracts, [Contract.c.number], value, limit)),
+        ]
+    else:
+        branches = [
+            ("payer", _fuzzy(_payers, [Payer.c.name], value, limit)),
+            ("contract", _fuzzy(_contracts, [Contract.c.number], value, limit)),
+            ("land", _fuzzy(_lands, [LandPlot.c.cadaster], value, limit)),
+            (
+                "counterparty",
+                _fuzzy(_counterparties, [Counterparty.c.name, Counterparty.c.director], value, limit),
+            ),
+        ]
+    selects = [select for branch_kind, select in branches if branch_kind in kinds]
+    if not selects:
+        return None
+    return sqlalchemy.union_all(*selects).order_by(sqlalchemy.desc("rank"), "kind", "title").limit(limit)
+
+
+async def global_search(text: str, limit: int = SEARCH_LIMIT, kinds: Collection[str] = KINDS):
+    """Ranked ``kind, id, title, detail, flag, rank`` rows matching ``text``."""
+    query = build_query(text, limit, kinds) if text.strip() else None
+    if query is None:
+        return []
+    return await database.fetch_all(query)
@@ -0,0 +1,130 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import uuid
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "cache_invalidation"
+
+
+class InvalidationBus:
+    """Keep in-process caches coherent across workers via LISTEN/NOTIFY.
+
+    Caches are registered by name. A write helper calls :meth:`notify`
+    (ideally inside its transaction, so NOTIFY is delivered on commit): the
+    local cache is invalidated at once and the other processes get the
+    message through their single LISTEN connection. If that connection
+    drops, notifications may be missed, so every registered cache is
+    cleared before listening again.
+    """
+
+    def __init__(self, channel: str = CHANNEL, reconnect_delay: float = 5):
+        self.channel = channel
+        self.reconnect_delay = reconnect_delay
+        self.origin = uuid.uuid4().hex
+        self._caches: dict[str, list] = {}
+        self._task: asyncio.Task | None = None
+        self.sent = 0
+        self.received = 0
+        self.reconnects = 0
+
+    def register(self, name: str, cache):
+        """``cache`` needs ``invalidate(key)`` and ``clear()``."""
+        self._caches.setdefault(name, []).append(cache)
+
+    def _dispatch(self, name: str, key=None):
+        for cache in self._caches.get(name, ()):
+            if key is None:
+                cache.clear()
+            else:
+                cache.invalidate(key)
+
+    def _clear_all(self):
+        for caches in self._caches.values():
+            for cache in caches:
+                cache.clear()
+
+    async def notify(self, database, name: str, key=None):
+        """Invalidate ``name`` (one ``key`` or everything) here and in other workers."""
+        self._dispatch(name, key)
+        payload = json.dumps({"cache": name, "key": key, "origin": self.origin})
+        try:
+            await database.execute(
+                "SELECT pg_notify(:channel, :payload)",
+                {"channel": self.channel, "payload": payload},
+            )
+            self.sent += 1
+        except Exception:
+            # Інші процеси все одно оновляться через TTL
+            logger.exception("Failed to send cache invalidation for %s", name)
+
+    def _on_notify(self, connection, pid, channel, payload):
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            logger.warning("Bad invalidation payload: %r", payload)
+            return
+        if message.get("origin") == self.origin:
+            return
+        self.received += 1
+        self._dispatch(message.get("cache"), message.get("key"))
+
+    async def _listen(self, dsn: str):
+        import asyncpg
+
+        first = True
+        while True:
+            try:
+                conn = await asyncpg.connect(dsn)
+            except Exception:
+                logger.exception("Invalidation listener cannot connect")
+                await asyncio.sleep(self.reconnect_delay)
+                continue
+            closed = asyncio.Event()
+            conn.add_termination_listener(lambda _conn: closed.set())
+            try:
+                await conn.add_listener(self.channel, self._on_notify)
+                if not first:
+                    # Поки зʼєднання не було, могли пропустити повідомлення
+                    self.reconnects += 1
+                    self._clear_all()
+                first = False
+                await closed.wait()
+                logger.warning("Invalidation listener connection lost")
+            except asyncio.CancelledError:
+                await conn.close()
+                raise
+            except Exception:
+                logger.exception("Invalidation listener failed")
+                await conn.close()
+            await asyncio.sleep(self.reconnect_delay)
+
+    def start(self, database_url: str):
+        if self._task is None or self._task.done():
+            # asyncpg розуміє лише postgresql://, без "+driver"
+            dsn = re.sub(r"^postgres(ql)?(\+\w+)?://", "postgresql://", database_url)
+            self._task = asyncio.create_task(self._listen(dsn))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "listening": self._task is not None and not self._task.done(),
+            "caches": sorted(self._caches),
+            "sent": self.sent,
+            "received": self.received,
+            "reconnects": self.reconnects,
+        }
+
+
+bus = InvalidationBus(channel=os.getenv("CACHE_INVALIDATION_CHANNEL", CHANNEL))
@@ -0,0 +1,35 @@
+from typing import Any, Awaitable, Callable, Mapping
+
+from telegram import Update
+from telegram.ext import BaseHandler
+
+MenuCallback = Callable[[Update, Any], Awaitable[Any]]
+
+
+class MenuButtonHandler(BaseHandler):
+    """Route reply-keyboard button presses with a single dict lookup.
+
+    Replaces a run of ``MessageHandler(filters.Regex("^<text>$"), callback)``
+    handlers: the message text is looked up in ``buttons`` instead of being
+    matched against every pattern in turn. Register it where the original
+    run of handlers was, so priority against ConversationHandlers is kept.
+    """
+
+    def __init__(self, buttons: Mapping[str, MenuCallback], block: bool = True):
+        super().__init__(self._dispatch, block=block)
+        self.buttons: dict[str, MenuCallback] = dict(buttons)
+
+    def check_update(self, update: object):
+        if not isinstance(update, Update):
+            return None
+        message = update.effective_message
+        if message is None or message.text is None:
+            return None
+        return self.buttons.get(message.text)
+
+    async def handle_update(self, update, application, check_result, context):
+        self.collect_additional_context(context, update, application, check_result)
+        return await check_result(update, context)
+
+    async def _dispatch(self, update: Update, context):
+        return await self.buttons[update.effective_message.text](update, context)
@@ -0,0 +1,307 @@
+"""Per-update instrumentation exposed in Prometheus text format.
+
+Every update processed through :func:`track_updates` gets an
+:class:`UpdateStats` in a context variable. SQL statements issued through
+:class:`TrackedDatabase`, Bot API calls made through :class:`TrackedRequest`
+and FTP operations wrapped with :func:`track_ftp` add to it, and the handler
+callback that ran names it. When the update is done the numbers are observed
+into per-handler histograms, rendered by :func:`render`.
+"""
+import functools
+import logging
+import os
+import sysconfig
+import time
+import traceback
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from databases import Database
+from sqlalchemy.dialects import postgresql
+from telegram.ext import ConversationHandler
+from telegram.request import HTTPXRequest
+
+from utils.menu_router import MenuButtonHandler
+
+logger = logging.getLogger(__name__)
+
+UNHANDLED = "unhandled"
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_STDLIB = sysconfig.get_paths()["stdlib"]
+
+
+@dataclass
+class UpdateStats:
+    handler: str | None = None
+    db_queries: int = 0
+    db_seconds: float = 0.0
+    api_calls: int = 0
+    api_bytes: int = 0
+    ftp_ops: int = 0
+    # форма SQL -> кількість виконань, лише в режимі пошуку N+1
+    shapes: dict[str, int] = field(default_factory=dict)
+
+
+_current: ContextVar[UpdateStats | None] = ContextVar("update_stats", default=None)
+
+
+def current() -> UpdateStats | None:
+    """Stats of the update being processed in this task, if any."""
+    return _current.get()
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: tuple[float, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        # label -> [count per bucket..., sum, count]
+        self._series: dict[str, list[float]] = {}
+
+    def observe(self, label: str, value: float):
+        series = self._series.get(label)
+        if series is None:
+            series = self._series[label] = [0] * (len(self.buckets) + 2)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for label, series in sorted(self._series.items()):
+            handler = label.replace("\\", "\\\\").replace('"', '\\"')
+            for bound, count in zip(self.buckets, series):
+                lines.append(f'{self.name}_bucket{{handler="{handler}",le="{bound:g}"}} {count}')
+            lines.append(f'{self.name}_bucket{{handler="{handler}",le="+Inf"}} {series[-1]}')
+            lines.append(f'{self.name}_sum{{handler="{handler}"}} {series[-2]:g}')
+            lines.append(f'{self.name}_count{{handler="{handler}"}} {series[-1]}')
+        return lines
+
+
+_SECONDS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+_COUNTS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+HISTOGRAMS = {
+    "seconds": Histogram("bot_update_seconds", "Wall time of one update.", _SECONDS),
+    "db_queries": Histogram("bot_update_db_queries", "SQL statements per update.", _COUNTS),
+    "db_seconds": Histogram("bot_update_db_seconds", "Time spent in SQL per update.", _SECONDS),
+    "api_calls": Histogram("bot_update_api_calls", "Bot API calls per update.", _COUNTS),
+    "api_bytes": Histogram(
+        "bot_update_api_bytes",
+        "Bot API request and response bytes per update.",
+        (1024, 4096, 16384, 65536, 262144, 1048576, 4194304),
+    ),
+    "ftp_ops": Histogram("bot_update_ftp_ops", "FTP operations per update.", _COUNTS),
+}
+
+
+def observe(stats: UpdateStats, seconds: float):
+    label = stats.handler or UNHANDLED
+    HISTOGRAMS["seconds"].observe(label, seconds)
+    HISTOGRAMS["db_queries"].observe(label, stats.db_queries)
+    HISTOGRAMS["db_seconds"].observe(label, stats.db_seconds)
+    HISTOGRAMS["api_calls"].observe(label, stats.api_calls)
+    HISTOGRAMS["api_bytes"].observe(label, stats.api_bytes)
+    HISTOGRAMS["ftp_ops"].observe(label, stats.ftp_ops)
+
+
+def render(database=None) -> str:
+    lines: list[str] = []
+    for histogram in HISTOGRAMS.values():
+        lines.extend(histogram.render())
+    if isinstance(database, TrackedDatabase):
+        lines += [
+            "# HELP bot_db_slow_queries_total Statements slower than the threshold.",
+            "# TYPE bot_db_slow_queries_total counter",
+            f"bot_db_slow_queries_total {database.slow_queries}",
+            "# HELP bot_db_n_plus_one_total Repeated statement shapes flagged in one update.",
+            "# TYPE bot_db_n_plus_one_total counter",
+            f"bot_db_n_plus_one_total {database.n_plus_one}",
+        ]
+    return "\n".join(lines) + "\n"
+
+
+def track_updates(process):
+    """Wrap ``Application.process_update`` so each update is measured."""
+
+    @functools.wraps(process)
+    async def wrapper(update):
+        stats = UpdateStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        try:
+            return await process(update)
+        finally:
+            _current.reset(token)
+            observe(stats, time.perf_counter() - start)
+
+    return wrapper
+
+
+# === Handler callbacks ===
+
+def _wrap_callback(callback):
+    if getattr(callback, "metrics_name", None):
+        return callback
+    name = f"{callback.__module__}.{getattr(callback, '__qualname__', callback.__class__.__name__)}"
+
+    @functools.wraps(callback)
+    async def wrapper(update, context):
+        stats = _current.get()
+        if stats is not None and stats.handler is None:
+            stats.handler = name
+        return await callback(update, context)
+
+    wrapper.metrics_name = name
+    return wrapper
+
+
+def _instrument_handler(handler):
+    if isinstance(handler, ConversationHandler):
+        nested = list(handler.entry_points) + list(handler.fallbacks)
+        for state_handlers in handler.states.values():
+            nested.extend(state_handlers)
+        for inner in nested:
+            _instrument_handler(inner)
+    elif isinstance(handler, MenuButtonHandler):
+        handler.buttons = {text: _wrap_callback(cb) for text, cb in handler.buttons.items()}
+    else:
+        handler.callback = _wrap_callback(handler.callback)
+
+
+def instrument_handlers(application):
+    """Name updates after the callback that handled them. Call after add_handler."""
+    for handlers in application.handlers.values():
+        for handler in handlers:
+            _instrument_handler(handler)
+
+
+# === Джерела лічильників ===
+
+def _is_internal(filename: str) -> bool:
+    return (
+        filename == __file__
+        or "site-packages" in filename
+        or "dist-packages" in filename
+        or filename.startswith(_STDLIB)
+    )
+
+
+def call_site(limit: int = 3) -> str:
+    """Innermost application frames of the current stack, innermost first."""
+    frames = [f for f in traceback.extract_stack()[:-1] if not _is_internal(f.filename)]
+    return " <- ".join(
+        f"{os.path.relpath(f.filename, _ROOT)}:{f.lineno} {f.name}" for f in reversed(frames[-limit:])
+    )
+
+
+class TrackedDatabase(Database):
+    """``databases.Database`` that counts statements of the current update.
+
+    Statements slower than ``slow_query_seconds`` are logged with their bound
+    parameters. With ``n_plus_one_threshold`` set (debug mode) every
+    statement is reduced to its SQL shape, and a warning with the call site
+    is logged once per update when one shape runs more than that many times.
+    """
+
+    def __init__(self, url, *, slow_query_seconds: float | None = None, n_plus_one_threshold: int | None = None, **options):
+        super().__init__(url, **options)
+        self.slow_query_seconds = slow_query_seconds
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.slow_queries = 0
+        self.n_plus_one = 0
+
+    async def _tracked(self, call, query, values=None):
+        start = time.perf_counter()
+        try:
+            return await call
+        finally:
+            self._observe(query, values, time.perf_counter() - start)
+
+    def _observe(self, query, values, seconds: float):
+        stats = _current.get()
+        if stats is not None:
+            stats.db_queries += 1
+            stats.db_seconds += seconds
+        if self.slow_query_seconds is not None and seconds >= self.slow_query_seconds:
+            self.slow_queries += 1
+            sql, params = _compile(query, values)
+            logger.warning(
+                "Slow query %.0f ms in %s: %s params=%r",
+                seconds * 1000,
+                stats.handler if stats else "-",
+                sql,
+                params,
+            )
+        if stats is not None and self.n_plus_one_threshold is not None:
+            shape = query if isinstance(query, str) else str(query)
+            count = stats.shapes.get(shape, 0) + 1
+            stats.shapes[shape] = count
+            if count == self.n_plus_one_threshold + 1:
+                self.n_plus_one += 1
+                logger.warning(
+                    "Possible N+1: statement ran %s+ times in one update (%s) at %s: %s",
+                    count,
+                    stats.handler or UNHANDLED,
+                    call_site(),
+                    " ".join(shape.split()),
+                )
+
+    async def execute(self, query, values=None):
+        return await self._tracked(super().execute(query, values), query, values)
+
+    async def execute_many(self, query, values):
+        return await self._tracked(super().execute_many(query, values), query)
+
+    async def fetch_all(self, query, values=None):
+        return await self._tracked(super().fetch_all(query, values), query, values)
+
+    async def fetch_one(self, query, values=None):
+        return await self._tracked(super().fetch_one(query, values), query, values)
+
+    async def fetch_val(self, query, values=None, column=0):
+        return await self._tracked(super().fetch_val(query, values, column), query, values)
+
+    async def iterate(self, query, values=None):
+        start = time.perf_counter()
+        try:
+            async for record in super().iterate(query, values):
+                yield record
+        finally:
+            self._observe(query, values, time.perf_counter() - start)
+
+
+def _compile(query, values) -> tuple[str, dict]:
+    if isinstance(query, str):
+        return query, values or {}
+    compiled = query.compile(dialect=postgresql.dialect())
+    return " ".join(str(compiled).split()), {**compiled.params, **(values or {})}
+
+
+class TrackedRequest(HTTPXRequest):
+    """Bot API transport that counts calls and payload bytes per update."""
+
+    async def do_request(self, url, method, request_data=None, **kwargs):
+        status, payload = await super().do_request(url, method, request_data=request_data, **kwargs)
+        stats = _current.get()
+        if stats is not None:
+            stats.api_calls += 1
+            stats.api_bytes += len(payload)
+            if request_data is not None:
+                stats.api_bytes += len(request_data.json_payload)
+        return status, payload
+
+
+def track_ftp(func):
+    """Count calls of an FTP helper towards the current update."""
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        stats = _current.get()
+        if stats is not None:
+            stats.ftp_ops += 1
+        return func(*args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,192 @@
+import asyncio
+import logging
+import os
+from collections import deque
+from datetime import timedelta
+from typing import Iterable, Sequence
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import RetryAfter
+
+logger = logging.getLogger(__name__)
+
+MESSAGE_LIMIT = 4096
+# Telegram обрізає клавіатури більше ~100 кнопок, тримаємо запас
+MAX_BUTTONS = 50
+
+OutboundItem = tuple[str, Sequence[InlineKeyboardButton]]
+
+
+def pack_messages(
+    items: Iterable[OutboundItem],
+    limit: int = MESSAGE_LIMIT,
+    separator: str = "\n\n",
+    max_buttons: int = MAX_BUTTONS,
+) -> list[tuple[str, InlineKeyboardMarkup | None]]:
+    """Merge ``(text, buttons)`` items into as few messages as possible.
+
+    Each message stays within ``limit`` characters and ``max_buttons``
+    buttons; the buttons of one item form one keyboard row. A single text
+    longer than ``limit`` is split on line breaks.
+    """
+    messages: list[tuple[str, InlineKeyboardMarkup | None]] = []
+    texts: list[str] = []
+    rows: list[list[InlineKeyboardButton]] = []
+    length = 0
+    buttons = 0
+
+    def flush():
+        nonlocal texts, rows, length, buttons
+        if texts:
+            messages.append((separator.join(texts), InlineKeyboardMarkup(rows) if rows else None))
+        texts, rows, length, buttons = [], [], 0, 0
+
+    for text, item_buttons in items:
+        for part in _split_text(text, limit):
+            extra = len(part) + (len(separator) if texts else 0)
+            if texts and (length + extra > limit or buttons + len(item_buttons) > max_buttons):
+                flush()
+                extra = len(part)
+            texts.append(part)
+            length += extra
+        if item_buttons:
+            rows.append(list(item_buttons))
+            buttons += len(item_buttons)
+    flush()
+    return messages
+
+
+def _split_text(text: str, limit: int) -> list[str]:
+    if len(text) <= limit:
+        return [text]
+    parts: list[str] = []
+    current = ""
+    for line in text.split("\n"):
+        while len(line) > limit:
+            if current:
+                parts.append(current)
+                current = ""
+            parts.append(line[:limit])
+            line = line[limit:]
+        candidate = f"{current}\n{line}" if current else line
+        if len(candidate) > limit:
+            parts.append(current)
+            candidate = line
+        current = candidate
+    if current:
+        parts.append(current)
+    return parts
+
+
+class OutboundSender:
+    """Send messages within Telegram's flood limits.
+
+    At most ``global_rate`` messages per second leave the bot and at most one
+    message per ``per_chat_interval`` seconds, counted from the actual send,
+    goes to the same chat. Callers
+    simply await :meth:`send`; waiting callers are served in order. On a
+    ``RetryAfter`` (HTTP 429) the message is retried after the requested
+    delay, and the whole sender pauses for that time.
+    """
+
+    def __init__(self, global_rate: int = 30, per_chat_interval: float = 1.0, max_retries: int = 3):
+        self.global_rate = global_rate
+        self.per_chat_interval = per_chat_interval
+        self.max_retries = max_retries
+        self._sent_at: deque[float] = deque()
+        self._global_lock = asyncio.Lock()
+        self._next_chat_slot: dict[int, float] = {}
+        self._chat_locks: dict[int, asyncio.Lock] = {}
+        self._paused_until = 0.0
+        self.sent = 0
+        self.retries = 0
+        self.failed = 0
+        self.waiting = 0
+
+    def _chat_lock(self, chat_id: int) -> asyncio.Lock:
+        lock = self._chat_locks.get(chat_id)
+        if lock is None:
+            if len(self._chat_locks) > 10000:
+                now = asyncio.get_running_loop().time()
+                self._chat_locks = {cid: l for cid, l in self._chat_locks.items() if l.locked()}
+                self._next_chat_slot = {
+                    cid: t for cid, t in self._next_chat_slot.items() if t > now or cid in self._chat_locks
+                }
+            lock = self._chat_locks[chat_id] = asyncio.Lock()
+        return lock
+
+    async def _wait_chat(self, chat_id: int):
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        slot = self._next_chat_slot.get(chat_id, 0.0)
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    async def _wait_global(self):
+        loop = asyncio.get_running_loop()
+        async with self._global_lock:
+            while True:
+                now = loop.time()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                while self._sent_at and now - self._sent_at[0] >= 1:
+                    self._sent_at.popleft()
+                if len(self._sent_at) < self.global_rate:
+                    self._sent_at.append(now)
+                    return
+                await asyncio.sleep(1 - (now - self._sent_at[0]))
+
+    async def send(self, bot, chat_id: int, text: str, **kwargs):
+        """``bot.send_message`` with rate limiting and flood-wait retries."""
+        self.waiting += 1
+        try:
+            loop = asyncio.get_running_loop()
+            for attempt in range(self.max_retries + 1):
+                # Інтервал чату рахуємо від фактичного надсилання, бо глобальний ліміт може його відсунути
+                async with self._chat_lock(chat_id):
+                    await self._wait_chat(chat_id)
+                    await self._wait_global()
+                    try:
+                        message = await bot.send_message(chat_id, text, **kwargs)
+                    except RetryAfter as e:
+                        if attempt == self.max_retries:
+                            self.failed += 1
+                            raise
+                        delay = e.retry_after
+                        if isinstance(delay, timedelta):
+                            delay = delay.total_seconds()
+                        self.retries += 1
+                        logger.warning("Flood wait %ss for chat %s", delay, chat_id)
+                        self._paused_until = max(self._paused_until, loop.time() + delay)
+                        continue
+                    except Exception:
+                        self.failed += 1
+                        raise
+                    finally:
+                        self._next_chat_slot[chat_id] = loop.time() + self.per_chat_interval
+                self.sent += 1
+                return message
+        finally:
+            self.waiting -= 1
+
+    async def send_many(self, bot, chat_id: int, items: Iterable[OutboundItem], **kwargs) -> list:
+        """Pack ``(text, buttons)`` items into few messages and send them in order."""
+        messages = []
+        for text, markup in pack_messages(items):
+            messages.append(await self.send(bot, chat_id, text, reply_markup=markup, **kwargs))
+        return messages
+
+    def stats(self) -> dict:
+        return {
+            "sent": self.sent,
+            "retries": self.retries,
+            "failed": self.failed,
+            "waiting": self.waiting,
+        }
+
+
+outbound = OutboundSender(
+    global_rate=int(os.getenv("OUTBOUND_GLOBAL_RATE", "30")),
+    per_chat_interval=float(os.getenv("OUTBOUND_CHAT_INTERVAL", "1")),
+)
@@ -0,0 +1,62 @@
+import base64
+import json
+from datetime import date, datetime
+
+__all__ = ["encode_cursor", "decode_cursor", "CursorStack"]
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        return {"$dt": value.isoformat()}
+    if isinstance(value, date):
+        return {"$d": value.isoformat()}
+    raise TypeError(f"Cannot encode {type(value).__name__} in a cursor")
+
+
+def _hook(obj: dict):
+    if "$dt" in obj:
+        return datetime.fromisoformat(obj["$dt"])
+    if "$d" in obj:
+        return date.fromisoformat(obj["$d"])
+    return obj
+
+
+def encode_cursor(*values) -> str:
+    """Opaque token for a keyset position (the sort key of the last row)."""
+    raw = json.dumps(values, default=_default, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> tuple:
+    raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+    return tuple(json.loads(raw, object_hook=_hook))
+
+
+class CursorStack:
+    """Cursors of the pages visited so far, kept in ``user_data[key]``.
+
+    The last entry is where the current page starts (``None`` for the
+    first page), so going back is just dropping it.
+    """
+
+    def __init__(self, user_data: dict, key: str):
+        self._stack = user_data.setdefault(key, [None])
+
+    @staticmethod
+    def reset(user_data: dict, key: str):
+        user_data[key] = [None]
+
+    @property
+    def current(self) -> str | None:
+        return self._stack[-1]
+
+    @property
+    def has_prev(self) -> bool:
+        return len(self._stack) > 1
+
+    def next(self, cursor: str):
+        self._stack.append(cursor)
+
+    def prev(self):
+        if len(self._stack) > 1:
+            self._stack.pop()
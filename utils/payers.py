@@ -1,5 +1,6 @@
 import sqlalchemy
 from db import database, Contract, Payer, PayerContract
+from utils.search import SEARCH_LIMIT, fuzzy_search
 
 async def get_payers_for_contract(contract_id: int) -> list[str]:
     """Return list of payer names associated with a contract.
@@ -23,3 +24,8 @@ async def get_payers_for_contract(contract_id: int) -> list[str]:
         .where(Contract.c.id == contract_id)
     )
     return [row["name"]] if row else []
+
+
+async def search_payers(text: str, limit: int | None = SEARCH_LIMIT):
+    """Payers whose name contains ``text`` or resembles it, best match first."""
+    return await fuzzy_search(database, Payer.select(), [Payer.c.name], text, limit)
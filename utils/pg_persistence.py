@@ -0,0 +1,357 @@
+import asyncio
+import hashlib
+import json
+import logging
+import pickle
+from collections import OrderedDict
+from datetime import datetime
+
+import sqlalchemy
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from telegram import Update
+from telegram.ext import BasePersistence, ConversationHandler, PersistenceInput
+# Спільний режим (shared=True) спирається на внутрішні частини PTB 21.x:
+# ConversationHandler._get_key/_conversations, TrackingDict і PendingState.
+# check_shared_support() перевіряє їх на старті й у тестах, щоб оновлення PTB
+# не зламало діалоги мовчки.
+from telegram.ext._handlers.conversationhandler import PendingState
+from telegram.ext._utils.trackingdict import TrackingDict
+
+logger = logging.getLogger(__name__)
+
+
+def _digest(blob: bytes) -> bytes:
+    return hashlib.blake2b(blob, digest_size=16).digest()
+
+
+def check_shared_support():
+    """Raise ``RuntimeError`` if PTB lacks the internals ``shared=True`` uses."""
+    missing = [
+        name
+        for name, ok in (
+            ("ConversationHandler._get_key", callable(getattr(ConversationHandler, "_get_key", None))),
+            ("TrackingDict.update_no_track", callable(getattr(TrackingDict, "update_no_track", None))),
+            ("TrackingDict.data", hasattr(TrackingDict(), "data")),
+        )
+        if not ok
+    ]
+    if missing:
+        raise RuntimeError(
+            "PostgresPersistence(shared=True) needs PTB internals that this version lacks: " + ", ".join(missing)
+        )
+
+
+class PostgresPersistence(BasePersistence):
+    """Keep ``user_data``, ``chat_data`` and conversation states in Postgres.
+
+    PTB already tracks which users/chats changed and calls ``update_*`` only
+    for them every ``update_interval`` seconds. On top of that, entries whose
+    pickled value did not change since the last write are skipped, and all
+    changes of one run are written in a single transaction with multi-row
+    upserts, so handling an update never waits for the database.
+
+    PTB loads conversation states only once at start-up and re-reads
+    nothing afterwards, which is enough for a single process. With
+    ``shared=True`` several workers or replicas can serve the same chat:
+    updates go through :meth:`dispatch`, which re-reads the update's
+    conversation states and user/chat data before the handlers run (two
+    small queries) and writes every change before returning, so the next
+    update of that chat sees it on whichever process it lands.
+    """
+
+    def __init__(
+        self,
+        database,
+        user_table: sqlalchemy.Table,
+        chat_table: sqlalchemy.Table,
+        conversation_table: sqlalchemy.Table,
+        update_interval: float = 5,
+        shared: bool = False,
+        max_digests: int = 100_000,
+    ):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, callback_data=False),
+            update_interval=update_interval,
+        )
+        self._database = database
+        self._tables = {
+            "user": (user_table, "user_id"),
+            "chat": (chat_table, "chat_id"),
+        }
+        self._conversations = conversation_table
+        if shared:
+            check_shared_support()
+        self.shared = shared
+        # kind -> key -> pickled value, None означає видалення
+        self._pending: dict[str, dict] = {"user": {}, "chat": {}, "conversation": {}}
+        # (kind, key) -> дайджест останнього записаного чи прочитаного значення;
+        # LRU, бо ключів стільки, скільки користувачів і діалогів. Забутий
+        # дайджест коштує лише зайвого запису чи перечитування.
+        self._digests: OrderedDict[tuple, bytes] = OrderedDict()
+        self.max_digests = max_digests
+        self._flush_task: asyncio.Task | None = None
+        self.writes = 0
+        self.skipped = 0
+        self.batches = 0
+
+    def _known_digest(self, slot: tuple) -> bytes | None:
+        digest = self._digests.get(slot)
+        if digest is not None:
+            self._digests.move_to_end(slot)
+        return digest
+
+    def _remember(self, slot: tuple, digest: bytes):
+        self._digests[slot] = digest
+        self._digests.move_to_end(slot)
+        while len(self._digests) > self.max_digests:
+            self._digests.popitem(last=False)
+
+    # === Буфер записів ===
+
+    def _buffer(self, kind: str, key, value, drop: bool = False):
+        if drop:
+            blob = None
+            self._digests.pop((kind, key), None)
+        else:
+            try:
+                blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            except Exception:
+                logger.exception("Cannot pickle %s data for %s", kind, key)
+                return
+            digest = _digest(blob)
+            if self._known_digest((kind, key)) == digest:
+                self.skipped += 1
+                return
+            self._remember((kind, key), digest)
+        self._pending[kind][key] = blob
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_soon())
+
+    async def _flush_soon(self):
+        # Даємо решті update_* з цього ж проходу PTB потрапити в той самий батч
+        await asyncio.sleep(0)
+        while any(self._pending.values()):
+            if not await self._write():
+                break
+
+    async def _write(self) -> bool:
+        pending = self._pending
+        self._pending = {kind: {} for kind in pending}
+        now = datetime.utcnow()
+        try:
+            async with self._database.transaction():
+                for kind, (table, column) in self._tables.items():
+                    await self._write_table(
+                        table,
+                        [column],
+                        {(key,): blob for key, blob in pending[kind].items()},
+                        "data",
+                        now,
+                    )
+                await self._write_table(
+                    self._conversations,
+                    ["name", "key"],
+                    pending["conversation"],
+                    "state",
+                    now,
+                )
+        except Exception:
+            logger.exception("Failed to write bot persistence, will retry")
+            for kind, items in pending.items():
+                for key, blob in items.items():
+                    self._pending[kind].setdefault(key, blob)
+            return False
+        self.batches += 1
+        self.writes += sum(len(items) for items in pending.values())
+        return True
+
+    async def _write_table(self, table, key_columns, items, value_column, now):
+        upserts = [
+            {**dict(zip(key_columns, key)), value_column: blob, "updated_at": now}
+            for key, blob in items.items()
+            if blob is not None
+        ]
+        deletes = [key for key, blob in items.items() if blob is None]
+        if upserts:
+            stmt = pg_insert(table).values(upserts)
+            await self._database.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=key_columns,
+                    set_={
+                        value_column: stmt.excluded[value_column],
+                        "updated_at": stmt.excluded.updated_at,
+                    },
+                )
+            )
+        if deletes:
+            columns = [table.c[c] for c in key_columns]
+            await self._database.execute(
+                table.delete().where(sqlalchemy.tuple_(*columns).in_(deletes))
+            )
+
+    async def flush(self) -> None:
+        if self._flush_task is not None:
+            await self._flush_task
+        if any(self._pending.values()):
+            await self._write()
+
+    def stats(self) -> dict:
+        return {
+            "pending": sum(len(items) for items in self._pending.values()),
+            "writes": self.writes,
+            "skipped": self.skipped,
+            "batches": self.batches,
+        }
+
+    # === Завантаження ===
+
+    async def _load(self, kind: str) -> dict:
+        table, column = self._tables[kind]
+        rows = await self._database.fetch_all(sqlalchemy.select(table))
+        data = {}
+        for row in rows:
+            try:
+                data[row[column]] = pickle.loads(row["data"])
+            except Exception:
+                logger.exception("Cannot unpickle %s data for %s", kind, row[column])
+                continue
+            self._remember((kind, row[column]), _digest(row["data"]))
+        return data
+
+    async def _refresh_entry(self, kind: str, key, data: dict):
+        if not self.shared or key in self._pending[kind]:
+            return
+        table, column = self._tables[kind]
+        row = await self._database.fetch_one(
+            sqlalchemy.select(table.c.data).where(table.c[column] == key)
+        )
+        if row is None:
+            return
+        digest = _digest(row["data"])
+        if self._known_digest((kind, key)) == digest:
+            return
+        data.clear()
+        data.update(pickle.loads(row["data"]))
+        self._remember((kind, key), digest)
+
+    async def get_user_data(self) -> dict:
+        return await self._load("user")
+
+    async def get_chat_data(self) -> dict:
+        return await self._load("chat")
+
+    async def get_bot_data(self) -> dict:
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def get_conversations(self, name: str) -> dict:
+        rows = await self._database.fetch_all(
+            sqlalchemy.select(self._conversations).where(self._conversations.c.name == name)
+        )
+        conversations = {}
+        for row in rows:
+            try:
+                key = tuple(json.loads(row["key"]))
+                conversations[key] = pickle.loads(row["state"])
+            except Exception:
+                logger.exception("Cannot load conversation %s/%s", name, row["key"])
+                continue
+            self._remember(("conversation", (name, row["key"])), _digest(row["state"]))
+        return conversations
+
+    async def load_conversations(self, application, update) -> None:
+        """Re-read the states of ``update``'s conversations from the table.
+
+        Another replica may have moved these dialogs on (or ended them)
+        since this process last saw them. States with unwritten local
+        changes or a non-blocking callback still running are kept.
+        """
+        if not isinstance(update, Update):
+            return
+        slots = {}
+        for group in application.handlers.values():
+            for handler in group:
+                if not (isinstance(handler, ConversationHandler) and handler.persistent):
+                    continue
+                try:
+                    key = handler._get_key(update)  # pylint: disable=protected-access
+                except RuntimeError:
+                    continue
+                slots[(handler.name, json.dumps(list(key)))] = (handler, key)
+        if not slots:
+            return
+        table = self._conversations
+        rows = await self._database.fetch_all(
+            sqlalchemy.select(table.c.name, table.c.key, table.c.state).where(
+                sqlalchemy.tuple_(table.c.name, table.c.key).in_(list(slots))
+            )
+        )
+        stored = {(row["name"], row["key"]): row["state"] for row in rows}
+        for slot, (handler, key) in slots.items():
+            if slot in self._pending["conversation"]:
+                continue
+            # TrackingDict PTB: міняємо повз відстеження, щоб прочитане не записувалось назад
+            states = handler._conversations  # pylint: disable=protected-access
+            if isinstance(states.get(key), PendingState):
+                continue
+            blob = stored.get(slot)
+            digest = None if blob is None else _digest(blob)
+            if digest is not None and self._known_digest(("conversation", slot)) == digest and key in states:
+                continue
+            state = None
+            if blob is not None:
+                try:
+                    state = pickle.loads(blob)
+                except Exception:
+                    logger.exception("Cannot load conversation %s/%s", *slot)
+                    continue
+            if state is None or state == handler.END:
+                states.data.pop(key, None)
+                self._digests.pop(("conversation", slot), None)
+            else:
+                states.update_no_track({key: state})
+                self._remember(("conversation", slot), digest)
+
+    async def dispatch(self, application, update) -> None:
+        """``application.process_update`` with state shared between replicas."""
+        if self.shared:
+            await self.load_conversations(application, update)
+        await application.process_update(update)
+        if self.shared:
+            await application.update_persistence()
+            await self.flush()
+
+    # === Оновлення ===
+
+    async def update_user_data(self, user_id: int, data: dict) -> None:
+        self._buffer("user", user_id, data)
+
+    async def update_chat_data(self, chat_id: int, data: dict) -> None:
+        self._buffer("chat", chat_id, data)
+
+    async def update_bot_data(self, data) -> None:
+        pass
+
+    async def update_callback_data(self, data) -> None:
+        pass
+
+    async def update_conversation(self, name: str, key, new_state) -> None:
+        ckey = (name, json.dumps(list(key)))
+        self._buffer("conversation", ckey, new_state, drop=new_state is None)
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self._buffer("user", user_id, None, drop=True)
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        self._buffer("chat", chat_id, None, drop=True)
+
+    async def refresh_user_data(self, user_id: int, user_data: dict) -> None:
+        await self._refresh_entry("user", user_id, user_data)
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict) -> None:
+        await self._refresh_entry("chat", chat_id, chat_data)
+
+    async def refresh_bot_data(self, bot_data) -> None:
+        pass
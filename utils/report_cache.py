@@ -0,0 +1,125 @@
+"""Report pages cached per filter set, cursor and data version.
+
+Every table a report reads has a version counter in each process. A
+statement trigger on the table sends ``pg_notify`` on the invalidation
+channel (:mod:`utils.invalidation`) with the table name; NOTIFY is
+transactional, so the message goes out only when the writing transaction
+commits and identical messages of one transaction are merged. Postgres
+still serialises the commits of notifying transactions on its notify queue
+lock, but only for the commit itself, not for the whole transaction as a
+row lock on a shared counter did. Each process bumps its counter when the
+message arrives, whoever wrote (dialogs, imports, manual SQL); until then,
+even right after its own write, a worker may serve the previous page.
+:meth:`ReportCache.page` keys a page by the report, its normalized filters,
+the paging arguments and the versions of the report's tables, so turning
+back and forth through a report reuses the pages, an export (no paging
+arguments) reuses the full result, and any write to a relevant table makes
+the next lookup query again.
+"""
+from collections import defaultdict
+from typing import Awaitable, Callable, Sequence
+
+import sqlalchemy
+
+from utils.cache import TTLCache, MISSING
+
+# Імʼя кешу на шині інвалідації; ключ — назва таблиці
+CACHE_NAME = "data_version"
+
+
+def data_version_function(channel: str) -> sqlalchemy.DDL:
+    channel = channel.replace("'", "''")
+    return sqlalchemy.DDL(
+        f"""
+CREATE OR REPLACE FUNCTION data_version_bump() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('{channel}', json_build_object('cache', '{CACHE_NAME}', 'key', TG_TABLE_NAME)::text);
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+    )
+
+
+def data_version_triggers(tables: Sequence[str]) -> list[sqlalchemy.DDL]:
+    """Statement-level triggers that announce changes of each of ``tables``."""
+    ddl = []
+    for table in tables:
+        ddl.append(sqlalchemy.DDL(f'DROP TRIGGER IF EXISTS data_version_bump ON "{table}"'))
+        ddl.append(
+            sqlalchemy.DDL(
+                f'CREATE TRIGGER data_version_bump AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON "{table}" '
+                "FOR EACH STATEMENT EXECUTE FUNCTION data_version_bump()"
+            )
+        )
+    return ddl
+
+
+def install_data_version(conn, channel: str, tables: Sequence[str]):
+    conn.execute(data_version_function(channel))
+    for ddl in data_version_triggers(tables):
+        conn.execute(ddl)
+
+
+def normalize_filters(filters: Sequence) -> tuple:
+    """Strip text filters; an empty one means no filter, like ``None``."""
+    normalized = []
+    for value in filters:
+        if isinstance(value, str):
+            value = value.strip() or None
+        normalized.append(value)
+    return tuple(normalized)
+
+
+class ReportCache:
+    """Pages of registered reports, keyed by filters, paging and table versions.
+
+    A report is registered with its row loader (positional filters plus
+    ``limit``/``after``/``offset`` keywords) and the tables it reads. Page
+    turns cache one page per entry; only an export, called without paging
+    arguments, caches the full result. Entries of old versions are never
+    served again and age out (``ttl``) or get evicted (``maxsize``). ``ttl`` also bounds reports that compare with
+    the current date. Register the cache on the invalidation bus under
+    :data:`CACHE_NAME`: :meth:`invalidate` bumps one table's version and
+    :meth:`clear` (after a lost listener connection) all of them.
+    """
+
+    def __init__(self, ttl: float = 600, maxsize: int = 256):
+        self._cache = TTLCache(ttl=ttl, maxsize=maxsize)
+        self._reports: dict[str, tuple[Callable[..., Awaitable], tuple[str, ...]]] = {}
+        self._versions: defaultdict[str, int] = defaultdict(int)
+        self._epoch = 0
+        self.loads = 0
+
+    def register(self, name: str, loader: Callable[..., Awaitable], tables: Sequence[str]):
+        self._reports[name] = (loader, tuple(tables))
+
+    async def page(self, name: str, *filters, **paging) -> list:
+        """``loader(*filters, **paging)``, from the cache if nothing changed."""
+        loader, tables = self._reports[name]
+        filters = normalize_filters(filters)
+        versions = (self._epoch, *(self._versions[table] for table in tables))
+        key = (name, filters, tuple(sorted(paging.items())), versions)
+        rows = self._cache.get(key)
+        if rows is not MISSING:
+            return rows
+        # Якщо версія зміниться під час запиту, рядки ляжуть під старим ключем і більше не знадобляться
+        rows = list(await loader(*filters, **paging))
+        self.loads += 1
+        self._cache.set(key, rows)
+        return rows
+
+    def invalidate(self, table: str):
+        self._versions[table] += 1
+
+    def clear(self):
+        self._epoch += 1
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        return {
+            "reports": sorted(self._reports),
+            "versions": dict(self._versions),
+            "loads": self.loads,
+            **self._cache.stats(),
+        }
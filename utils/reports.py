@@ -1,5 +1,5 @@
 from io import BytesIO
-from typing import Iterable
+from typing import AsyncIterable, Iterable
 
 CONTRACT_STATUS_LABELS = {
     "signed": "Підписано",
@@ -265,7 +265,7 @@ async def fields_report_to_excel(rows: Iterable[dict]) -> BytesIO:
 
 
 async def contracts_overview_to_excel(
-    rows: Iterable[dict],
+    rows: AsyncIterable[dict],
     companies: Iterable[dict],
     statuses: Iterable[dict],
     years: Iterable[dict],
@@ -291,7 +291,7 @@ async def contracts_overview_to_excel(
             "Сума",
         ]
     )
-    for r in rows:
+    async for r in rows:
         ws.append(
             [
                 r.get("number") or "",
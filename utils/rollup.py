@@ -0,0 +1,96 @@
+"""``payment_rollup``: payments summed per contract and year.
+
+Reports read paid amounts from this table instead of grouping the whole
+``payment`` table. It is maintained inside the database: a row trigger on
+``payment`` applies every insert, update and delete as a delta, so all
+write paths (dialogs, imports, manual SQL) keep it current. A full
+:func:`rebuild_payment_rollup` is for consistency checks and repairs
+(``python migrations.py rollup``).
+"""
+import sqlalchemy
+
+PAYMENT_ROLLUP_FUNCTION = sqlalchemy.DDL(
+    """
+CREATE OR REPLACE FUNCTION payment_rollup_apply() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        DELETE FROM payment_rollup;
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.agreement_id IS NOT NULL THEN
+        UPDATE payment_rollup
+           SET paid = paid - OLD.amount, count = count - 1
+         WHERE contract_id = OLD.agreement_id
+           AND year = extract(year FROM OLD.payment_date);
+        DELETE FROM payment_rollup
+         WHERE contract_id = OLD.agreement_id
+           AND year = extract(year FROM OLD.payment_date)
+           AND count <= 0;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.agreement_id IS NOT NULL THEN
+        INSERT INTO payment_rollup (contract_id, year, paid, count)
+        VALUES (NEW.agreement_id, extract(year FROM NEW.payment_date), NEW.amount, 1)
+        ON CONFLICT (contract_id, year) DO UPDATE
+           SET paid = payment_rollup.paid + EXCLUDED.paid,
+               count = payment_rollup.count + 1;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+)
+
+# Окремими командами: DROP + CREATE, бо CREATE OR REPLACE TRIGGER лише з PostgreSQL 14
+PAYMENT_ROLLUP_TRIGGERS = [
+    sqlalchemy.DDL("DROP TRIGGER IF EXISTS payment_rollup_row ON payment"),
+    sqlalchemy.DDL(
+        "CREATE TRIGGER payment_rollup_row "
+        "AFTER INSERT OR DELETE OR UPDATE OF agreement_id, amount, payment_date ON payment "
+        "FOR EACH ROW EXECUTE FUNCTION payment_rollup_apply()"
+    ),
+    sqlalchemy.DDL("DROP TRIGGER IF EXISTS payment_rollup_truncate ON payment"),
+    sqlalchemy.DDL(
+        "CREATE TRIGGER payment_rollup_truncate AFTER TRUNCATE ON payment "
+        "FOR EACH STATEMENT EXECUTE FUNCTION payment_rollup_apply()"
+    ),
+]
+
+_FRESH = """
+    SELECT agreement_id AS contract_id, extract(year FROM payment_date)::int AS year,
+           sum(amount) AS paid, count(*) AS count
+      FROM payment
+     WHERE agreement_id IS NOT NULL
+     GROUP BY 1, 2
+"""
+
+
+def install_payment_rollup(conn):
+    conn.execute(PAYMENT_ROLLUP_FUNCTION)
+    for ddl in PAYMENT_ROLLUP_TRIGGERS:
+        conn.execute(ddl)
+
+
+def check_payment_rollup(conn) -> int:
+    """Number of (contract, year) rows where the rollup disagrees with ``payment``."""
+    return conn.execute(
+        sqlalchemy.text(
+            f"""
+            SELECT count(*) FROM ({_FRESH}) fresh
+              FULL JOIN payment_rollup r USING (contract_id, year)
+             WHERE r.paid IS DISTINCT FROM fresh.paid OR r.count IS DISTINCT FROM fresh.count
+            """
+        )
+    ).scalar()
+
+
+def rebuild_payment_rollup(conn) -> int:
+    """Recompute the rollup from ``payment``; returns rows that were wrong.
+
+    Writers to ``payment`` wait until the caller's transaction ends, so
+    the rebuilt table cannot miss a concurrent change.
+    """
+    conn.execute(sqlalchemy.text("LOCK TABLE payment IN SHARE MODE"))
+    wrong = check_payment_rollup(conn)
+    conn.execute(sqlalchemy.text("DELETE FROM payment_rollup"))
+    conn.execute(sqlalchemy.text(f"INSERT INTO payment_rollup (contract_id, year, paid, count) {_FRESH}"))
+    return wrong
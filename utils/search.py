@@ -0,0 +1,89 @@
+"""Fuzzy text search backed by pg_trgm.
+
+Searched columns carry GIN ``gin_trgm_ops`` indexes (:func:`trigram_index`),
+which serve both the substring match (``ILIKE '%q%'``) and the word
+similarity match (``%>``, tolerant to typos), so neither scans the table.
+Results are ranked by word similarity and capped at ``limit``.
+"""
+import os
+import re
+from typing import Sequence
+
+import sqlalchemy
+
+SEARCH_LIMIT = int(os.getenv("SEARCH_LIMIT", "20"))
+TRIGRAM_MIN_LENGTH = 3
+
+# Має існувати до створення trigram-індексів
+TRIGRAM_EXTENSION = sqlalchemy.DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+
+def trigram_index(name: str, column: str) -> sqlalchemy.Index:
+    return sqlalchemy.Index(
+        name, column, postgresql_using="gin", postgresql_ops={column: "gin_trgm_ops"}
+    )
+
+
+def escape_like(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def fuzzy_match(column, text: str):
+    """``column`` contains ``text`` or has a word similar to it.
+
+    Fragments shorter than a trigram only match as a prefix: ``'q%'`` is
+    still answered from the trigram index, ``'%q%'`` would scan it whole.
+    """
+    if len(text) < TRIGRAM_MIN_LENGTH:
+        return column.ilike(f"{escape_like(text)}%", escape="\\")
+    return column.ilike(f"%{escape_like(text)}%", escape="\\") | column.op("%>")(text)
+
+
+def similarity(column, text: str):
+    return sqlalchemy.func.word_similarity(text, column)
+
+
+def fuzzy_query(query, columns: Sequence, text: str, limit: int | None = SEARCH_LIMIT):
+    """Filter ``query`` to rows where any of ``columns`` matches, best first."""
+    rank = [similarity(column, text) for column in columns]
+    query = query.where(sqlalchemy.or_(*(fuzzy_match(column, text) for column in columns)))
+    query = query.order_by(sqlalchemy.func.greatest(*rank).desc(), *columns)
+    return query.limit(limit) if limit else query
+
+
+async def fuzzy_search(database, query, columns: Sequence, text: str, limit: int | None = SEARCH_LIMIT):
+    text = text.strip()
+    if not text:
+        return []
+    return await database.fetch_all(fuzzy_query(query, columns, text, limit))
+
+
+_PHONE = re.compile(r"(\+?38)?0\d{9}")
+_CONTRACT_NUMBER = re.compile(r"№?\s*(\d{1,6}/\d{2,4})")
+
+
+def classify(text: str) -> tuple[str, str]:
+    """Guess what the operator typed: ``(kind, normalized value)``.
+
+    Kinds: ``phone`` (``0XXXXXXXXX`` or ``+380...``), ``ipn`` (other
+    10 digits), ``edrpou`` (8 digits),
+    ``cadaster`` (19 digits in any grouping), ``contract`` (``0001/2024``),
+    ``id`` (other short numbers) and ``text``.
+    """
+    text = text.strip()
+    compact = re.sub(r"[\s\-()]", "", text)
+    digits = re.sub(r"\D", "", text)
+    if _PHONE.fullmatch(compact):
+        return "phone", "+380" + compact[-9:]
+    if re.fullmatch(r"\d{10}", compact):
+        return "ipn", compact
+    if re.fullmatch(r"\d{8}", compact):
+        return "edrpou", compact
+    if len(digits) == 19 and re.fullmatch(r"[\d:\s.\-]+", text):
+        return "cadaster", f"{digits[:10]}:{digits[10:12]}:{digits[12:15]}:{digits[15:]}"
+    match = _CONTRACT_NUMBER.fullmatch(text)
+    if match:
+        return "contract", match.group(1)
+    if re.fullmatch(r"\d{1,9}", compact):
+        return "id", compact
+    return "text", text
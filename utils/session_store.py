@@ -0,0 +1,197 @@
+import asyncio
+import logging
+import os
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def approx_size(obj) -> int:
+    """Approximate memory footprint of plain data (dicts, lists, scalars)."""
+    seen: set[int] = set()
+    stack = [obj]
+    total = 0
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        total += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+    return total
+
+
+class SessionStore:
+    """Track large result sets cached in ``context.user_data``.
+
+    Handlers put lists of rows with :meth:`put` and read them back with
+    :meth:`get`. A cached value is dropped from ``user_data`` when it was not
+    read for ``idle_timeout`` seconds, or, least recently used first, when all
+    cached values together exceed ``max_bytes``. A single value larger than
+    ``max_bytes`` is not counted towards the cap (evicting it right away
+    would only make every page reload it) and expires by ``idle_timeout``.
+    :meth:`get` returns ``None`` for an evicted key, so callers must be able
+    to load the rows again.
+
+    Values restored by persistence after a restart are picked up too: keys
+    given to :meth:`register` (or used with :meth:`put`) are found in
+    ``application.user_data`` on :meth:`start`, and :meth:`get` tracks any
+    value it returns that is not tracked yet.
+    """
+
+    def __init__(self, idle_timeout: float = 1800, max_bytes: int = 64 * 1024 * 1024, sweep_interval: float = 60):
+        self.idle_timeout = idle_timeout
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        # (id(user_data), key) -> [user_data, id(value), bytes, last_access, counted]
+        self._entries: dict[tuple[int, str], list] = {}
+        self._application = None
+        self._task: asyncio.Task | None = None
+        self._session_bytes: dict[int, int] = {}
+        self._keys: set[str] = set()
+        # Сума bytes врахованих записів; оновлюється разом з _entries
+        self._cached_bytes = 0
+        self.oversized = 0
+        self.evicted_idle = 0
+        self.evicted_cap = 0
+
+    @property
+    def cached_bytes(self) -> int:
+        return self._cached_bytes
+
+    def register(self, key: str):
+        """Mark ``key`` as a cached result set, so :meth:`start` adopts restored values."""
+        self._keys.add(key)
+
+    def _track(self, user_data: dict, key: str, value):
+        size = approx_size(value)
+        counted = size <= self.max_bytes
+        if not counted:
+            self.oversized += 1
+            logger.warning("Cached %s of %d bytes exceeds the session cache cap", key, size)
+        self._forget((id(user_data), key))
+        self._entries[(id(user_data), key)] = [user_data, id(value), size, time.monotonic(), counted]
+        if counted:
+            self._cached_bytes += size
+        if counted and self._cached_bytes > self.max_bytes:
+            self._evict_over_cap()
+
+    def put(self, context, key: str, value):
+        user_data = context.user_data
+        user_data[key] = value
+        self._keys.add(key)
+        self._track(user_data, key, value)
+        return value
+
+    def get(self, context, key: str, default=None):
+        value = context.user_data.get(key, default)
+        entry = self._entries.get((id(context.user_data), key))
+        if entry is not None and entry[1] == id(value):
+            entry[3] = time.monotonic()
+        elif key in context.user_data:
+            # Значення відновила persistence або поклали повз put
+            self._track(context.user_data, key, value)
+        return value
+
+    def adopt(self, application):
+        """Track registered keys found in ``application.user_data`` (e.g. after a restart)."""
+        for user_data in application.user_data.values():
+            for key in self._keys & user_data.keys():
+                entry = self._entries.get((id(user_data), key))
+                if entry is None or entry[1] != id(user_data[key]):
+                    self._track(user_data, key, user_data[key])
+
+    def _forget(self, entry_key: tuple[int, str]) -> list | None:
+        entry = self._entries.pop(entry_key, None)
+        if entry is not None and entry[4]:
+            self._cached_bytes -= entry[2]
+        return entry
+
+    def _evict(self, entry_key: tuple[int, str]) -> bool:
+        user_data, value_id, _, _, _ = self._forget(entry_key)
+        key = entry_key[1]
+        # Значення могли вже замінити або user_data.clear() — тоді нічого не чіпаємо
+        if id(user_data.get(key)) != value_id:
+            return False
+        del user_data[key]
+        if self._application is not None:
+            # Щоб persistence теж забула значення
+            for user_id, data in self._application.user_data.items():
+                if data is user_data:
+                    self._application.mark_data_for_update_persistence(user_ids=user_id)
+                    break
+        return True
+
+    def _evict_over_cap(self):
+        counted = [item for item in self._entries.items() if item[1][4]]
+        for entry_key, entry in sorted(counted, key=lambda item: item[1][3]):
+            if self._cached_bytes <= self.max_bytes:
+                break
+            if self._evict(entry_key):
+                self.evicted_cap += 1
+
+    def sweep(self, now: float | None = None):
+        """Drop idle and stale entries; refresh per-session byte counts."""
+        now = time.monotonic() if now is None else now
+        for entry_key, entry in list(self._entries.items()):
+            user_data, value_id, _, last_access, _ = entry
+            if id(user_data.get(entry_key[1])) != value_id:
+                self._forget(entry_key)
+            elif now - last_access > self.idle_timeout and self._evict(entry_key):
+                self.evicted_idle += 1
+        if self._cached_bytes > self.max_bytes:
+            self._evict_over_cap()
+        if self._application is not None:
+            self._session_bytes = {
+                user_id: approx_size(data)
+                for user_id, data in self._application.user_data.items()
+                if data
+            }
+
+    async def _sweeper(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                self.sweep()
+            except Exception:
+                logger.exception("Session sweep failed")
+
+    def start(self, application):
+        self._application = application
+        self.adopt(application)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._sweeper())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self, top: int = 5) -> dict:
+        largest = sorted(self._session_bytes.items(), key=lambda item: item[1], reverse=True)[:top]
+        return {
+            "sessions": len(self._session_bytes),
+            "session_bytes": sum(self._session_bytes.values()),
+            "largest_sessions": [{"user_id": uid, "bytes": size} for uid, size in largest],
+            "cached_entries": len(self._entries),
+            "cached_bytes": self.cached_bytes,
+            "max_bytes": self.max_bytes,
+            "evicted_idle": self.evicted_idle,
+            "evicted_cap": self.evicted_cap,
+            "oversized": self.oversized,
+        }
+
+
+session_store = SessionStore(
+    idle_timeout=float(os.getenv("SESSION_IDLE_TIMEOUT", "1800")),
+    max_bytes=int(os.getenv("SESSION_CACHE_MAX_MB", "64")) * 1024 * 1024,
+)
@@ -0,0 +1,185 @@
+import asyncio
+import json
+import logging
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Awaitable, Callable
+
+import sqlalchemy
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+logger = logging.getLogger(__name__)
+
+
+def _default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"Cannot store {type(value).__name__} in a report snapshot")
+
+
+class ReportSnapshots:
+    """Precomputed report rows kept in a table and refreshed in the background.
+
+    Every report is registered with the coroutine that builds it and takes
+    at most one parameter, a year. Its rows are stored per ``(report, key)``
+    as JSON text together with ``refreshed_at`` (``key`` is 0 for reports
+    without a parameter). :meth:`get` returns the stored rows and builds a
+    missing snapshot, or one older than ``max_age``, on the spot. A refresh
+    replaces the snapshot with one upsert, so readers keep getting the
+    previous rows until it commits; :meth:`refresh` does it on demand.
+
+    Every worker runs the background loop, so builds are coordinated in
+    Postgres: a build holds a transaction-level advisory lock on
+    ``(report, key)`` and skips the work when another worker stored a newer
+    snapshot meanwhile. The loop only rebuilds stale snapshots this worker
+    served since their last refresh; reports nobody opens are left alone
+    until the next read.
+    """
+
+    def __init__(
+        self,
+        database,
+        table: sqlalchemy.Table,
+        max_age: timedelta = timedelta(minutes=15),
+        check_interval: float = 60,
+    ):
+        self._database = database
+        self._table = table
+        self.max_age = max_age
+        self.check_interval = check_interval
+        self._builders: dict[str, Callable[..., Awaitable]] = {}
+        # (report, key) -> побудова, що вже йде: одночасні запити чекають на неї
+        self._building: dict[tuple[str, int], asyncio.Task] = {}
+        # (report, key) -> коли цей воркер востаннє віддав знімок
+        self._read: dict[tuple[str, int], datetime] = {}
+        self._task: asyncio.Task | None = None
+        self.hits = 0
+        self.builds = 0
+        self.skipped = 0
+
+    def register(self, name: str, builder: Callable[..., Awaitable]):
+        """``builder(key)``, or ``builder()`` for key 0, returns the rows."""
+        self._builders[name] = builder
+
+    async def get(self, name: str, key: int = 0) -> tuple[list[dict], datetime]:
+        """Stored rows of ``name`` and when they were computed."""
+        row = await self._database.fetch_one(
+            sqlalchemy.select(self._table.c.rows, self._table.c.refreshed_at).where(
+                (self._table.c.report == name) & (self._table.c.key == key)
+            )
+        )
+        now = datetime.utcnow()
+        self._read[(name, key)] = now
+        if row is None or row["refreshed_at"] < now - self.max_age:
+            return await self.refresh(name, key, newer_than=now - self.max_age)
+        self.hits += 1
+        return json.loads(row["rows"]), row["refreshed_at"]
+
+    async def refresh(
+        self, name: str, key: int = 0, newer_than: datetime | None = None
+    ) -> tuple[list[dict], datetime]:
+        """Rebuild the snapshot now and return it.
+
+        A snapshot another worker stored after ``newer_than`` (by default,
+        after this call started) is returned instead of building it again.
+        """
+        slot = (name, key)
+        task = self._building.get(slot)
+        if task is None:
+            newer_than = newer_than or datetime.utcnow()
+            task = self._building[slot] = asyncio.ensure_future(self._build(name, key, newer_than))
+            task.add_done_callback(lambda _: self._building.pop(slot, None))
+        return await asyncio.shield(task)
+
+    def _lock(self, name: str, key: int, wait: bool):
+        lock = sqlalchemy.func.pg_advisory_xact_lock if wait else sqlalchemy.func.pg_try_advisory_xact_lock
+        return sqlalchemy.select(lock(sqlalchemy.func.hashtext(name), key))
+
+    async def _build(
+        self, name: str, key: int, newer_than: datetime, wait: bool = True
+    ) -> tuple[list[dict], datetime] | None:
+        """Build under the ``(report, key)`` lock; ``None`` if not ``wait`` and it is taken."""
+        async with self._database.transaction():
+            locked = await self._database.fetch_val(self._lock(name, key, wait))
+            if not wait and not locked:
+                self.skipped += 1
+                return None
+            row = await self._database.fetch_one(
+                sqlalchemy.select(self._table.c.rows, self._table.c.refreshed_at).where(
+                    (self._table.c.report == name) & (self._table.c.key == key)
+                )
+            )
+            if row is not None and row["refreshed_at"] >= newer_than:
+                # Інший воркер перебудував, поки ми чекали
+                self.skipped += 1
+                return json.loads(row["rows"]), row["refreshed_at"]
+            builder = self._builders[name]
+            result = await (builder(key) if key else builder())
+            # Через JSON, щоб і тут, і після читання з таблиці були однакові типи
+            payload = json.dumps([dict(r) for r in result], default=_default)
+            now = datetime.utcnow()
+            stmt = pg_insert(self._table).values(report=name, key=key, rows=payload, refreshed_at=now)
+            await self._database.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=["report", "key"],
+                    set_={"rows": stmt.excluded.rows, "refreshed_at": stmt.excluded.refreshed_at},
+                )
+            )
+        self.builds += 1
+        return json.loads(payload), now
+
+    async def refresh_stale(self) -> int:
+        """Rebuild stale snapshots read here since their last refresh; returns how many."""
+        cutoff = datetime.utcnow() - self.max_age
+        stale = await self._database.fetch_all(
+            sqlalchemy.select(self._table.c.report, self._table.c.key, self._table.c.refreshed_at).where(
+                self._table.c.refreshed_at < cutoff
+            )
+        )
+        refreshed = 0
+        for row in stale:
+            slot = (row["report"], row["key"])
+            read_at = self._read.get(slot)
+            if row["report"] not in self._builders or read_at is None or read_at < row["refreshed_at"]:
+                continue
+            if slot in self._building:
+                continue
+            builds = self.builds
+            try:
+                # Не чекаємо: якщо знімок уже будує інший воркер, він його й оновить
+                await self._build(row["report"], row["key"], cutoff, wait=False)
+            except Exception:
+                logger.exception("Failed to refresh report snapshot %s[%s]", row["report"], row["key"])
+            refreshed += self.builds - builds
+        return refreshed
+
+    async def _refresher(self):
+        while True:
+            await asyncio.sleep(self.check_interval)
+            try:
+                await self.refresh_stale()
+            except Exception:
+                logger.exception("Report snapshot refresh failed")
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._refresher())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "reports": sorted(self._builders),
+            "hits": self.hits,
+            "builds": self.builds,
+            "skipped": self.skipped,
+        }
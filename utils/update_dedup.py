@@ -0,0 +1,98 @@
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+import sqlalchemy
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+logger = logging.getLogger(__name__)
+
+
+class UpdateDeduplicator:
+    """Drop Telegram updates that were already accepted.
+
+    Recently seen ``update_id`` values are kept in a bounded in-memory
+    window. When ``table`` and ``database`` are given, ids are also claimed
+    in Postgres so several replicas never process the same update twice.
+    """
+
+    def __init__(
+        self,
+        window: int = 10000,
+        database=None,
+        table: sqlalchemy.Table | None = None,
+        retention: timedelta = timedelta(days=1),
+        prune_every: int = 1000,
+    ):
+        self._window = window
+        self._seen: OrderedDict[int, None] = OrderedDict()
+        self._database = database
+        self._table = table
+        self._retention = retention
+        self._prune_every = prune_every
+        self._claimed = 0
+        self.duplicates = 0
+
+    def _remember(self, update_id: int):
+        self._seen[update_id] = None
+        if len(self._seen) > self._window:
+            self._seen.popitem(last=False)
+
+    async def is_duplicate(self, update_id: int) -> bool:
+        """Return True if the update was seen before, otherwise claim it."""
+        if update_id in self._seen:
+            self._seen.move_to_end(update_id)
+            self.duplicates += 1
+            return True
+        # Запамʼятовуємо одразу, щоб паралельна доставка того ж id тут не пройшла
+        self._remember(update_id)
+        if self._table is None or self._database is None:
+            return False
+        try:
+            claimed = await self._database.fetch_one(
+                pg_insert(self._table)
+                .values(update_id=update_id, created_at=datetime.utcnow())
+                .on_conflict_do_nothing(index_elements=["update_id"])
+                .returning(self._table.c.update_id)
+            )
+        except Exception:
+            # Оновлення не оброблено: Telegram надішле його повторно, і це не дублікат
+            self._seen.pop(update_id, None)
+            raise
+        if claimed is None:
+            self.duplicates += 1
+            return True
+        self._claimed += 1
+        if self._claimed % self._prune_every == 0:
+            await self._prune()
+        return False
+
+    async def forget(self, update_id: int):
+        """Undo the claim of an update that was not accepted after all.
+
+        Telegram re-delivers an update the webhook did not acknowledge; without
+        this the re-delivery would be dropped as a duplicate.
+        """
+        self._seen.pop(update_id, None)
+        if self._table is None or self._database is None:
+            return
+        try:
+            await self._database.execute(self._table.delete().where(self._table.c.update_id == update_id))
+        except Exception:
+            logger.exception("Failed to release update %s", update_id)
+
+    async def _prune(self):
+        cutoff = datetime.utcnow() - self._retention
+        try:
+            await self._database.execute(
+                self._table.delete().where(self._table.c.created_at < cutoff)
+            )
+        except Exception:
+            logger.exception("Failed to prune processed updates")
+
+    def stats(self) -> dict:
+        return {
+            "window": len(self._seen),
+            "duplicates": self.duplicates,
+            "shared": self._table is not None,
+        }
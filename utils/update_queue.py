@@ -0,0 +1,154 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable
+
+from telegram import Update
+
+logger = logging.getLogger(__name__)
+
+
+def update_key(update: Update):
+    """Return the ordering key for an update.
+
+    Updates of the same chat share a key and are processed one after
+    another. Updates without a chat (inline queries, polls) fall back to the
+    user and finally to the update itself, so they never block anybody.
+    """
+    if update.effective_chat:
+        return ("chat", update.effective_chat.id)
+    if update.effective_user:
+        return ("user", update.effective_user.id)
+    return ("update", update.update_id)
+
+
+class UpdateQueue:
+    """Bounded in-process queue for incoming Telegram updates.
+
+    The webhook only enqueues updates and returns immediately. A fixed pool
+    of workers processes them: different chats run concurrently, while
+    updates of one chat are handled strictly in the order they arrived.
+    When ``maxsize`` updates are pending, ``put`` waits for free space.
+    """
+
+    def __init__(
+        self,
+        process: Callable[[Update], Awaitable],
+        workers: int = 8,
+        maxsize: int = 1000,
+        latency_window: int = 1000,
+    ):
+        self._process = process
+        self._workers_count = workers
+        self._maxsize = maxsize
+        self._chats: dict[object, deque] = {}
+        self._ready: asyncio.Queue = asyncio.Queue()
+        self._space: asyncio.Condition | None = None
+        self._idle: asyncio.Event | None = None
+        self._workers: list[asyncio.Task] = []
+        self._pending = 0
+        self._in_flight = 0
+        self._closed = False
+        self.processed = 0
+        self.failed = 0
+        self._latencies: deque[float] = deque(maxlen=latency_window)
+
+    @property
+    def depth(self) -> int:
+        """Number of updates waiting or being processed."""
+        return self._pending
+
+    def start(self):
+        """Start worker tasks on the running event loop."""
+        if self._workers:
+            return
+        self._closed = False
+        self._space = asyncio.Condition()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        loop = asyncio.get_running_loop()
+        for _ in range(self._workers_count):
+            self._workers.append(loop.create_task(self._worker()))
+
+    async def put(self, update: Update):
+        """Enqueue an update for background processing."""
+        if self._closed:
+            raise RuntimeError("Update queue is stopped")
+        if not self._workers:
+            self.start()
+        async with self._space:
+            await self._space.wait_for(lambda: self._pending < self._maxsize)
+            self._pending += 1
+            self._idle.clear()
+        key = update_key(update)
+        item = (update, time.perf_counter())
+        chat_queue = self._chats.get(key)
+        if chat_queue is not None:
+            # A worker already owns this chat and will pick the update up.
+            chat_queue.append(item)
+            return
+        self._chats[key] = deque([item])
+        self._ready.put_nowait(key)
+
+    async def _worker(self):
+        while True:
+            key = await self._ready.get()
+            chat_queue = self._chats[key]
+            while chat_queue:
+                update, enqueued_at = chat_queue.popleft()
+                self._in_flight += 1
+                try:
+                    await self._process(update)
+                except Exception:
+                    self.failed += 1
+                    logger.exception("Failed to process update %s", update.update_id)
+                finally:
+                    self._in_flight -= 1
+                    self.processed += 1
+                    self._latencies.append(time.perf_counter() - enqueued_at)
+                    await self._release()
+            del self._chats[key]
+
+    async def _release(self):
+        async with self._space:
+            self._pending -= 1
+            self._space.notify()
+            if self._pending == 0:
+                self._idle.set()
+
+    async def stop(self, timeout: float | None = 30):
+        """Stop accepting updates, wait for pending ones and stop workers."""
+        self._closed = True
+        if self._idle is not None:
+            try:
+                await asyncio.wait_for(self._idle.wait(), timeout)
+            except asyncio.TimeoutError:
+                logger.warning("Update queue drain timed out with %s pending", self._pending)
+        for task in self._workers:
+            task.cancel()
+        if self._workers:
+            await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers.clear()
+
+    def stats(self) -> dict:
+        """Return queue depth and latency figures in seconds."""
+        latencies = sorted(self._latencies)
+
+        def pct(p: float) -> float:
+            if not latencies:
+                return 0.0
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))]
+
+        return {
+            "depth": self._pending,
+            "in_flight": self._in_flight,
+            "chats": len(self._chats),
+            "workers": len(self._workers),
+            "processed": self.processed,
+            "failed": self.failed,
+            "latency_avg": sum(latencies) / len(latencies) if latencies else 0.0,
+            "latency_p50": pct(0.5),
+            "latency_p95": pct(0.95),
+            "latency_max": latencies[-1] if latencies else 0.0,
+        }